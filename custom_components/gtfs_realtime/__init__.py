@@ -6,22 +6,34 @@ from datetime import timedelta
 import logging
 from typing import Any
 
-from gtfs_station_stop.feed_subject import FeedSubject
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 
 from .const import (
     CONF_AUTH_HEADER,
+    CONF_FILTER_STATIC_DATA,
     CONF_GTFS_PROVIDER,
     CONF_GTFS_STATIC_DATA,
+    CONF_RATE_LIMIT,
     CONF_ROUTE_ICONS,
+    CONF_ROUTE_IDS,
     CONF_STATIC_SOURCES_UPDATE_FREQUENCY,
     CONF_STATIC_SOURCES_UPDATE_FREQUENCY_DEFAULT,
+    CONF_STOP_IDS,
     CONF_URL_ENDPOINTS,
+    CONF_URL_ENDPOINTS_UPDATE_FREQUENCY,
+    DOMAIN,
 )
 from .coordinator import GtfsRealtimeCoordinator
+from .datasets import StaticFilter
 from .helpers import header_dict_from_header_str
+from .hub import async_acquire_feed_subject, async_release_feed_subject
+from .ratelimit import RateLimit
+from .services import async_setup_services
+from .websocket_api import async_setup_websocket_api
 
 PLATFORMS = [
     Platform.BINARY_SENSOR,
@@ -32,6 +44,8 @@ PLATFORMS = [
 
 type GtfsRealtimeConfigEntry = ConfigEntry[GtfsRealtimeCoordinator]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -40,9 +54,11 @@ def create_gtfs_update_hub(
 ) -> GtfsRealtimeCoordinator:
     """Create the Update Coordinator."""
     headers = header_dict_from_header_str(config.get(CONF_AUTH_HEADER))
-    hub = FeedSubject(
+    hub = async_acquire_feed_subject(
+        hass,
         config[CONF_URL_ENDPOINTS],
-        headers=headers,
+        headers,
+        RateLimit.from_dict(config.get(CONF_RATE_LIMIT)),
     )
     route_icons: str | None = config.get(CONF_ROUTE_ICONS)  # optional
     gtfs_provider: str | None = config.get(CONF_GTFS_PROVIDER)
@@ -55,22 +71,45 @@ def create_gtfs_update_hub(
     for value in static_timedelta.values():
         if value == timedelta(seconds=0):
             value = timedelta(hours=CONF_STATIC_SOURCES_UPDATE_FREQUENCY_DEFAULT)
+    endpoint_timedelta = {
+        uri: timedelta(**timedelta_dict)
+        for uri, timedelta_dict in config.get(
+            CONF_URL_ENDPOINTS_UPDATE_FREQUENCY, {}
+        ).items()
+    }
     return GtfsRealtimeCoordinator(
         hass,
         hub,
         config[CONF_GTFS_STATIC_DATA],
         static_timedelta=static_timedelta,
+        endpoint_timedelta=endpoint_timedelta,
+        stop_ids=config.get(CONF_STOP_IDS, []),
+        # Only load the trips and stop times of the configured stops and routes
+        static_filter=StaticFilter(
+            stop_ids=frozenset(config.get(CONF_STOP_IDS, [])),
+            route_ids=frozenset(config.get(CONF_ROUTE_IDS, [])),
+        )
+        if config.get(CONF_FILTER_STATIC_DATA, False)
+        else None,
         route_icons=route_icons,
         gtfs_provider=gtfs_provider,
         headers=headers,
     )
 
 
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the services and websocket commands of the integration."""
+    async_setup_services(hass)
+    async_setup_websocket_api(hass)
+    return True
+
+
 async def async_setup_entry(
     hass: HomeAssistant, entry: GtfsRealtimeConfigEntry
 ) -> bool:
     """Set up GTFS Realtime Feed Subject for use by all sensors."""
     coordinator: GtfsRealtimeCoordinator = create_gtfs_update_hub(hass, entry.data)
+    entry.async_on_unload(lambda: async_release_feed_subject(hass, coordinator.hub))
     await coordinator.async_config_entry_first_refresh()
     entry.runtime_data = coordinator
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
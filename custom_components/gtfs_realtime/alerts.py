@@ -0,0 +1,142 @@
+"""Index of the service alerts in the realtime feeds, by informed entity."""
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from enum import StrEnum
+
+from google.transit import gtfs_realtime_pb2
+from gtfs_station_stop.helpers import is_none_or_ends_at
+
+
+class InformedEntityType(StrEnum):
+    """Kind of entity a service alert informs about."""
+
+    AGENCY = "agency"
+    ROUTE = "route"
+    STOP = "stop"
+    TRIP = "trip"
+
+
+type InformedEntity = tuple[InformedEntityType, str]
+
+
+@dataclass(frozen=True, slots=True)
+class FeedAlert:
+    """Active service alert decoded from a realtime feed, in every language."""
+
+    header_text: tuple[tuple[str, str], ...]
+    description_text: tuple[tuple[str, str], ...]
+
+
+@dataclass(frozen=True, slots=True)
+class ServiceAlert:
+    """Service alert in the selected language."""
+
+    header: str
+    description: str
+
+
+def _get_informed_entities(
+    alert: gtfs_realtime_pb2.Alert,
+) -> set[InformedEntity]:
+    informed: set[InformedEntity] = set()
+    for entity in alert.informed_entity:
+        if entity.agency_id:
+            informed.add((InformedEntityType.AGENCY, entity.agency_id))
+        if entity.route_id:
+            informed.add((InformedEntityType.ROUTE, entity.route_id))
+        if entity.stop_id:
+            informed.add((InformedEntityType.STOP, entity.stop_id))
+        if entity.trip.trip_id:
+            informed.add((InformedEntityType.TRIP, entity.trip.trip_id))
+    return informed
+
+
+def decode_alerts(
+    feed: gtfs_realtime_pb2.FeedMessage,
+) -> dict[FeedAlert, frozenset[InformedEntity]]:
+    """Get the active alerts of a feed and the entities they inform about.
+
+    Identical alerts, such as those repeated in several merged feeds, are
+    only kept once.
+    """
+    alerts: dict[FeedAlert, set[InformedEntity]] = {}
+    for entity in feed.entity:
+        if not entity.HasField("alert"):
+            continue
+        alert = entity.alert
+        if is_none_or_ends_at(alert) is None:
+            continue
+        feed_alert = FeedAlert(
+            header_text=tuple(
+                (translation.language, translation.text)
+                for translation in alert.header_text.translation
+            ),
+            description_text=tuple(
+                (translation.language, translation.text)
+                for translation in alert.description_text.translation
+            ),
+        )
+        alerts.setdefault(feed_alert, set()).update(_get_informed_entities(alert))
+    return {alert: frozenset(informed) for alert, informed in alerts.items()}
+
+
+class AlertIndex:
+    """Service alerts in one language, by the entities they inform about."""
+
+    def __init__(
+        self,
+        language: str = "",
+        alerts: dict[InformedEntity, tuple[ServiceAlert, ...]] | None = None,
+        texts: dict[FeedAlert, ServiceAlert] | None = None,
+    ) -> None:
+        """Initialize the index."""
+        self.language = language
+        self._alerts = alerts or {}
+        # Alerts in the selected language, reused while they stay in the feeds
+        self._texts = texts or {}
+
+    def get(
+        self, entity_type: InformedEntityType, entity_id: str
+    ) -> tuple[ServiceAlert, ...]:
+        """Get the alerts informing about an entity."""
+        return self._alerts.get((entity_type, entity_id), ())
+
+    def __len__(self) -> int:
+        """Return the number of distinct alerts."""
+        return len(self._texts)
+
+    def rebuild(
+        self,
+        feed_alerts: Mapping[FeedAlert, frozenset[InformedEntity]],
+        language: str,
+    ) -> "AlertIndex":
+        """Index the alerts of the latest feeds, reusing those of this index.
+
+        The alerts of every entity whose alerts did not change are the same
+        tuple as before, so they can be compared by identity.
+        """
+        reused_texts = self._texts if language == self.language else {}
+        texts: dict[FeedAlert, ServiceAlert] = {}
+        alerts: dict[InformedEntity, list[ServiceAlert]] = {}
+        for feed_alert, informed in feed_alerts.items():
+            if (text := reused_texts.get(feed_alert)) is None:
+                text = ServiceAlert(
+                    header=dict(feed_alert.header_text).get(language, ""),
+                    description=dict(feed_alert.description_text).get(language, ""),
+                )
+            texts[feed_alert] = text
+            for entity in informed:
+                alerts.setdefault(entity, []).append(text)
+        return AlertIndex(
+            language,
+            {
+                entity: (
+                    previous
+                    if (previous := self.get(*entity)) == tuple(entity_alerts)
+                    else tuple(entity_alerts)
+                )
+                for entity, entity_alerts in alerts.items()
+            },
+            texts,
+        )
@@ -2,24 +2,24 @@
 
 from __future__ import annotations
 
-from gtfs_station_stop.route_status import RouteStatus
-from gtfs_station_stop.station_stop import StationStop
 from gtfs_station_stop.station_stop_info import StationStopInfo
 from homeassistant.components.binary_sensor import (
     PLATFORM_SCHEMA as BINARY_SENSOR_PLATFORM_SCHEMA,
     BinarySensorDeviceClass,
     BinarySensorEntity,
 )
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import HomeAssistant
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 import voluptuous as vol
 
 from custom_components.gtfs_realtime import GtfsRealtimeConfigEntry
 
-from .const import CONF_ROUTE_IDS, ROUTE_ID, STOP_ID
+from .alerts import InformedEntityType, ServiceAlert
+from .const import CONF_ROUTE_IDS, CONF_STOP_IDS, DOMAIN, ROUTE_ID, STOP_ID
 from .coordinator import GtfsRealtimeCoordinator
+from .entity import GtfsRealtimeEntity
 
 PLATFORM_SCHEMA = BINARY_SENSOR_PLATFORM_SCHEMA.extend(
     {
@@ -38,22 +38,30 @@ async def async_setup_entry(
 ) -> None:
     """Set up the sensor platform."""
     coordinator: GtfsRealtimeCoordinator = entry.runtime_data
+    entities: list[AlertSensor] = []
     if CONF_ROUTE_IDS in entry.data:
-        add_entities(
-            [
-                AlertSensor(
-                    coordinator,
-                    RouteStatus(route_id, coordinator.hub),
-                    hass.config.language,
-                    None,
-                )
-                for route_id in entry.data[CONF_ROUTE_IDS]
-            ]
+        entities.extend(
+            AlertSensor(coordinator, InformedEntityType.ROUTE, route_id)
+            for route_id in entry.data[CONF_ROUTE_IDS]
         )
+    if CONF_STOP_IDS in entry.data:
+        entities.extend(
+            StopAlertSensor(
+                coordinator,
+                stop_id,
+                coordinator.gtfs_update_data.schedule.get_stop_info(stop_id),
+            )
+            for stop_id in entry.data[CONF_STOP_IDS]
+        )
+    add_entities(entities)
+
 
+class AlertSensor(BinarySensorEntity, GtfsRealtimeEntity):
+    """Representation of a GTFS Realtime Alert Sensor for a route or a stop.
 
-class AlertSensor(BinarySensorEntity, CoordinatorEntity):
-    """Representation of a Station GTFS Realtime Alert Sensor."""
+    Alerts are looked up in the coordinator's alert index, the attributes are
+    only rebuilt when the alerts changed.
+    """
 
     CLEAN_ALERT_DATA = {"header_0": "", "description_0": ""}
 
@@ -63,18 +71,20 @@ class AlertSensor(BinarySensorEntity, CoordinatorEntity):
     def __init__(
         self,
         coordinator: GtfsRealtimeCoordinator,
-        informed_entity: StationStop | RouteStatus,
-        language: str = "",
+        entity_type: InformedEntityType,
+        entity_id: str,
         station_stop_info: StationStopInfo | None = None,
     ) -> None:
         """Initialize the sensor."""
         super().__init__(coordinator)
-        self.informed_entity = informed_entity
-        self.language = language
-        self._name: str = f"{station_stop_info.name if station_stop_info is not None else informed_entity.id} Service Alerts"
+        self.entity_type = entity_type
+        self.informed_entity_id = entity_id
+        self._name: str = f"{station_stop_info.name if station_stop_info is not None else entity_id} Service Alerts"
         self._attr_is_on = False
+        self._alerts: tuple[ServiceAlert, ...] | None = None
         self._alert_detail: dict[str, str] = AlertSensor.CLEAN_ALERT_DATA
-        self._attr_unique_id = f"alert_{informed_entity.id}"
+        self._stale_feed_attributes: dict[str, int] = {}
+        self._attr_unique_id = f"alert_{entity_id}"
 
     @property
     def name(self) -> str | None:
@@ -82,28 +92,64 @@ class AlertSensor(BinarySensorEntity, CoordinatorEntity):
         return self._name
 
     @property
-    def extra_state_attributes(self) -> dict[str, str]:
+    def extra_state_attributes(self) -> dict[str, str | int]:
         """Explanation of Alerts for a given Stop ID."""
+        if self._stale_feed_attributes:
+            return self._alert_detail | self._stale_feed_attributes
         return self._alert_detail
 
+    def _get_alerts(self) -> tuple[ServiceAlert, ...]:
+        return self.coordinator.gtfs_update_data.alerts.get(
+            self.entity_type, self.informed_entity_id
+        )
+
     def update(self) -> None:
         """Update state from coordinator data."""
-        alerts = self.informed_entity.alerts
+        self._stale_feed_attributes = self._get_stale_feed_attributes()
+        alerts = self._get_alerts()
+        if alerts == self._alerts:
+            return
+        self._alerts = alerts
+        self._attr_is_on = len(alerts) > 0
         self._alert_detail = {}
-        if len(alerts) == 0:
-            self._attr_is_on = False
-        elif len(alerts) > 0:
-            self._attr_is_on = True
-            for i, alert in enumerate(alerts):
-                self._alert_detail[f"header_{i + 1}"] = alert.header_text.get(
-                    self.language, ""
-                )
-                self._alert_detail[f"description_{i + 1}"] = alert.description_text.get(
-                    self.language, ""
-                )
-
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle coordinator update callback."""
-        self.update()
-        super()._handle_coordinator_update()
+        for i, alert in enumerate(alerts):
+            self._alert_detail[f"header_{i + 1}"] = alert.header
+            self._alert_detail[f"description_{i + 1}"] = alert.description
+
+
+class StopAlertSensor(AlertSensor):
+    """Alert Sensor for a stop, and for the trips arriving at it next."""
+
+    def __init__(
+        self,
+        coordinator: GtfsRealtimeCoordinator,
+        stop_id: str,
+        station_stop_info: StationStopInfo | None = None,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(
+            coordinator, InformedEntityType.STOP, stop_id, station_stop_info
+        )
+        self._attr_unique_id = f"stop_alert_{stop_id}"
+        # Grouped with the arrival sensors of the stop
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, stop_id)},
+            name=f"{station_stop_info.name if station_stop_info is not None else stop_id} ({stop_id})",
+            manufacturer=coordinator.gtfs_provider,
+            model=stop_id,
+        )
+
+    def _get_alerts(self) -> tuple[ServiceAlert, ...]:
+        alert_index = self.coordinator.gtfs_update_data.alerts
+        alerts = super()._get_alerts()
+        trip_alerts = [
+            alert
+            for arrival in self.coordinator.gtfs_update_data.arrivals.get(
+                self.informed_entity_id, ()
+            )
+            for alert in alert_index.get(InformedEntityType.TRIP, arrival.trip_id)
+        ]
+        if not trip_alerts:
+            return alerts
+        # The same alert can inform about the stop and several of its trips
+        return tuple(dict.fromkeys((*alerts, *trip_alerts)))
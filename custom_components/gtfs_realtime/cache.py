@@ -0,0 +1,329 @@
+"""On-disk cache for GTFS Static feeds."""
+
+import asyncio
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+import hashlib
+from http import HTTPStatus
+from importlib.metadata import version
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+import pickle
+import struct
+import tempfile
+import time
+from typing import IO, Any
+
+from aiohttp import ClientResponse, hdrs
+from gtfs_station_stop.schedule import GtfsSchedule
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import STORAGE_DIR
+from homeassistant.util.hass_dict import HassKey
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STATIC_CACHE_DIR = "static_cache"
+# Downloads are written to disk and hashed in chunks of at least this size
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Sources of the same feed fetching within this window of each other, such as
+# entries with different filters set up together, share one fetch
+SHARED_FETCH_MAX_AGE = timedelta(minutes=1)
+
+DATA_STATIC_CACHE: HassKey["GtfsStaticCache"] = HassKey(f"{DOMAIN}_static_cache")
+
+# Snapshots are only valid for the same format version and gtfs_station_stop
+# release, as they contain pickled schedule classes.
+SNAPSHOT_MAGIC = b"GTFSSNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_LIBRARY_VERSION = version("gtfs_station_stop").encode()
+SNAPSHOT_HEADER = (
+    SNAPSHOT_MAGIC
+    + struct.pack(">HB", SNAPSHOT_VERSION, len(SNAPSHOT_LIBRARY_VERSION))
+    + SNAPSHOT_LIBRARY_VERSION
+)
+
+
+@dataclass(kw_only=True)
+class CachedStaticFeed:
+    """Location and validators of a cached static feed."""
+
+    url: str
+    path: str
+    etag: str | None = None
+    last_modified: str | None = None
+    sha256: str | None = None
+
+
+@callback
+def async_get_static_cache(hass: HomeAssistant) -> "GtfsStaticCache":
+    """Get the cache shared by every static source, creating it if needed."""
+    if (cache := hass.data.get(DATA_STATIC_CACHE)) is None:
+        cache = hass.data[DATA_STATIC_CACHE] = GtfsStaticCache(hass)
+    return cache
+
+
+class GtfsStaticCache:
+    """Content cache for static feeds, keyed by source URL."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the cache in the Home Assistant config directory."""
+        self.hass = hass
+        self.cache_dir = Path(hass.config.path(STORAGE_DIR, DOMAIN, STATIC_CACHE_DIR))
+        self._entries: dict[str, CachedStaticFeed] = {}
+        # Fetches of a URL and reads of its snapshots are done one at a time
+        self._locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # Monotonic time each URL was last fetched
+        self._fetched_at: dict[str, float] = {}
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        """Get the file name stem used for a URL."""
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _metadata_path(self, url: str) -> Path:
+        return self.cache_dir / f"{self.cache_key(url)}.json"
+
+    def _snapshot_path(self, url: str, variant: str | None = None) -> Path:
+        stem = self.cache_key(url)
+        if variant is not None:
+            stem = f"{stem}-{variant}"
+        return self.cache_dir / f"{stem}.snapshot"
+
+    def _load_entry(self, url: str) -> CachedStaticFeed | None:
+        if (entry := self._entries.get(url)) is not None:
+            return entry
+        try:
+            entry = CachedStaticFeed(
+                **json.loads(self._metadata_path(url).read_text(encoding="utf-8"))
+            )
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return None
+        if not os.path.exists(entry.path):
+            return None
+        self._entries[url] = entry
+        return entry
+
+    def _open_download(self) -> IO[bytes]:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Unique, so concurrent downloads do not write to the same file
+        return tempfile.NamedTemporaryFile(
+            dir=self.cache_dir, suffix=".zip.tmp", delete=False
+        )
+
+    @staticmethod
+    def _write_download(download: IO[bytes], sha256: Any, data: bytes) -> None:
+        sha256.update(data)
+        download.write(data)
+
+    @staticmethod
+    def _discard_download(download: IO[bytes]) -> None:
+        download.close()
+        Path(download.name).unlink(missing_ok=True)
+
+    def _store_entry(
+        self,
+        url: str,
+        download: IO[bytes],
+        sha256: str,
+        etag: str | None,
+        last_modified: str | None,
+    ) -> tuple[CachedStaticFeed, bool]:
+        download.close()
+        previous = self._load_entry(url)
+        entry = CachedStaticFeed(
+            url=url,
+            path=str(self.cache_dir / f"{self.cache_key(url)}.zip"),
+            etag=etag,
+            last_modified=last_modified,
+            sha256=sha256,
+        )
+        changed = previous is None or previous.sha256 != entry.sha256
+        if changed:
+            os.replace(download.name, entry.path)
+        else:
+            Path(download.name).unlink(missing_ok=True)
+        self._metadata_path(url).write_text(json.dumps(asdict(entry)), encoding="utf-8")
+        self._entries[url] = entry
+        return entry, changed
+
+    async def _async_download(self, response: ClientResponse) -> tuple[IO[bytes], str]:
+        """Stream a response to a temporary file, returning it and its SHA-256."""
+        download = await self.hass.async_add_executor_job(self._open_download)
+        sha256 = hashlib.sha256()
+        buffer = bytearray()
+        try:
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                buffer += chunk
+                if len(buffer) >= DOWNLOAD_CHUNK_SIZE:
+                    data, buffer = buffer, bytearray()
+                    await self.hass.async_add_executor_job(
+                        self._write_download, download, sha256, data
+                    )
+            await self.hass.async_add_executor_job(
+                self._write_download, download, sha256, buffer
+            )
+        except BaseException:
+            await self.hass.async_add_executor_job(self._discard_download, download)
+            raise
+        return download, sha256.hexdigest()
+
+    @callback
+    def get_sha256(self, url: str) -> str | None:
+        """Get the SHA-256 of the cached content of a URL, if it was loaded."""
+        if (entry := self._entries.get(url)) is None:
+            return None
+        return entry.sha256
+
+    async def async_fetch(
+        self, url: str, headers: dict[str, str] | None = None
+    ) -> tuple[CachedStaticFeed, bool]:
+        """Fetch a static feed, returning the cache entry and if its content changed.
+
+        The request is conditional on the validators of the cached copy, so an
+        unchanged feed is neither transferred nor written again. The feed is
+        streamed to disk rather than held in memory. A feed fetched by another
+        source within the shared max age is not fetched again.
+        """
+        async with self._locks[url]:
+            if (
+                (fetched_at := self._fetched_at.get(url)) is not None
+                and time.monotonic() - fetched_at < SHARED_FETCH_MAX_AGE.total_seconds()
+                and (entry := self._entries.get(url)) is not None
+            ):
+                _LOGGER.debug("GTFS Static Feed %s was just fetched", url)
+                return entry, False
+            entry, changed = await self._async_fetch(url, headers)
+            self._fetched_at[url] = time.monotonic()
+            return entry, changed
+
+    async def _async_fetch(
+        self, url: str, headers: dict[str, str] | None
+    ) -> tuple[CachedStaticFeed, bool]:
+        entry = await self.hass.async_add_executor_job(self._load_entry, url)
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry.etag:
+                request_headers[hdrs.IF_NONE_MATCH] = entry.etag
+            if entry.last_modified:
+                request_headers[hdrs.IF_MODIFIED_SINCE] = entry.last_modified
+
+        session = async_get_clientsession(self.hass)
+        async with session.get(url, headers=request_headers) as response:
+            if response.status == HTTPStatus.NOT_MODIFIED and entry is not None:
+                _LOGGER.debug("GTFS Static Feed %s not modified", url)
+                return entry, False
+            response.raise_for_status()
+            download, sha256 = await self._async_download(response)
+            etag = response.headers.get(hdrs.ETAG)
+            last_modified = response.headers.get(hdrs.LAST_MODIFIED)
+
+        try:
+            entry, changed = await self.hass.async_add_executor_job(
+                self._store_entry, url, download, sha256, etag, last_modified
+            )
+        except BaseException:
+            await self.hass.async_add_executor_job(self._discard_download, download)
+            raise
+        if not changed:
+            _LOGGER.debug("GTFS Static Feed %s content unchanged", url)
+        return entry, changed
+
+    def _write_snapshot(
+        self,
+        url: str,
+        schedule: GtfsSchedule,
+        variant: str | None,
+        sha256: str | None,
+    ) -> None:
+        if sha256 is None:
+            entry = self._load_entry(url)
+            if entry is None or entry.sha256 is None:
+                return
+            sha256 = entry.sha256
+        with tempfile.NamedTemporaryFile(
+            dir=self.cache_dir, suffix=".snapshot.tmp", delete=False
+        ) as f:
+            try:
+                f.write(SNAPSHOT_HEADER)
+                f.write(bytes.fromhex(sha256))
+                pickle.dump(schedule, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except BaseException:
+                Path(f.name).unlink(missing_ok=True)
+                raise
+        os.replace(f.name, self._snapshot_path(url, variant))
+
+    def _read_snapshot(self, url: str, variant: str | None) -> GtfsSchedule | None:
+        entry = self._load_entry(url)
+        if entry is None or entry.sha256 is None:
+            return None
+        expected_header = SNAPSHOT_HEADER + bytes.fromhex(entry.sha256)
+        try:
+            with (
+                self._snapshot_path(url, variant).open("rb") as f,
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+            ):
+                # A snapshot of an older version of the feed is stale
+                if mm[: len(expected_header)] != expected_header:
+                    return None
+                with memoryview(mm) as view:
+                    return pickle.loads(view[len(expected_header) :])
+        except FileNotFoundError:
+            return None
+        except (ValueError, EOFError, AttributeError, pickle.UnpicklingError) as err:
+            _LOGGER.debug("Unable to read GTFS Static snapshot for %s: %s", url, err)
+            return None
+
+    def _read_any_snapshot(self, url: str) -> GtfsSchedule | None:
+        if (schedule := self._read_snapshot(url, None)) is not None:
+            return schedule
+        stem = self.cache_key(url)
+        for snapshot_path in sorted(self.cache_dir.glob(f"{stem}-*.snapshot")):
+            variant = snapshot_path.stem.removeprefix(f"{stem}-")
+            if (schedule := self._read_snapshot(url, variant)) is not None:
+                return schedule
+        return None
+
+    async def async_save_snapshot(
+        self,
+        url: str,
+        schedule: GtfsSchedule,
+        variant: str | None = None,
+        sha256: str | None = None,
+    ) -> None:
+        """Save a parsed schedule of the feed content with the given SHA-256.
+
+        Without a SHA-256, the schedule is of the currently cached content.
+        Schedules parsed differently from the same feed, such as filtered ones,
+        are saved under their own variant.
+        """
+        try:
+            await self.hass.async_add_executor_job(
+                self._write_snapshot, url, schedule, variant, sha256
+            )
+        except (OSError, pickle.PicklingError) as err:
+            _LOGGER.warning("Unable to save GTFS Static snapshot for %s: %s", url, err)
+
+    async def async_load_snapshot(
+        self, url: str, variant: str | None = None
+    ) -> GtfsSchedule | None:
+        """Load the parsed schedule of the cached feed content if it was saved."""
+        # Held so the content is not replaced while its snapshot is checked
+        async with self._locks[url]:
+            return await self.hass.async_add_executor_job(
+                self._read_snapshot, url, variant
+            )
+
+    async def async_load_any_snapshot(self, url: str) -> GtfsSchedule | None:
+        """Load a saved schedule of the cached feed content, of any variant.
+
+        The unfiltered schedule is preferred, every variant has all the stops
+        and routes.
+        """
+        return await self.hass.async_add_executor_job(self._read_any_snapshot, url)
@@ -0,0 +1,153 @@
+"""Catalog of preconfigured GTFS providers, from feeds.json."""
+
+import asyncio
+from datetime import timedelta
+from http import HTTPStatus
+import json
+import logging
+from pathlib import Path
+import time
+from typing import Any
+
+from aiohttp import ClientError, hdrs
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
+from homeassistant.util.hass_dict import HassKey
+
+from .const import DOMAIN, FEEDS_URL
+
+_LOGGER = logging.getLogger(__name__)
+
+# The published catalog is revalidated when opening the flow after this long
+CATALOG_MAX_AGE = timedelta(hours=1)
+CATALOG_STORAGE_KEY = f"{DOMAIN}.feeds_catalog"
+CATALOG_STORAGE_VERSION = 1
+BUNDLED_FEEDS_PATH = Path(__file__).parent / "feeds.json"
+USER_FEEDS_PATH = Path(__file__).parent / "user_feeds.json"
+
+DATA_FEEDS_CATALOG: HassKey["FeedsCatalog"] = HassKey(f"{DOMAIN}_feeds_catalog")
+
+
+def _read_feeds(path: Path) -> dict[str, Any] | None:
+    """Read a feeds file, or return None if it does not exist."""
+    try:
+        return json.loads(path.read_bytes())
+    except FileNotFoundError:
+        return None
+
+
+class FeedsCatalog:
+    """Providers published with the integration, cached in memory and on disk.
+
+    The published catalog is served from the cache, a stale one is revalidated
+    with its ETag in the background. Until it was fetched once, the catalog
+    bundled with the integration is served instead.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the catalog."""
+        self.hass = hass
+        self.feeds: dict[str, Any] | None = None
+        self.etag: str | None = None
+        # POSIX time the published catalog was last fetched or revalidated
+        self.fetched_at: float | None = None
+        self._store: Store[dict[str, Any]] = Store(
+            hass, CATALOG_STORAGE_VERSION, CATALOG_STORAGE_KEY
+        )
+        self._bundled_feeds: dict[str, Any] | None = None
+        self._load_lock = asyncio.Lock()
+        self._loaded = False
+        self._refresh_task: asyncio.Task | None = None
+
+    async def async_get_feeds(self, use_local: bool = False) -> dict[str, Any]:
+        """Get the providers, along with those in user_feeds.json."""
+        feeds = None
+        if not use_local:
+            await self._async_load()
+            feeds = self.feeds
+            if (
+                self.fetched_at is None
+                or time.time() - self.fetched_at > CATALOG_MAX_AGE.total_seconds()
+            ):
+                self.async_schedule_refresh()
+        if feeds is None:
+            feeds = await self._async_get_bundled_feeds()
+        if (
+            user_feeds := await self.hass.async_add_executor_job(
+                _read_feeds, USER_FEEDS_PATH
+            )
+        ) is not None:
+            _LOGGER.debug("Loaded additional feeds from user_feeds.json file")
+            feeds = feeds | user_feeds
+        return feeds
+
+    async def _async_get_bundled_feeds(self) -> dict[str, Any]:
+        if self._bundled_feeds is None:
+            self._bundled_feeds = (
+                await self.hass.async_add_executor_job(_read_feeds, BUNDLED_FEEDS_PATH)
+                or {}
+            )
+        return self._bundled_feeds
+
+    async def _async_load(self) -> None:
+        """Load the published catalog saved to disk, once."""
+        async with self._load_lock:
+            if self._loaded:
+                return
+            if (data := await self._store.async_load()) is not None:
+                self.feeds = data["feeds"]
+                self.etag = data.get("etag")
+                self.fetched_at = data.get("fetched_at")
+            self._loaded = True
+
+    @callback
+    def async_schedule_refresh(self) -> None:
+        """Refresh the published catalog in the background, unless already doing so."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = self.hass.async_create_background_task(
+                self.async_refresh(), f"{DOMAIN} refresh feeds catalog"
+            )
+
+    async def async_refresh(self) -> None:
+        """Fetch the published catalog, if it changed since it was cached."""
+        headers = (
+            {hdrs.IF_NONE_MATCH: self.etag}
+            if self.etag and self.feeds is not None
+            else {}
+        )
+        session = async_get_clientsession(self.hass)
+        try:
+            async with session.get(FEEDS_URL, headers=headers) as response:
+                if response.status == HTTPStatus.NOT_MODIFIED and headers:
+                    _LOGGER.debug("GTFS feeds catalog not modified")
+                    self.fetched_at = time.time()
+                    await self._async_save()
+                    return
+                response.raise_for_status()
+                feeds = json.loads(await response.text())
+                etag = response.headers.get(hdrs.ETAG)
+        except (ClientError, TimeoutError, ValueError) as err:
+            _LOGGER.warning(
+                "Failed to fetch feeds from GitHub, using the cached or local feeds.json: %s",
+                err,
+            )
+            return
+        self.feeds = feeds
+        self.etag = etag
+        self.fetched_at = time.time()
+        await self._async_save()
+        _LOGGER.debug("GTFS feeds catalog updated")
+
+    async def _async_save(self) -> None:
+        await self._store.async_save(
+            {"feeds": self.feeds, "etag": self.etag, "fetched_at": self.fetched_at}
+        )
+
+
+@callback
+def async_get_feeds_catalog(hass: HomeAssistant) -> FeedsCatalog:
+    """Get the catalog shared by every config flow, creating it if needed."""
+    if (catalog := hass.data.get(DATA_FEEDS_CATALOG)) is None:
+        catalog = hass.data[DATA_FEEDS_CATALOG] = FeedsCatalog(hass)
+    return catalog
@@ -1,18 +1,17 @@
 """Config Flow for GTFS Realtime."""
 
 import asyncio
-import json
 import logging
 from typing import Any
 
-import aiohttp
-from anyio import open_file as aopen_file
 from gtfs_station_stop.station_stop_info import LocationType
 from gtfs_station_stop.schedule import GtfsSchedule
 from homeassistant.config_entries import ConfigFlow
+from homeassistant.core import HomeAssistant
 from homeassistant.data_entry_flow import SectionConfig, section
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.selector import (
+    BooleanSelector,
     DurationSelector,
     DurationSelectorConfig,
     NumberSelector,
@@ -31,26 +30,44 @@ import voluptuous as vol
 from .const import (
     CONF_ARRIVAL_LIMIT,
     CONF_AUTH_HEADER,
+    CONF_DEPARTURES_SENSOR,
+    CONF_FILTER_STATIC_DATA,
     CONF_GTFS_PROVIDER,
     CONF_GTFS_PROVIDER_ID,
     CONF_GTFS_STATIC_DATA,
     CONF_USE_LOCAL_FEEDS,
     CONF_MINOR_VERSION,
+    CONF_RATE_LIMIT,
     CONF_ROUTE_ICONS,
     CONF_ROUTE_IDS,
     CONF_SELECT_AT_LEAST_ONE_STOP_OR_ROUTE,
     CONF_STATIC_SOURCES_UPDATE_FREQUENCY,
     CONF_STATIC_SOURCES_UPDATE_FREQUENCY_DEFAULT,
     CONF_STOP_IDS,
+    CONF_STOP_SEARCH,
     CONF_URL_ENDPOINTS,
+    CONF_URL_ENDPOINTS_UPDATE_FREQUENCY,
+    CONF_URL_ENDPOINTS_UPDATE_FREQUENCY_DEFAULT,
     CONF_VERSION,
     DOMAIN,
-    FEEDS_URL,
 )
-from .helpers import header_dict_from_header_str
+from .catalog import async_get_feeds_catalog
+from .coordinator import merge_schedules
+from .helpers import header_dict_from_header_str, redact_uri
+from .static import async_get_loaded_schedule, async_load_stops_and_routes
+from .stop_index import StopIndex
 
 _LOGGER = logging.getLogger(__name__)
 
+# Larger schedules only offer the stops nearest home or matching a search
+MAX_STOP_OPTIONS = 100
+NEARBY_STOPS_DISTANCE = 5000  # meters
+
+
+def _endpoint_labels(uris: list[str]) -> dict[str, str]:
+    """Label the realtime endpoints in the form, without their API keys."""
+    return {f"{index}. {redact_uri(uri)}": uri for index, uri in enumerate(uris, 1)}
+
 
 class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
     """Config flow for GTFS Realtime."""
@@ -63,40 +80,19 @@ class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
         """Initialize config flow."""
         self.hub_config: dict[str, Any] = {}
         self.schedule: GtfsSchedule = GtfsSchedule()
+        # Load of the schedule the stop and route options are built from
+        self._schedule_load: asyncio.Task[GtfsSchedule] | None = None
+        self._schedule_load_key: tuple[tuple[str, ...], frozenset] | None = None
+        self._stop_index: StopIndex | None = None
+        self._stop_index_schedule: GtfsSchedule | None = None
 
     @staticmethod
-    async def _get_feeds(use_local: bool = False):
-        # try to get the data from the develop branch, it may be more up to date
-        if not use_local:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(FEEDS_URL) as response:
-                    if response.status >= 200 and response.status < 400:
-                        GtfsRealtimeConfigFlow.feeds = json.loads(await response.text())
-                    else:
-                        # fallback to getting the data from the local feeds.json
-                        _LOGGER.warning(
-                            "Failed to fetch feeds from GitHub, HTTP status code %d, falling back to local feeds.json",
-                            response.status,
-                        )
-                        use_local = True
-        if use_local:
-            async with await aopen_file(
-                "custom_components/gtfs_realtime/feeds.json", "rb"
-            ) as f:
-                content: bytes = await f.read()
-                GtfsRealtimeConfigFlow.feeds = json.loads(content)
-
-        # Add user_feeds.json if it exists
-        try:
-            async with await aopen_file(
-                "custom_components/gtfs_realtime/user_feeds.json", "rb"
-            ) as f:
-                content: bytes = await f.read()
-                GtfsRealtimeConfigFlow.feeds |= json.loads(content)
-            _LOGGER.debug("Loaded additional feeds from user_feeds.json file")
-        except FileNotFoundError:
-            # this is fine, not required
-            _LOGGER.debug("No user_feeds.json file provided for additional feeds")
+    async def _get_feeds(hass: HomeAssistant, use_local: bool = False):
+        # The catalog is published separately, so it may be kept up to date
+        # without requiring updates to this repository
+        GtfsRealtimeConfigFlow.feeds = await async_get_feeds_catalog(
+            hass
+        ).async_get_feeds(use_local)
 
     async def async_step_user(self, user_input=None):
         """User initiated Config Flow."""
@@ -116,7 +112,7 @@ class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
         # file so it may be kept up to date without requiring updates to this repository.
         # It can also be monkey patched to support testing.
         try:
-            await GtfsRealtimeConfigFlow._get_feeds(use_local_feeds_only)
+            await GtfsRealtimeConfigFlow._get_feeds(self.hass, use_local_feeds_only)
         except Exception as e:
             # do not allow errors to propagate, this is for convenience
             _LOGGER.error("failed_preconfigured_feeds")
@@ -175,6 +171,8 @@ class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
         route_icons: str = feed_data.get("route_icons", "")
         self.hub_config[CONF_GTFS_PROVIDER] = feed_data.get("name", "")
         self.hub_config[CONF_GTFS_PROVIDER_ID] = gtfs_provider_id
+        if CONF_RATE_LIMIT in feed_data:
+            self.hub_config[CONF_RATE_LIMIT] = feed_data[CONF_RATE_LIMIT]
 
         data_schema = vol.Schema(
             {
@@ -226,12 +224,67 @@ class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
             description_placeholders=placeholders,
         )
 
+    async def _async_load_schedule(self, headers: dict[str, str] | None = None) -> None:
+        """Load the static schedule once for the options of every step.
+
+        Concurrent callers join the load in progress, it is only repeated when
+        the static sources or headers change or the last load failed.
+        """
+        key = (
+            tuple(self.hub_config[CONF_GTFS_STATIC_DATA]),
+            frozenset((headers or {}).items()),
+        )
+        if self._schedule_load is None or key != self._schedule_load_key:
+            self._schedule_load_key = key
+            self._schedule_load = asyncio.create_task(
+                self._async_borrow_or_load_schedule(key[0], headers)
+            )
+        schedule_load = self._schedule_load
+        try:
+            # Shielded so one caller being cancelled does not cancel the others
+            self.schedule = await asyncio.shield(schedule_load)
+        except Exception:
+            if self._schedule_load is schedule_load:
+                self._schedule_load = None
+            raise
+
+    async def _async_borrow_or_load_schedule(
+        self, uris: tuple[str, ...], headers: dict[str, str] | None
+    ) -> GtfsSchedule:
+        """Use the schedules other entries loaded, only downloading the rest.
+
+        Only the stops and routes of remote feeds are downloaded where the
+        server allows it, other feeds are loaded whole.
+        """
+        loaded = await asyncio.gather(
+            *(async_get_loaded_schedule(self.hass, uri) for uri in uris)
+        )
+        missing = [
+            uri for uri, schedule in zip(uris, loaded, strict=True) if schedule is None
+        ]
+        partial = await asyncio.gather(
+            *(async_load_stops_and_routes(self.hass, uri, headers) for uri in missing)
+        )
+        schedules = [
+            schedule for schedule in (*loaded, *partial) if schedule is not None
+        ]
+        if full := [
+            uri
+            for uri, schedule in zip(missing, partial, strict=True)
+            if schedule is None
+        ]:
+            schedule = GtfsSchedule()
+            await schedule.async_update_schedule(*full, headers=headers)
+            schedules.append(schedule)
+        if not schedules:
+            return GtfsSchedule()
+        # Borrowed schedules are only read, never modified
+        return merge_schedules(*schedules)
+
     async def _get_route_options(
         self, headers: dict[str, str] | None = None
     ) -> list[SelectOptionDict]:
-        await self.schedule.async_update_schedule(
-            *self.hub_config[CONF_GTFS_STATIC_DATA], headers=headers
-        )
+        await self._async_load_schedule(headers)
         route_ds = self.schedule.route_info_ds
         return [
             SelectOptionDict(
@@ -241,20 +294,59 @@ class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
             for k in route_ds.route_infos.keys()
         ]
 
+    async def _async_get_stop_index(self) -> StopIndex:
+        """Get the index of the stops in the schedule, built once per schedule."""
+        if self._stop_index is None or self._stop_index_schedule is not self.schedule:
+            ssi_ds = self.schedule.station_stop_info_ds
+            self._stop_index = await self.hass.async_add_executor_job(
+                StopIndex,
+                [
+                    stop
+                    for stop in ssi_ds.station_stop_infos.values()
+                    if stop.location_type == LocationType.STOP
+                ],
+            )
+            self._stop_index_schedule = self.schedule
+        return self._stop_index
+
     async def _get_stop_options(
-        self, headers: dict[str, str] | None = None
+        self,
+        headers: dict[str, str] | None = None,
+        query: str | None = None,
+        selected: list[str] | None = None,
     ) -> list[SelectOptionDict]:
-        await self.schedule.async_update_schedule(
-            *self.hub_config[CONF_GTFS_STATIC_DATA], headers=headers
-        )
-        ssi_ds = self.schedule.station_stop_info_ds
+        """Get the stops matching a search, or those nearest home.
+
+        Schedules with few stops offer all of them, the selected stops are
+        always offered.
+        """
+        await self._async_load_schedule(headers)
+        stop_index = await self._async_get_stop_index()
+        if query:
+            stop_ids = stop_index.search(query, MAX_STOP_OPTIONS)
+        elif len(stop_index) > MAX_STOP_OPTIONS:
+            latitude, longitude = self.hass.config.latitude, self.hass.config.longitude
+            # Feeds far from home, or without locations, offer their first stops
+            stop_ids = (
+                stop_index.nearest(
+                    latitude, longitude, MAX_STOP_OPTIONS, NEARBY_STOPS_DISTANCE
+                )
+                or list(stop_index.stops)[:MAX_STOP_OPTIONS]
+            )
+        else:
+            stop_ids = list(stop_index.stops)
+        stop_ids = [
+            *(stop_id for stop_id in selected or [] if stop_id not in stop_ids),
+            *stop_ids,
+        ]
         return [
             SelectOptionDict(
-                value=k,
-                label=f"{v.name} {f' - {v.desc}' if v.desc is not None else ''} ({v.id})",
+                value=stop_id,
+                label=f"{v.name} {f' - {v.desc}' if v.desc is not None else ''} ({v.id})"
+                if (v := stop_index.stops.get(stop_id)) is not None
+                else stop_id,
             )
-            for k, v in ssi_ds.station_stop_infos.items()
-            if v.location_type == LocationType.STOP
+            for stop_id in stop_ids
         ]
 
     def _create_config_schema(
@@ -263,6 +355,8 @@ class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
         routes: list[SelectOptionDict],
         selected_stops: list[str] | None = None,
         selected_routes: list[str] | None = None,
+        departures_sensor: bool = False,
+        filter_static_data: bool = False,
     ) -> vol.Schema:
         """Populate the config schema with stops and routes to choose."""
         data_schema = vol.Schema(
@@ -283,6 +377,9 @@ class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
                         multiple=True,
                     )
                 ),
+                # Not filled in with the last search, so submitting the
+                # matching stops does not search again
+                vol.Optional(CONF_STOP_SEARCH): TextSelector(),
                 vol.Optional(
                     CONF_STOP_IDS,
                     default=selected_stops or [],
@@ -296,6 +393,12 @@ class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
                 vol.Required(CONF_ARRIVAL_LIMIT, default=4): NumberSelector(
                     NumberSelectorConfig(min=1, step=1, mode=NumberSelectorMode.BOX)
                 ),
+                vol.Optional(
+                    CONF_DEPARTURES_SENSOR, default=departures_sensor
+                ): BooleanSelector(),
+                vol.Optional(
+                    CONF_FILTER_STATIC_DATA, default=filter_static_data
+                ): BooleanSelector(),
                 CONF_STATIC_SOURCES_UPDATE_FREQUENCY: section(
                     vol.Schema(
                         {
@@ -316,20 +419,64 @@ class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
                     ),
                     SectionConfig({"collapsed": True}),
                 ),
+                CONF_URL_ENDPOINTS_UPDATE_FREQUENCY: section(
+                    vol.Schema(
+                        {
+                            vol.Required(
+                                label,
+                                default=self.hub_config.get(
+                                    CONF_URL_ENDPOINTS_UPDATE_FREQUENCY, {}
+                                ).get(
+                                    uri,
+                                    {
+                                        "seconds": CONF_URL_ENDPOINTS_UPDATE_FREQUENCY_DEFAULT
+                                    },
+                                ),
+                            ): DurationSelector(
+                                DurationSelectorConfig(
+                                    allow_negative=False,
+                                    enable_day=False,
+                                    enable_millisecond=False,
+                                )
+                            )
+                            for label, uri in _endpoint_labels(
+                                self.hub_config[CONF_URL_ENDPOINTS]
+                            ).items()
+                        }
+                    ),
+                    SectionConfig({"collapsed": True}),
+                ),
             }
         )
         return data_schema
 
+    def _key_endpoint_frequencies_by_uri(self, user_input: dict[str, Any]) -> None:
+        """Key the realtime endpoint intervals entered in the form by their URI."""
+        if (
+            frequencies := user_input.get(CONF_URL_ENDPOINTS_UPDATE_FREQUENCY)
+        ) is not None:
+            labels = _endpoint_labels(self.hub_config[CONF_URL_ENDPOINTS])
+            user_input[CONF_URL_ENDPOINTS_UPDATE_FREQUENCY] = {
+                labels.get(label, label): frequency
+                for label, frequency in frequencies.items()
+            }
+
     async def async_step_choose_informed_entities(
         self, user_input: dict[str, str] | None = None
     ):
         """Select informed entities for sensor and binary_sensor platforms."""
         errors = {}
+        stop_search = None
         if user_input is not None:
-            if (
+            user_input = dict(user_input)
+            if stop_search := user_input.pop(CONF_STOP_SEARCH, None):
+                # Searching shows the form again with the matching stops
+                _LOGGER.debug("Searching stops matching %s", stop_search)
+            elif (
                 len(user_input.get(CONF_ROUTE_IDS, [])) > 0
                 or len(user_input.get(CONF_STOP_IDS, [])) > 0
             ):
+                self._key_endpoint_frequencies_by_uri(user_input)
                 self.hub_config |= user_input
                 # There appears to be a bug having the section for specific update intervals
                 # Default any missing ones here
@@ -340,6 +487,13 @@ class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
                         self.hub_config[CONF_STATIC_SOURCES_UPDATE_FREQUENCY][uri] = {
                             "hours": CONF_STATIC_SOURCES_UPDATE_FREQUENCY_DEFAULT
                         }
+                for uri in self.hub_config[CONF_URL_ENDPOINTS]:
+                    if uri not in self.hub_config.setdefault(
+                        CONF_URL_ENDPOINTS_UPDATE_FREQUENCY, {}
+                    ):
+                        self.hub_config[CONF_URL_ENDPOINTS_UPDATE_FREQUENCY][uri] = {
+                            "seconds": CONF_URL_ENDPOINTS_UPDATE_FREQUENCY_DEFAULT
+                        }
                 return self.async_create_entry(
                     title=user_input.get(CONF_GTFS_PROVIDER, "generic_gtfs_provider"),
                     data=self.hub_config,
@@ -349,11 +503,22 @@ class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
                 errors[CONF_STOP_IDS] = CONF_SELECT_AT_LEAST_ONE_STOP_OR_ROUTE
 
         headers = header_dict_from_header_str(self.hub_config.get(CONF_AUTH_HEADER))
+        user_input = user_input or {}
         try:
             stops, routes = await asyncio.gather(
-                self._get_stop_options(headers), self._get_route_options(headers)
+                self._get_stop_options(
+                    headers, stop_search, user_input.get(CONF_STOP_IDS)
+                ),
+                self._get_route_options(headers),
+            )
+            data_schema = self._create_config_schema(
+                stops=stops,
+                routes=routes,
+                selected_stops=user_input.get(CONF_STOP_IDS),
+                selected_routes=user_input.get(CONF_ROUTE_IDS),
+                departures_sensor=user_input.get(CONF_DEPARTURES_SENSOR, False),
+                filter_static_data=user_input.get(CONF_FILTER_STATIC_DATA, False),
             )
-            data_schema = self._create_config_schema(stops=stops, routes=routes)
         except Exception as e:
             errors["base"] = str(e)
             return await self.async_step_choose_static_and_realtime_feeds(
@@ -372,22 +537,31 @@ class GtfsRealtimeConfigFlow(ConfigFlow, domain=DOMAIN):
         """Start reconfigure flow."""
         entry = self._get_reconfigure_entry()
         self.hub_config = entry.data
+        stop_search = None
+        selected = self.hub_config
         if user_input is not None:
-            await self.async_set_unique_id()
-            self._abort_if_unique_id_mismatch()
-            return self.async_update_reload_and_abort(
-                self._get_reconfigure_entry(), data_updates=user_input
-            )
+            user_input = dict(user_input)
+            if not (stop_search := user_input.pop(CONF_STOP_SEARCH, None)):
+                self._key_endpoint_frequencies_by_uri(user_input)
+                await self.async_set_unique_id()
+                self._abort_if_unique_id_mismatch()
+                return self.async_update_reload_and_abort(
+                    self._get_reconfigure_entry(), data_updates=user_input
+                )
+            # Searching shows the form again with the matching stops
+            selected = user_input
 
         stops, routes = await asyncio.gather(
-            self._get_stop_options(),
+            self._get_stop_options(None, stop_search, selected.get(CONF_STOP_IDS, [])),
             self._get_route_options(),
         )
         data_schema = self._create_config_schema(
             stops=stops,
             routes=routes,
-            selected_stops=self.hub_config.get("stop_ids", []),
-            selected_routes=self.hub_config.get("route_ids", []),
+            selected_stops=selected.get(CONF_STOP_IDS, []),
+            selected_routes=selected.get(CONF_ROUTE_IDS, []),
+            departures_sensor=selected.get(CONF_DEPARTURES_SENSOR, False),
+            filter_static_data=selected.get(CONF_FILTER_STATIC_DATA, False),
         )
         return self.async_show_form(
             step_id="reconfigure",
@@ -9,11 +9,18 @@ CONF_AUTH_HEADER = "auth_header"
 CONF_GTFS_STATIC_DATA = "gtfs_static_data"
 CONF_STATIC_SOURCES_UPDATE_FREQUENCY = "static_sources_update_frequency"
 CONF_STATIC_SOURCES_UPDATE_FREQUENCY_DEFAULT = 2  # hours
+CONF_STATE_HEARTBEAT_DEFAULT = 15  # minutes
 CONF_URL_ENDPOINTS = "url_endpoints"
+CONF_URL_ENDPOINTS_UPDATE_FREQUENCY = "url_endpoints_update_frequency"
+CONF_URL_ENDPOINTS_UPDATE_FREQUENCY_DEFAULT = 0  # seconds, on every update
 CONF_ROUTE_ICONS = "route_icons"
+CONF_RATE_LIMIT = "rate_limit"
 CONF_ROUTE_IDS = "route_ids"
 CONF_STOP_IDS = "stop_ids"
 CONF_ARRIVAL_LIMIT = "arrival_limit"
+CONF_DEPARTURES_SENSOR = "departures_sensor"
+CONF_FILTER_STATIC_DATA = "filter_static_data"
+CONF_STOP_SEARCH = "stop_search"
 CONF_VERSION = 2
 CONF_MINOR_VERSION = 0
 
@@ -29,6 +36,9 @@ ROUTE_COLOR = "route_color"
 ROUTE_TEXT_COLOR = "route_text_color"
 HEADSIGN = "headsign"
 ROUTE_TYPE = "route_type"
+DEPARTURES = "departures"
+ARRIVAL_TIME = "time"
+FEED_AGE = "feed_age"
 
 SSI_DB = "station_stop_info_db"
 TI_DB = "trip_info_db"
@@ -1,26 +1,231 @@
 """GTFS Realtime Coordinator."""
 
+import asyncio
 from collections import defaultdict
-from collections.abc import Iterable
-from dataclasses import dataclass, field
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timedelta
+from functools import partial
 import logging
 import os
+import time
 
+from gtfs_station_stop.arrival import Arrival
 from gtfs_station_stop.feed_subject import FeedSubject
 from gtfs_station_stop.route_status import RouteStatus
-from gtfs_station_stop.schedule import GtfsSchedule, async_build_schedule
+from gtfs_station_stop.schedule import GtfsSchedule
 from gtfs_station_stop.station_stop import StationStop
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from gtfs_station_stop.station_stop_info import StationStopInfo
+from gtfs_station_stop.trip_info import TripInfo
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_time_interval,
+)
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+from homeassistant.util import dt as dt_util
 
-from .const import CONF_STATIC_SOURCES_UPDATE_FREQUENCY_DEFAULT, DOMAIN
+from .alerts import AlertIndex
+from .const import (
+    CONF_STATE_HEARTBEAT_DEFAULT,
+    CONF_STATIC_SOURCES_UPDATE_FREQUENCY_DEFAULT,
+    DOMAIN,
+)
+from .datasets import StaticFilter
+from .hub import FeedsUnavailableError, SharedFeedSubject
+from .polling import (
+    MAX_REALTIME_INTERVAL,
+    ScheduledStopTimes,
+    adaptive_realtime_interval,
+)
+from .static import (
+    SharedStaticSource,
+    async_acquire_static_source,
+    async_release_static_source,
+)
+from .stop_index import StopIndex
 
 PARALLEL_UPDATES = 0
 
 _LOGGER = logging.getLogger(__name__)
 
+MIN_NEGATIVE_ARRIVAL_TIME_SECONDS = -120  # 2 minutes
+# Entities recount the time to arrivals this often between realtime updates
+COUNTDOWN_INTERVAL = timedelta(seconds=10)
+
+
+@dataclass(frozen=True, slots=True)
+class StopArrival:
+    """Arrival at a stop, enriched with static schedule data."""
+
+    # POSIX timestamp of the predicted arrival
+    timestamp: float | None
+    route_id: str
+    trip_id: str
+    headsign: str
+    route_color: str
+    route_text_color: str
+    route_type: str
+
+    def time_to_arrival(self, the_time: float | None = None) -> float | None:
+        """Get the seconds until the arrival, from now or the given time."""
+        if self.timestamp is None:
+            return None
+        return self.timestamp - (time.time() if the_time is None else the_time)
+
+
+def snapshot_arrivals(
+    station_stops: Mapping[str, StationStop],
+) -> dict[str, tuple[Arrival, ...]]:
+    """Copy the arrivals of the Station Stops, to index them in another thread."""
+    return {
+        stop_id: tuple(station_stop.arrivals)
+        for stop_id, station_stop in station_stops.items()
+    }
+
+
+def build_arrival_index(
+    stop_arrivals: Mapping[str, tuple[Arrival, ...]],
+    schedule: GtfsSchedule,
+    the_time: float | None = None,
+) -> dict[str, tuple[StopArrival, ...]]:
+    """Build the sorted and filtered arrivals for every stop in one pass.
+
+    The arrivals are a snapshot of the Station Stops, the library makes them
+    relative on Station Stops subscribed to a Feed Subject only this call sees.
+    """
+    if the_time is None:
+        the_time = time.time()
+    stop_times_ds = schedule.stop_times_ds
+    detached = FeedSubject(())
+
+    def _get_time_to_arrivals(
+        stop_id: str, arrivals: tuple[Arrival, ...]
+    ) -> list[Arrival]:
+        station_stop = StationStop(stop_id, detached)
+        station_stop.arrivals = list(arrivals)
+        return station_stop.get_time_to_arrivals(
+            the_time, stop_times_dataset=stop_times_ds
+        )
+
+    # Trip lookups scan the whole trip dataset, so only do them once per trip
+    trip_infos: dict[str, TripInfo | None] = {}
+
+    def _get_trip_info(trip_id: str) -> TripInfo | None:
+        if trip_id not in trip_infos:
+            trip_infos[trip_id] = schedule.trip_info_ds.get_close_match(trip_id)
+        return trip_infos[trip_id]
+
+    def _enrich(arrival: Arrival) -> StopArrival:
+        trip_info = _get_trip_info(arrival.trip)
+        # It's possible the route ID is empty, in that case, get it from the trips database
+        route_id = arrival.route
+        if not route_id and trip_info is not None:
+            route_id = trip_info.route_id
+        return StopArrival(
+            timestamp=None if arrival.time is None else the_time + arrival.time,
+            route_id=route_id,
+            trip_id=arrival.trip,
+            headsign=trip_info.trip_headsign if trip_info is not None else "",
+            route_color=schedule.get_route_color(route_id),
+            route_text_color=schedule.get_route_text_color(route_id),
+            route_type=schedule.get_route_type(route_id),
+        )
+
+    return {
+        stop_id: tuple(
+            _enrich(arrival)
+            for arrival in sorted(_get_time_to_arrivals(stop_id, arrivals))
+            if arrival.time is None or arrival.time > MIN_NEGATIVE_ARRIVAL_TIME_SECONDS
+        )
+        for stop_id, arrivals in stop_arrivals.items()
+    }
+
+
+def drop_departed_arrivals(
+    arrivals: dict[str, tuple[StopArrival, ...]], the_time: float | None = None
+) -> dict[str, tuple[StopArrival, ...]]:
+    """Drop the arrivals that left too long ago to be kept in the index.
+
+    Stops without departed arrivals keep the same tuple, and the same index
+    is returned when nothing departed.
+    """
+    if the_time is None:
+        the_time = time.time()
+    pruned: dict[str, tuple[StopArrival, ...]] = {}
+    departed = False
+    for stop_id, stop_arrivals in arrivals.items():
+        kept = tuple(
+            arrival
+            for arrival in stop_arrivals
+            if (time_to_arrival := arrival.time_to_arrival(the_time)) is None
+            or time_to_arrival > MIN_NEGATIVE_ARRIVAL_TIME_SECONDS
+        )
+        if len(kept) < len(stop_arrivals):
+            pruned[stop_id] = kept
+            departed = True
+        else:
+            pruned[stop_id] = stop_arrivals
+    return pruned if departed else arrivals
+
+
+def merge_schedules(*schedules: GtfsSchedule) -> GtfsSchedule:
+    """Merge schedules from several static sources, later sources take precedence."""
+    if len(schedules) == 1:
+        return schedules[0]
+    merged = GtfsSchedule()
+    for schedule in schedules:
+        merged.calendar.services |= schedule.calendar.services
+        merged.station_stop_info_ds.station_stop_infos |= (
+            schedule.station_stop_info_ds.station_stop_infos
+        )
+        merged.trip_info_ds.trip_infos |= schedule.trip_info_ds.trip_infos
+        merged.route_info_ds.route_infos |= schedule.route_info_ds.route_infos
+        merged.stop_times_ds.stop_times |= schedule.stop_times_ds.stop_times
+    return merged
+
+
+@dataclass(frozen=True, slots=True)
+class RealtimeUpdateTimings:
+    """Seconds spent in each stage of the last realtime update."""
+
+    fetch: float | None
+    decode: float | None
+    index: float
+    # Decoding and the index build ran in the executor, not the event loop
+    offloaded: bool
+
+
+@dataclass(slots=True)
+class StateWriteCounts:
+    """Entity state writes made and skipped, in the last tick and since setup.
+
+    A tick is the coordinator notifying its entities, after a realtime update
+    or a countdown tick.
+    """
+
+    written: int = 0
+    skipped: int = 0
+    last_tick_written: int = 0
+    last_tick_skipped: int = 0
+
+    def begin_tick(self) -> None:
+        """Start counting the writes of a new tick."""
+        self.last_tick_written = 0
+        self.last_tick_skipped = 0
+
+    def record(self, written: bool) -> None:
+        """Count an entity writing its state, or skipping the write."""
+        if written:
+            self.written += 1
+            self.last_tick_written += 1
+        else:
+            self.skipped += 1
+            self.last_tick_skipped += 1
+
 
 @dataclass
 class GtfsUpdateData:
@@ -33,6 +238,8 @@ class GtfsUpdateData:
         default_factory=lambda: defaultdict(dict)
     )
     schedule: GtfsSchedule = field(default_factory=GtfsSchedule)
+    arrivals: dict[str, tuple[StopArrival, ...]] = field(default_factory=dict)
+    alerts: AlertIndex = field(default_factory=AlertIndex)
 
 
 class GtfsRealtimeCoordinator(DataUpdateCoordinator):
@@ -46,6 +253,9 @@ class GtfsRealtimeCoordinator(DataUpdateCoordinator):
         *,
         gtfs_provider: str | None = None,
         static_timedelta: dict[os.PathLike, timedelta] | None = None,
+        endpoint_timedelta: dict[str, timedelta] | None = None,
+        stop_ids: Iterable[str] = (),
+        static_filter: StaticFilter | None = None,
         route_icons: str | None = None,
         **kwargs,
     ) -> None:
@@ -60,53 +270,370 @@ class GtfsRealtimeCoordinator(DataUpdateCoordinator):
             _LOGGER,
             name=DOMAIN,
             update_interval=self.realtime_timedelta,
+            # Entities are only updated when the arrival index changes
+            always_update=False,
         )
         self.static_timedelta = static_timedelta
+        # Realtime endpoints are fetched at most once per interval
+        self.endpoint_timedelta: dict[str, timedelta] = endpoint_timedelta or {}
+        # Limits the trips and stop times loaded, None loads the full schedule
+        self.static_filter = static_filter
         self.kwargs = kwargs
         self.gtfs_provider = gtfs_provider
         self.hub: FeedSubject = feed_subject
-        self.hub.max_api_calls_per_second = 1  # rate limit
+        if isinstance(self.hub, SharedFeedSubject):
+            self.hub.set_endpoint_intervals(self, self.endpoint_timedelta)
         self.gtfs_update_data = GtfsUpdateData()
+        # Arrivals at the configured stops are indexed with or without entities
+        for stop_id in stop_ids:
+            self.gtfs_update_data.station_stops[stop_id] = StationStop(
+                stop_id, self.hub
+            )
+        self._stop_index: StopIndex | None = None
+        self._stop_index_key: tuple[GtfsSchedule, frozenset[str]] | None = None
+        self.realtime_timings: RealtimeUpdateTimings | None = None
+        # Unchanged entity states are written again after this long
+        self.state_heartbeat = timedelta(minutes=CONF_STATE_HEARTBEAT_DEFAULT)
+        self.state_writes = StateWriteCounts()
+        # Refreshes where neither the realtime feeds nor the schedule changed
+        self.skipped_updates = 0
+        self._indexed_generation: int | None = None
+        self._indexed_schedule: GtfsSchedule | None = None
+        self.scheduled_stop_times = ScheduledStopTimes()
+        self._scheduled_stop_times_key: tuple[GtfsSchedule, frozenset[str]] | None = (
+            None
+        )
+        self._unsub_countdown: CALLBACK_TYPE | None = None
         self.gtfs_static_zip: Iterable[os.PathLike] | os.PathLike = gtfs_static_zip
         self.route_icons = route_icons
         self.static_update_targets: set[os.PathLike] = set(gtfs_static_zip)
         self.last_static_update: dict[os.PathLike, datetime] = {}
+        self.static_sources: dict[os.PathLike, SharedStaticSource] = {}
+        self._unsub_static_sources: list[CALLBACK_TYPE] = []
+        self._static_update_timers: dict[os.PathLike, CALLBACK_TYPE] = {}
+        self._static_update_task: asyncio.Task | None = None
         _LOGGER.debug("Setup GTFS Realtime Update Coordinator")
         _LOGGER.debug("Realtime GTFS update interval %s", self.realtime_timedelta)
         for uri, delta in self.static_timedelta.items():
             _LOGGER.info("Static GTFS update interval for %s is %s", uri, delta)
+        for uri, delta in self.endpoint_timedelta.items():
+            _LOGGER.info("Realtime GTFS update interval for %s is %s", uri, delta)
 
-    async def _async_update_data(self) -> GtfsUpdateData:
-        """Fetch data from API endpoint."""
-        self.static_update_targets |= {
-            uri
-            for uri, last_update in self.last_static_update.items()
-            if datetime.now() - last_update
-            > self.static_timedelta.get(
-                uri, timedelta(hours=CONF_STATIC_SOURCES_UPDATE_FREQUENCY_DEFAULT)
+    async def _async_setup(self) -> None:
+        """Load the static schedule before the first realtime update."""
+        for uri in self.gtfs_static_zip:
+            static_source = self.static_sources[uri] = async_acquire_static_source(
+                self.hass, uri, self.kwargs.get("headers"), self.static_filter
             )
-        }
+            self._unsub_static_sources.append(
+                static_source.async_add_listener(
+                    self._async_handle_static_source_update
+                )
+            )
+        # Entity names come from the schedule, so the initial load is awaited,
+        # subsequent refreshes run in the background on a timer for each source.
+        await self._async_load_static_snapshots()
         await self.async_update_static_data()
-        await self.hub.async_update(async_get_clientsession(self.hass))
+        for uri in self.gtfs_static_zip:
+            if uri not in self._static_update_timers:
+                self.async_schedule_static_update(uri)
+        self._unsub_countdown = async_track_time_interval(
+            self.hass,
+            self._async_handle_countdown_tick,
+            COUNTDOWN_INTERVAL,
+            name=f"{DOMAIN} countdown",
+            cancel_on_shutdown=True,
+        )
+
+    async def _async_load_static_snapshots(self) -> None:
+        """Use schedules already loaded by other entries or saved to disk."""
+        uris = list(self.static_update_targets)
+        schedules = await asyncio.gather(
+            *(self.static_sources[uri].async_load_snapshot() for uri in uris)
+        )
+        for uri, schedule in zip(uris, schedules, strict=True):
+            if schedule is None:
+                continue
+            self.static_update_targets.discard(uri)
+            if (last_update := self.static_sources[uri].last_update) is None:
+                # Snapshots from disk are revalidated in the background
+                self.async_schedule_static_update(uri, timedelta(0))
+            else:
+                self.last_static_update[uri] = last_update
+        self.gtfs_update_data.schedule = self._merge_source_schedules()
+
+    def _merge_source_schedules(self) -> GtfsSchedule:
+        schedules = [
+            self.static_sources[uri].schedule
+            for uri in self.gtfs_static_zip
+            if uri in self.static_sources
+            and self.static_sources[uri].schedule is not None
+        ]
+        if not schedules:
+            return GtfsSchedule()
+        return merge_schedules(*schedules)
+
+    @callback
+    def _async_handle_static_source_update(
+        self, static_source: SharedStaticSource, changed: bool
+    ) -> None:
+        """Pick up a refresh of a static source, done by this or another entry."""
+        if static_source.last_update is not None:
+            self.last_static_update[static_source.uri] = static_source.last_update
+        if changed:
+            # Swap in the new schedule in one step so realtime updates never
+            # see a partially updated schedule
+            self.gtfs_update_data.schedule = self._merge_source_schedules()
+        self.async_schedule_static_update(static_source.uri)
+
+    async def _async_update_data(self) -> GtfsUpdateData:
+        """Fetch data from API endpoint, then adapt the interval to the next one."""
+        try:
+            return await self._async_update_arrivals()
+        finally:
+            self._async_adapt_update_interval()
+
+    async def _async_update_arrivals(self) -> GtfsUpdateData:
+        try:
+            await self.hub.async_update()
+        except FeedsUnavailableError as err:
+            raise UpdateFailed(str(err)) from err
+        generation = getattr(self.hub, "generation", None)
+        schedule = self.gtfs_update_data.schedule
+        if (
+            generation is not None
+            and generation == self._indexed_generation
+            and schedule is self._indexed_schedule
+        ):
+            # Returning the same data skips notifying the entities
+            self.skipped_updates += 1
+            _LOGGER.debug(
+                "GTFS Realtime data unchanged, %s updates skipped", self.skipped_updates
+            )
+            return self.gtfs_update_data
+        offloaded = isinstance(self.hub, SharedFeedSubject) and self.hub.offloaded
+        # The hub updates the Station Stops on the event loop, so only a copy
+        # of their arrivals is handed to the executor
+        build = partial(
+            build_arrival_index,
+            snapshot_arrivals(self.gtfs_update_data.station_stops),
+            schedule,
+            time.time(),
+        )
+        start = time.perf_counter()
+        # The index is immutable, so it is handed back to the loop as a whole
+        if offloaded:
+            arrivals = await self.hass.async_add_executor_job(build)
+        else:
+            arrivals = build()
+        self.realtime_timings = RealtimeUpdateTimings(
+            fetch=getattr(self.hub, "last_fetch_duration", None),
+            decode=getattr(self.hub, "last_decode_duration", None),
+            index=time.perf_counter() - start,
+            offloaded=offloaded,
+        )
+        _LOGGER.debug("GTFS Realtime update timings %s", self.realtime_timings)
+        self._indexed_generation = generation
+        self._indexed_schedule = schedule
+        alerts = self.gtfs_update_data.alerts
+        if isinstance(self.hub, SharedFeedSubject):
+            alerts = alerts.rebuild(self.hub.alerts, self.hass.config.language)
+        self.gtfs_update_data = replace(
+            self.gtfs_update_data, arrivals=arrivals, alerts=alerts
+        )
+        scheduled_stop_times_key = (
+            schedule,
+            frozenset(self.gtfs_update_data.station_stops),
+        )
+        if scheduled_stop_times_key != self._scheduled_stop_times_key:
+            collect = partial(
+                ScheduledStopTimes.from_schedule,
+                *scheduled_stop_times_key,
+            )
+            if offloaded:
+                self.scheduled_stop_times = await self.hass.async_add_executor_job(
+                    collect
+                )
+            else:
+                self.scheduled_stop_times = collect()
+            self._scheduled_stop_times_key = scheduled_stop_times_key
         return self.gtfs_update_data
 
+    @callback
+    def _async_adapt_update_interval(self) -> None:
+        """Set the interval to the next realtime update from the latest data."""
+        now = dt_util.now()
+        soonest_arrival = min(
+            (
+                time_to_arrival
+                for arrivals in self.gtfs_update_data.arrivals.values()
+                for arrival in arrivals
+                if (time_to_arrival := arrival.time_to_arrival(now.timestamp()))
+                is not None
+            ),
+            default=None,
+        )
+        next_scheduled_arrival = None
+        calendar = self.gtfs_update_data.schedule.calendar
+        if (
+            soonest_arrival is None
+            and self.scheduled_stop_times.times
+            and calendar.services
+        ):
+            next_arrival = self.scheduled_stop_times.next_arrival(calendar, now)
+            next_scheduled_arrival = (
+                (next_arrival - now).total_seconds()
+                if next_arrival is not None
+                else MAX_REALTIME_INTERVAL.total_seconds()
+            )
+        shared = isinstance(self.hub, SharedFeedSubject)
+        self.update_interval = adaptive_realtime_interval(
+            self.realtime_timedelta,
+            soonest_arrival=soonest_arrival,
+            next_scheduled_arrival=next_scheduled_arrival,
+            feed_update_interval=self.hub.feed_update_interval if shared else None,
+            rate_limit_backoff=(
+                self.hub.get_rate_limit_backoff(self.realtime_timedelta)
+                if shared
+                else None
+            ),
+        )
+        _LOGGER.debug("Next GTFS Realtime update in %s", self.update_interval)
+
+    @property
+    def stop_index(self) -> StopIndex:
+        """Index of the stops with indexed arrivals, rebuilt with the schedule."""
+        key = (
+            self.gtfs_update_data.schedule,
+            frozenset(self.gtfs_update_data.station_stops),
+        )
+        if self._stop_index is None or key != self._stop_index_key:
+            schedule, stop_ids = key
+            self._stop_index = StopIndex(
+                stop_info
+                if (stop_info := schedule.get_stop_info(stop_id)) is not None
+                else StationStopInfo({"stop_id": stop_id})
+                for stop_id in stop_ids
+            )
+            self._stop_index_key = key
+        return self._stop_index
+
+    @property
+    def stale_feed_age(self) -> float | None:
+        """Seconds since the oldest feed served in place of a failing endpoint's."""
+        if isinstance(self.hub, SharedFeedSubject):
+            return self.hub.stale_feed_age
+        return None
+
+    @callback
+    def _async_handle_countdown_tick(self, _now: datetime) -> None:
+        """Drop departed arrivals, recount the time to the rest and the stale age."""
+        # Later arrivals move up without waiting for the feeds to change
+        arrivals = drop_departed_arrivals(self.gtfs_update_data.arrivals)
+        departed = arrivals is not self.gtfs_update_data.arrivals
+        self.gtfs_update_data.arrivals = arrivals
+        if departed or any(arrivals.values()) or self.stale_feed_age is not None:
+            self.async_update_listeners()
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update the entities, counting the state writes of this tick apart."""
+        self.state_writes.begin_tick()
+        super().async_update_listeners()
+
+    async def async_shutdown(self) -> None:
+        """Cancel static updates along with the realtime refresh."""
+        await super().async_shutdown()
+        if self._unsub_countdown is not None:
+            self._unsub_countdown()
+            self._unsub_countdown = None
+        if isinstance(self.hub, SharedFeedSubject):
+            self.hub.remove_endpoint_intervals(self)
+        for cancel in self._static_update_timers.values():
+            cancel()
+        self._static_update_timers.clear()
+        if self._static_update_task is not None:
+            self._static_update_task.cancel()
+            self._static_update_task = None
+        for unsub in self._unsub_static_sources:
+            unsub()
+        self._unsub_static_sources.clear()
+        for static_source in self.static_sources.values():
+            async_release_static_source(self.hass, static_source)
+        self.static_sources.clear()
+
+    @callback
+    def async_set_endpoint_timedelta(self, uri: str, delta: timedelta) -> None:
+        """Set how often a realtime endpoint is fetched."""
+        self.endpoint_timedelta[uri] = delta
+        if isinstance(self.hub, SharedFeedSubject):
+            self.hub.set_endpoint_intervals(self, self.endpoint_timedelta)
+
+    def get_static_timedelta(self, uri: os.PathLike) -> timedelta:
+        """Get the update interval for a static source."""
+        return self.static_timedelta.get(
+            uri, timedelta(hours=CONF_STATIC_SOURCES_UPDATE_FREQUENCY_DEFAULT)
+        )
+
+    @callback
+    def async_schedule_static_update(
+        self, uri: os.PathLike, delay: timedelta | None = None
+    ) -> None:
+        """(Re)arm the timer that refreshes a static source in the background."""
+        if delay is None:
+            if (last_update := self.last_static_update.get(uri)) is None:
+                # Keep the pending refresh of a source that was not updated yet,
+                # such as the revalidation of a snapshot loaded at startup
+                if uri in self._static_update_timers:
+                    return
+                last_update = datetime.now()
+            delay = max(
+                last_update + self.get_static_timedelta(uri) - datetime.now(),
+                timedelta(0),
+            )
+        if (cancel := self._static_update_timers.pop(uri, None)) is not None:
+            cancel()
+        self._static_update_timers[uri] = async_call_later(
+            self.hass, delay, partial(self._async_handle_static_update_due, uri)
+        )
+
+    @callback
+    def _async_handle_static_update_due(self, uri: os.PathLike, _now: datetime) -> None:
+        self._static_update_timers.pop(uri, None)
+        self.static_update_targets.add(uri)
+        if self._static_update_task is None or self._static_update_task.done():
+            self._static_update_task = self.hass.async_create_background_task(
+                self._async_run_static_update(), f"{DOMAIN} static update"
+            )
+
+    async def _async_run_static_update(self) -> None:
+        try:
+            await self.async_update_static_data()
+        except Exception as err:  # noqa: BLE001
+            _LOGGER.error("Failed to update GTFS Static data: %s", err)
+
     async def async_update_static_data(self, clear_old_data=False):
-        """Update or clear static feeds and merge with existing datasets."""
+        """Update or clear static feeds, swapping in the merged schedule when done."""
         # Check for clear old data to reset the datasets
         if clear_old_data:
+            for static_source in self.static_sources.values():
+                static_source.async_clear()
             self.gtfs_update_data.schedule = GtfsSchedule()
             _LOGGER.debug("GTFS Static data cleared")
 
-        if self.gtfs_update_data.schedule == GtfsSchedule():
-            self.gtfs_update_data.schedule = await async_build_schedule(
-                *self.static_update_targets, session=None, **self.kwargs
-            )
-        else:
-            await self.gtfs_update_data.schedule.async_update_schedule(
-                *self.static_update_targets, session=None, **self.kwargs
-            )
-
-        for target in self.static_update_targets:
-            _LOGGER.debug("GTFS Static Feed %s updated", target)
-            self.last_static_update[target] = datetime.now()
-        self.static_update_targets.clear()
+        # Targets may be added by timers while a batch is downloading
+        while self.static_update_targets:
+            targets = list(self.static_update_targets)
+            self.static_update_targets.clear()
+            try:
+                # Sources shared with other entries join their update in progress,
+                # the new schedules are picked up by the source listener
+                await asyncio.gather(
+                    *(self.static_sources[target].async_update() for target in targets)
+                )
+            except:
+                for target in targets:
+                    self.async_schedule_static_update(
+                        target, self.get_static_timedelta(target)
+                    )
+                raise
@@ -0,0 +1,67 @@
+"""Static GTFS datasets limited to the stops and routes of an entry."""
+
+from collections.abc import Collection
+from dataclasses import dataclass
+import hashlib
+import os
+
+from gtfs_station_stop.stop_times import StopTime, StopTimesDataset
+from gtfs_station_stop.trip_info import TripInfo, TripInfoDataset
+
+
+@dataclass(frozen=True, slots=True)
+class StaticFilter:
+    """Stops and routes to load trips and stop times for."""
+
+    stop_ids: frozenset[str] = frozenset()
+    route_ids: frozenset[str] = frozenset()
+
+    @property
+    def key(self) -> str:
+        """Stable identifier of the filter, used to name saved snapshots."""
+        ids = "\n".join([*sorted(self.stop_ids), "", *sorted(self.route_ids)])
+        return hashlib.sha256(ids.encode()).hexdigest()[:16]
+
+
+class FilteredStopTimesDataset(StopTimesDataset):
+    """Stop times dataset that only keeps the given stops."""
+
+    def __init__(
+        self, *gtfs_files: os.PathLike, stop_ids: Collection[str], **kwargs
+    ) -> None:
+        """Initialize the dataset, parsing the given files."""
+        self.stop_ids = frozenset(stop_ids)
+        super().__init__(*gtfs_files, **kwargs)
+
+    def add_gtfs_data(self, zip_filelike) -> None:
+        """Add stop times at the kept stops."""
+        for line in self._get_gtfs_record_iter(zip_filelike, "stop_times.txt"):
+            if line.get("stop_id") not in self.stop_ids:
+                continue
+            stop_time = StopTime(line)
+            self.stop_times.setdefault(stop_time.trip_id, {})[
+                stop_time.stop_sequence
+            ] = stop_time
+
+
+class FilteredTripInfoDataset(TripInfoDataset):
+    """Trip info dataset that only keeps the given trips and routes."""
+
+    def __init__(
+        self,
+        *gtfs_files: os.PathLike,
+        trip_ids: Collection[str],
+        route_ids: Collection[str],
+        **kwargs,
+    ) -> None:
+        """Initialize the dataset, parsing the given files."""
+        self.trip_ids = frozenset(trip_ids)
+        self.route_ids = frozenset(route_ids)
+        super().__init__(*gtfs_files, **kwargs)
+
+    def add_gtfs_data(self, zip_filelike: os.PathLike) -> None:
+        """Add trips stopping at the kept stops or on the kept routes."""
+        for line in self._get_gtfs_record_iter(zip_filelike, "trips.txt"):
+            trip_id = line["trip_id"]
+            if trip_id in self.trip_ids or line.get("route_id") in self.route_ids:
+                self.trip_infos[trip_id] = TripInfo(line)
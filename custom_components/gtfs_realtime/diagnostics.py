@@ -1,10 +1,30 @@
 from dataclasses import asdict
+import time
 from typing import Any
 
 from homeassistant.core import HomeAssistant
 
 from custom_components.gtfs_realtime import GtfsRealtimeConfigEntry
 
+from .helpers import redact_uri
+from .hub import SharedFeedSubject
+
+
+def _get_endpoint_health(hub: SharedFeedSubject) -> dict[str, dict[str, Any]]:
+    """Get the circuit breaker state and error rate of each realtime endpoint."""
+    now = time.monotonic()
+    return {
+        redact_uri(uri): {
+            "breaker": state.get_breaker_state(now),
+            "consecutive_failures": state.failures,
+            "error_rate": state.error_rate,
+            "last_error": state.last_error,
+            "retry_in": state.retry_at and max(state.retry_at - now, 0.0),
+            "stale_age": state.stale_age,
+        }
+        for uri, state in sorted(hub.endpoint_states.items())
+    }
+
 
 async def async_get_config_entry_diagnostics(
     hass: HomeAssistant, entry: GtfsRealtimeConfigEntry
@@ -13,4 +33,13 @@ async def async_get_config_entry_diagnostics(
         "schedule": asdict(entry.runtime_data.data.schedule),
         "last_static_update": entry.runtime_data.last_static_update,
         "static_update_frequency": entry.runtime_data.static_timedelta,
+        "realtime_update_frequency": entry.runtime_data.endpoint_timedelta,
+        "realtime_timings": entry.runtime_data.realtime_timings
+        and asdict(entry.runtime_data.realtime_timings),
+        "realtime_skipped_updates": entry.runtime_data.skipped_updates,
+        "realtime_update_interval": entry.runtime_data.update_interval,
+        "state_writes": asdict(entry.runtime_data.state_writes),
+        "realtime_endpoints": _get_endpoint_health(entry.runtime_data.hub)
+        if isinstance(entry.runtime_data.hub, SharedFeedSubject)
+        else None,
     }
@@ -0,0 +1,67 @@
+"""Base entity for the GTFS Realtime integration."""
+
+from __future__ import annotations
+
+from abc import abstractmethod
+import time
+from typing import Any
+
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import FEED_AGE
+from .coordinator import GtfsRealtimeCoordinator
+
+
+class GtfsRealtimeEntity(CoordinatorEntity[GtfsRealtimeCoordinator]):
+    """Coordinator entity that only writes its state when it changed.
+
+    An unchanged state is still written once the coordinator's state heartbeat
+    has passed since the last write.
+    """
+
+    _last_written_state: tuple[Any, ...] | None = None
+    _last_written_at: float | None = None
+
+    @abstractmethod
+    def update(self) -> None:
+        """Update state from coordinator data."""
+
+    def _get_stale_feed_attributes(self) -> dict[str, int]:
+        """Get the age of the feeds served while an endpoint is failing."""
+        if (age := self.coordinator.stale_feed_age) is None:
+            return {}
+        # Whole minutes, so the countdown does not write the state every tick
+        return {FEED_AGE: int(age // 60)}
+
+    def _get_written_state(self) -> tuple[Any, ...]:
+        """Get everything that is written to the state machine."""
+        return (
+            self.available,
+            self.state,
+            tuple((self.extra_state_attributes or {}).items()),
+            self.icon,
+            self.entity_picture,
+        )
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the state, remembering it to detect changes."""
+        self._last_written_state = self._get_written_state()
+        self._last_written_at = time.monotonic()
+        super().async_write_ha_state()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Update from the coordinator, writing the state only if it changed."""
+        self.update()
+        if (
+            self._last_written_at is not None
+            and time.monotonic() - self._last_written_at
+            < self.coordinator.state_heartbeat.total_seconds()
+            and self._get_written_state() == self._last_written_state
+        ):
+            self.coordinator.state_writes.record(written=False)
+            return
+        self.coordinator.state_writes.record(written=True)
+        super()._handle_coordinator_update()
@@ -1,7 +1,23 @@
 """Helpers for GTFS Realtime."""
 
+import hashlib
+
+from homeassistant.components.diagnostics import REDACTED
+from yarl import URL
+
 
 def header_dict_from_header_str(header: str) -> dict[str, str] | None:
     if header is None or header.strip() == "":
         return None
     return dict([[x.strip() for x in header.split(":")]])
+
+
+def redact_uri(uri: str) -> str:
+    """Redact query parameters, which often carry API keys."""
+    url = URL(uri)
+    return str(url.with_query({key: REDACTED for key in url.query}))
+
+
+def uri_digest(uri: str) -> str:
+    """Get a short digest identifying a URI, without revealing its API keys."""
+    return hashlib.sha256(uri.encode()).hexdigest()[:16]
@@ -0,0 +1,663 @@
+"""Feed Subjects shared between config entries."""
+
+import asyncio
+from collections import deque
+from collections.abc import Collection
+from dataclasses import dataclass, field
+from datetime import timedelta
+from enum import StrEnum
+import hashlib
+from http import HTTPStatus
+import logging
+import time
+from typing import Any
+
+from aiohttp import ClientError, ClientResponseError, ClientSession, TCPConnector
+from aiohttp.hdrs import USER_AGENT
+from google.protobuf.message import DecodeError
+from google.transit import gtfs_realtime_pb2
+from gtfs_station_stop.arrival import Arrival
+from gtfs_station_stop.feed_subject import FeedSubject
+from gtfs_station_stop.station_stop import StationStop
+from gtfs_station_stop.updatable import Updatable
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE
+from homeassistant.util import ssl as ssl_util
+from homeassistant.util.hass_dict import HassKey
+from yarl import URL
+
+from .alerts import FeedAlert, InformedEntity, decode_alerts
+from .const import DOMAIN
+from .ratelimit import DEFAULT_RATE_LIMIT, RateLimit, TokenBucket
+
+_LOGGER = logging.getLogger(__name__)
+
+# Coordinators refreshing within this window of each other share one fetch,
+# half of the default realtime update interval.
+SHARED_FEED_MAX_AGE = timedelta(seconds=30)
+# Number of fetches the age of each endpoint's feed is remembered for
+FEED_AGE_SAMPLES = 10
+# Feeds older than this are stale, or the clocks disagree, rather than slow to update
+MAX_FEED_AGE = timedelta(minutes=15)
+# Endpoints are fetched when their interval is this close to passing, so
+# refreshes scheduled on the interval are not off by a few milliseconds
+ENDPOINT_INTERVAL_TOLERANCE = timedelta(seconds=1)
+# Endpoints waiting longer than this for their host's rate limit are not fetched
+# on this update, their latest feed is used instead
+MAX_RATE_LIMIT_WAIT = timedelta(seconds=10)
+# Connections are kept open and addresses cached across realtime updates
+REALTIME_KEEPALIVE_TIMEOUT = timedelta(minutes=2)
+REALTIME_DNS_CACHE_TTL = timedelta(minutes=10)
+# Consecutive failed fetches after which an endpoint's circuit breaker opens
+BREAKER_FAILURE_THRESHOLD = 3
+# An open breaker lets one fetch through after this long, doubling on every
+# failed attempt up to the maximum
+BREAKER_BACKOFF = timedelta(seconds=30)
+BREAKER_MAX_BACKOFF = timedelta(minutes=30)
+# The last good feed of a failing endpoint is served until it is this old
+MAX_STALE_FEED_AGE = timedelta(minutes=30)
+# Number of fetches the error rate of each endpoint is computed over
+HEALTH_SAMPLES = 20
+# Endpoints rejecting fetches with 429 are polled at most this rarely, the
+# longest realtime update interval
+MAX_RATE_LIMIT_BACKOFF = timedelta(minutes=15)
+MAX_RATE_LIMIT_DOUBLINGS = 10
+
+type FeedSubjectKey = tuple[frozenset[str], frozenset[tuple[str, Any]]]
+
+DATA_FEED_SUBJECTS: HassKey[dict[FeedSubjectKey, "SharedFeedSubject"]] = HassKey(
+    f"{DOMAIN}_feed_subjects"
+)
+DATA_HOST_RATE_LIMITS: HassKey[dict[str, TokenBucket]] = HassKey(
+    f"{DOMAIN}_host_rate_limits"
+)
+DATA_REALTIME_SESSION: HassKey[ClientSession] = HassKey(f"{DOMAIN}_realtime_session")
+
+
+@callback
+def async_get_realtime_session(hass: HomeAssistant) -> ClientSession:
+    """Get the session realtime feeds are fetched with, creating it if needed.
+
+    Unlike the shared Home Assistant session, its connections outlive the
+    interval between realtime updates.
+    """
+    if (session := hass.data.get(DATA_REALTIME_SESSION)) is None:
+        session = hass.data[DATA_REALTIME_SESSION] = ClientSession(
+            connector=TCPConnector(
+                ssl=ssl_util.client_context(),
+                keepalive_timeout=REALTIME_KEEPALIVE_TIMEOUT.total_seconds(),
+                ttl_dns_cache=int(REALTIME_DNS_CACHE_TTL.total_seconds()),
+            ),
+            headers={USER_AGENT: SERVER_SOFTWARE},
+        )
+
+        async def _async_close_session(_event: Event) -> None:
+            await async_close_realtime_session(hass)
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_session)
+    return session
+
+
+async def async_close_realtime_session(hass: HomeAssistant) -> None:
+    """Close the session realtime feeds are fetched with."""
+    if (session := hass.data.pop(DATA_REALTIME_SESSION, None)) is not None:
+        await session.close()
+
+
+class FeedsUnavailableError(HomeAssistantError):
+    """Raised when every realtime endpoint failed and no feed is left to serve."""
+
+
+class BreakerState(StrEnum):
+    """State of the circuit breaker of a realtime endpoint."""
+
+    # Fetched on every update
+    CLOSED = "closed"
+    # Not fetched until its backoff has passed
+    OPEN = "open"
+    # Backoff passed, the next fetch decides whether it closes again
+    HALF_OPEN = "half_open"
+
+
+def feed_header_timestamp(payload: bytes) -> int | None:
+    """Read the header timestamp of a feed without decoding its entities."""
+    # The header is field 1 of the FeedMessage, which encoders write first
+    if not payload or payload[0] != 0x0A:
+        return None
+    length = shift = 0
+    pos = 1
+    while pos < len(payload):
+        byte = payload[pos]
+        length |= (byte & 0x7F) << shift
+        pos += 1
+        if not byte & 0x80:
+            break
+        shift += 7
+    try:
+        header = gtfs_realtime_pb2.FeedHeader.FromString(payload[pos : pos + length])
+    except DecodeError:
+        return None
+    return header.timestamp if header.HasField("timestamp") else None
+
+
+def _retry_after(err: ClientResponseError) -> float | None:
+    """Get the seconds to wait from a Retry-After header, if given in seconds."""
+    try:
+        return float((err.headers or {}).get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+@dataclass(slots=True)
+class EndpointState:
+    """Last fetched version of a realtime endpoint."""
+
+    digest: bytes | None = None
+    header_timestamp: int | None = None
+    # Latest payload, merged into every update until the endpoint is fetched again
+    payload: bytes | None = None
+    # Monotonic time the latest payload was requested
+    fetched_at: float | None = None
+    # Seconds since the header timestamp when each of the last feeds was fetched
+    feed_ages: deque[float] = field(
+        default_factory=lambda: deque(maxlen=FEED_AGE_SAMPLES)
+    )
+    # Consecutive fetches rejected with HTTP 429
+    rate_limited: int = 0
+    retry_after: float | None = None
+    # Consecutive failed fetches, the breaker opens at the threshold
+    failures: int = 0
+    # Monotonic time an open breaker lets the next fetch through
+    retry_at: float | None = None
+    last_error: str | None = None
+    # POSIX time the latest payload was fetched
+    last_success: float | None = None
+    # Whether each of the last fetches succeeded
+    results: deque[bool] = field(default_factory=lambda: deque(maxlen=HEALTH_SAMPLES))
+
+    def update(self, payload: bytes) -> bool:
+        """Record a fetched payload, returning if it differs from the last one."""
+        digest = hashlib.blake2b(payload, digest_size=16).digest()
+        header_timestamp = feed_header_timestamp(payload)
+        changed = digest != self.digest and (
+            not header_timestamp or header_timestamp != self.header_timestamp
+        )
+        self.digest = digest
+        self.header_timestamp = header_timestamp
+        self.payload = payload
+        if (
+            header_timestamp
+            and (age := max(time.time() - header_timestamp, 0.0))
+            <= MAX_FEED_AGE.total_seconds()
+        ):
+            self.feed_ages.append(age)
+        self.rate_limited = 0
+        self.retry_after = None
+        self.failures = 0
+        self.retry_at = None
+        self.last_error = None
+        self.last_success = time.time()
+        self.results.append(True)
+        return changed
+
+    def update_rate_limited(self, retry_after: float | None) -> None:
+        """Record a fetch rejected for exceeding the rate limit."""
+        self.rate_limited += 1
+        self.retry_after = retry_after
+
+    def update_failed(self, err: Exception) -> None:
+        """Record a failed fetch, opening the breaker after too many in a row."""
+        self.failures += 1
+        self.last_error = str(err) or type(err).__name__
+        self.results.append(False)
+        if self.failures >= BREAKER_FAILURE_THRESHOLD:
+            backoff = min(
+                BREAKER_BACKOFF * 2 ** (self.failures - BREAKER_FAILURE_THRESHOLD),
+                BREAKER_MAX_BACKOFF,
+            )
+            self.retry_at = time.monotonic() + backoff.total_seconds()
+
+    def expire_stale_payload(self) -> bool:
+        """Drop the payload of a failing endpoint once it is too old to serve."""
+        if (
+            self.failures
+            and self.payload is not None
+            and self.last_success is not None
+            and time.time() - self.last_success > MAX_STALE_FEED_AGE.total_seconds()
+        ):
+            self.digest = self.header_timestamp = self.payload = None
+            return True
+        return False
+
+    def get_breaker_state(self, now: float) -> BreakerState:
+        """Get the state of the circuit breaker at a monotonic time."""
+        if self.retry_at is None:
+            return BreakerState.CLOSED
+        return BreakerState.OPEN if now < self.retry_at else BreakerState.HALF_OPEN
+
+    @property
+    def stale_age(self) -> float | None:
+        """Seconds since the payload of a failing endpoint was fetched."""
+        if not self.failures or self.payload is None or self.last_success is None:
+            return None
+        return max(time.time() - self.last_success, 0.0)
+
+    @property
+    def error_rate(self) -> float | None:
+        """Share of the last fetches that failed."""
+        if not self.results:
+            return None
+        return self.results.count(False) / len(self.results)
+
+    @property
+    def update_interval(self) -> float | None:
+        """Estimate the seconds between updates of the feed.
+
+        A feed fetched at random points of its update cycle is at most one
+        cycle old, so the oldest recent feed bounds how often it changes.
+        """
+        return max(self.feed_ages) if self.feed_ages else None
+
+
+def decode_stop_arrivals(
+    feed: gtfs_realtime_pb2.FeedMessage, stop_ids: Collection[str]
+) -> dict[str, tuple[Arrival, ...]]:
+    """Get the arrivals of a feed at the given stops.
+
+    The library decodes them into Station Stops subscribed to a Feed Subject
+    only the caller sees, so it can run in any thread.
+    """
+    detached = FeedSubject(())
+    station_stops = [StationStop(stop_id, detached) for stop_id in stop_ids]
+    detached._notify_stop_updates(feed)
+    return {
+        station_stop.id: tuple(station_stop.arrivals)
+        for station_stop in station_stops
+        if station_stop.arrivals
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class DecodedFeeds:
+    """Arrivals and alerts decoded from the merged feeds, not yet notified."""
+
+    arrivals: dict[str, tuple[Arrival, ...]]
+    alerts: dict[FeedAlert, frozenset[InformedEntity]]
+
+
+class SharedFeedSubject(FeedSubject):
+    """Feed Subject that fetches and decodes once for every entry subscribed.
+
+    With a Home Assistant instance, the feeds are decoded in the executor and
+    only the network requests and notifying the subscribers run on the event
+    loop, so the subscribers are never changed while entries subscribe.
+    When no endpoint changed since the last fetch, decoding is skipped and the
+    subscribers keep their data.
+
+    Each endpoint can be given an interval it is fetched at most once per,
+    the latest payload of the endpoints not due yet is decoded along with the
+    fetched ones.
+
+    An endpoint failing to be fetched does not fail the update, its last good
+    payload keeps being served until it is too old. After repeated failures
+    its circuit breaker opens and it is only retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        realtime_feed_uris: Collection[str],
+        *,
+        hass: HomeAssistant | None = None,
+        max_age: timedelta = SHARED_FEED_MAX_AGE,
+        **kwargs,
+    ) -> None:
+        """Initialize the shared Feed Subject."""
+        super().__init__(realtime_feed_uris, **kwargs)
+        self.hass = hass
+        self.max_age = max_age
+        self.ref_count = 0
+        self.last_update: float | None = None
+        # Seconds spent waiting on the endpoints and decoding the last update
+        self.last_fetch_duration: float | None = None
+        self.last_decode_duration: float | None = None
+        self.endpoint_states: dict[str, EndpointState] = {}
+        # Active alerts of the latest feeds, indexed by each entry's coordinator
+        self.alerts: dict[FeedAlert, frozenset[InformedEntity]] = {}
+        # Incremented every time the subscribers are updated
+        self.generation = 0
+        self.skipped_updates = 0
+        self._subscribers_changed = True
+        self._pending_update: asyncio.Task | None = None
+        # Intervals each entry sharing the Feed Subject set for the endpoints
+        self._endpoint_intervals: dict[object, dict[str, timedelta]] = {}
+        # Rate limits of the endpoints' hosts, shared with other Feed Subjects
+        self.rate_limits: dict[str, TokenBucket] = {}
+
+    @property
+    def offloaded(self) -> bool:
+        """Return if feeds are decoded in the executor."""
+        return self.hass is not None
+
+    async def async_update(self, session: ClientSession | None = None) -> None:
+        """Update subscribers, unless another entry just did or is doing so."""
+        if self._pending_update is None:
+            if (
+                self.last_update is not None
+                and time.monotonic() - self.last_update < self.max_age.total_seconds()
+            ):
+                return
+            self._pending_update = asyncio.create_task(self._async_update(session))
+        # Shielded so one entry being cancelled does not cancel the others' update
+        await asyncio.shield(self._pending_update)
+
+    @callback
+    def set_endpoint_intervals(
+        self, owner: object, intervals: dict[str, timedelta]
+    ) -> None:
+        """Set the intervals an entry wants the endpoints fetched at."""
+        self._endpoint_intervals[owner] = intervals
+
+    @callback
+    def remove_endpoint_intervals(self, owner: object) -> None:
+        """Remove the intervals set by an entry."""
+        self._endpoint_intervals.pop(owner, None)
+
+    def get_endpoint_interval(self, uri: str) -> timedelta:
+        """Get the interval of an endpoint, the shortest any entry sharing it set."""
+        return min(
+            (
+                intervals[uri]
+                for intervals in self._endpoint_intervals.values()
+                if uri in intervals
+            ),
+            default=timedelta(0),
+        )
+
+    def _is_endpoint_due(self, uri: str, now: float) -> bool:
+        state = self._get_endpoint_state(uri)
+        if state.get_breaker_state(now) is BreakerState.OPEN:
+            return False
+        return (
+            state.fetched_at is None
+            or now - state.fetched_at
+            >= (
+                self.get_endpoint_interval(uri) - ENDPOINT_INTERVAL_TOLERANCE
+            ).total_seconds()
+        )
+
+    def _get_due_endpoints(self, now: float) -> list[str]:
+        return [
+            uri for uri in self.realtime_feed_uris if self._is_endpoint_due(uri, now)
+        ]
+
+    def _get_endpoint_state(self, uri: str) -> EndpointState:
+        return self.endpoint_states.setdefault(uri, EndpointState())
+
+    async def _async_update(self, session: ClientSession | None) -> None:
+        try:
+            now = time.monotonic()
+            due = self._get_due_endpoints(now)
+            if self.realtime_feed_uris and not due and not self._subscribers_changed:
+                self.skipped_updates += 1
+                _LOGGER.debug("No GTFS Realtime feeds due to be fetched")
+                return
+            start = time.perf_counter()
+            payloads = await self.async_fetch_feeds(session, due) if due else {}
+            self.last_fetch_duration = time.perf_counter() - start
+            # Entries refreshing after every due endpoint failed fetch them again
+            if payloads or not due:
+                self.last_update = time.monotonic()
+            for uri in payloads:
+                self._get_endpoint_state(uri).fetched_at = now
+            changed = self._track_changes(payloads)
+            states = [self._get_endpoint_state(uri) for uri in self.realtime_feed_uris]
+            for state in states:
+                if state.expire_stale_payload():
+                    changed = True
+            if all(state.payload is None for state in states) and (
+                errors := [state.last_error for state in states if state.failures]
+            ):
+                raise FeedsUnavailableError(
+                    f"Failed to fetch every GTFS Realtime feed: {'; '.join(errors)}"
+                )
+            if not changed:
+                self.skipped_updates += 1
+                _LOGGER.debug(
+                    "GTFS Realtime feeds unchanged, %s updates skipped",
+                    self.skipped_updates,
+                )
+                return
+            # Endpoints that were not due keep contributing their latest feed
+            payload_list = [
+                payload
+                for uri in self.realtime_feed_uris
+                if (payload := self._get_endpoint_state(uri).payload) is not None
+            ]
+            # Stops subscribing while decoding are updated by the next update
+            stop_ids = frozenset(self.subscribers)
+            if self.hass is not None:
+                decoded = await self.hass.async_add_executor_job(
+                    self._decode, payload_list, stop_ids
+                )
+            else:
+                decoded = self._decode(payload_list, stop_ids)
+            self._notify(decoded)
+            self.generation += 1
+        finally:
+            self._pending_update = None
+
+    @property
+    def feed_update_interval(self) -> float | None:
+        """Estimate the seconds between updates of the fastest changing endpoint."""
+        intervals = [
+            interval
+            for state in self.endpoint_states.values()
+            if (interval := state.update_interval) is not None
+        ]
+        return min(intervals) if intervals else None
+
+    def get_rate_limit_backoff(self, base: timedelta) -> timedelta | None:
+        """Get how long to wait before polling endpoints rejecting fetches with 429.
+
+        The wait doubles from the base interval on every consecutive rejection,
+        unless the endpoint asked for longer, up to the maximum backoff.
+        """
+        backoffs = [
+            min(
+                max(
+                    base * 2 ** min(state.rate_limited, MAX_RATE_LIMIT_DOUBLINGS),
+                    timedelta(
+                        seconds=min(
+                            state.retry_after or 0,
+                            MAX_RATE_LIMIT_BACKOFF.total_seconds(),
+                        )
+                    ),
+                ),
+                MAX_RATE_LIMIT_BACKOFF,
+            )
+            for state in self.endpoint_states.values()
+            if state.rate_limited
+        ]
+        return max(backoffs) if backoffs else None
+
+    @property
+    def stale_feed_age(self) -> float | None:
+        """Seconds since the oldest feed served in place of a failing endpoint's."""
+        ages = [
+            age
+            for uri in self.realtime_feed_uris
+            if (age := self._get_endpoint_state(uri).stale_age) is not None
+        ]
+        return max(ages) if ages else None
+
+    async def _async_request_gtfs_feed(
+        self, session: ClientSession, uri: str
+    ) -> bytes | None:
+        """Request an endpoint, or return None if its host's rate limit is reached."""
+        if (
+            rate_limit := self.rate_limits.get(URL(uri).host or "")
+        ) is not None and not await rate_limit.async_acquire(
+            MAX_RATE_LIMIT_WAIT.total_seconds()
+        ):
+            _LOGGER.debug("Rate limit reached, not fetching %s", uri)
+            return None
+        try:
+            return await super()._async_request_gtfs_feed(session, uri)
+        except ClientResponseError as err:
+            if err.status == HTTPStatus.TOO_MANY_REQUESTS:
+                self._get_endpoint_state(uri).update_rate_limited(_retry_after(err))
+                _LOGGER.warning("GTFS Realtime feed %s is rate limited", uri)
+            raise
+
+    async def _async_fetch_endpoint(
+        self, session: ClientSession, uri: str
+    ) -> bytes | None:
+        """Request an endpoint, recording a failure instead of raising it."""
+        try:
+            return await self._async_request_gtfs_feed(session, uri)
+        except (ClientError, TimeoutError) as err:
+            state = self._get_endpoint_state(uri)
+            state.update_failed(err)
+            _LOGGER.warning(
+                "Failed to fetch GTFS Realtime feed %s (%s in a row): %s",
+                uri,
+                state.failures,
+                state.last_error,
+            )
+            return None
+
+    async def async_fetch_feeds(
+        self,
+        session: ClientSession | None = None,
+        uris: Collection[str] | None = None,
+    ) -> dict[str, bytes]:
+        """Fetch the undecoded payload of the given endpoints, or all of them.
+
+        Endpoints are fetched concurrently, within the rate limits of their
+        hosts. Endpoints skipped to respect the rate limits or failing to be
+        fetched are left out.
+        """
+        if session is None:
+            if self.hass is None:
+                async with ClientSession() as _session:
+                    return await self.async_fetch_feeds(_session, uris)
+            session = async_get_realtime_session(self.hass)
+        if uris is None:
+            uris = self.realtime_feed_uris
+        async with asyncio.TaskGroup() as tg:
+            tasks = {
+                uri: tg.create_task(self._async_fetch_endpoint(session, uri))
+                for uri in uris
+            }
+        return {
+            uri: payload
+            for uri, task in tasks.items()
+            if (payload := task.result()) is not None
+        }
+
+    def _track_changes(self, payloads: dict[str, bytes]) -> bool:
+        """Record the fetched payloads, returning if the subscribers need updating."""
+        changed = [
+            self._get_endpoint_state(uri).update(payload)
+            for uri, payload in payloads.items()
+        ]
+        # New subscribers have not seen the current feeds yet
+        if self._subscribers_changed or not self.realtime_feed_uris or any(changed):
+            self._subscribers_changed = False
+            return True
+        return False
+
+    def subscribe(self, updatable: Updatable) -> None:
+        """Add an informed entity as a subscriber."""
+        super().subscribe(updatable)
+        self._subscribers_changed = True
+
+    def _decode(self, payloads: list[bytes], stop_ids: frozenset[str]) -> DecodedFeeds:
+        """Decode and merge the payloads, without touching the subscribers."""
+        start = time.perf_counter()
+        feed = gtfs_realtime_pb2.FeedMessage()
+        for payload in payloads:
+            feed.MergeFromString(payload)
+        decoded = DecodedFeeds(
+            decode_stop_arrivals(feed, stop_ids), decode_alerts(feed)
+        )
+        self.last_decode_duration = time.perf_counter() - start
+        return decoded
+
+    @callback
+    def _notify(self, decoded: DecodedFeeds) -> None:
+        """Update the subscribers with the decoded feeds."""
+        self._reset_subscribers()
+        for stop_id, arrivals in decoded.arrivals.items():
+            for subscriber in self.subscribers.get(stop_id, ()):
+                if hasattr(subscriber, "arrivals"):
+                    subscriber.arrivals.extend(arrivals)
+        self.alerts = decoded.alerts
+
+
+def _feed_subject_key(
+    realtime_feed_uris: Collection[str], headers: dict[str, Any] | None
+) -> FeedSubjectKey:
+    return frozenset(realtime_feed_uris), frozenset((headers or {}).items())
+
+
+@callback
+def _async_get_host_rate_limit(
+    hass: HomeAssistant, host: str, rate_limit: RateLimit | None
+) -> TokenBucket:
+    """Get the rate limit of a host, restricting it to the given one."""
+    host_rate_limits = hass.data.setdefault(DATA_HOST_RATE_LIMITS, {})
+    if (bucket := host_rate_limits.get(host)) is None:
+        bucket = host_rate_limits[host] = TokenBucket(rate_limit or DEFAULT_RATE_LIMIT)
+    elif rate_limit is not None:
+        bucket.restrict(rate_limit)
+    return bucket
+
+
+@callback
+def async_acquire_feed_subject(
+    hass: HomeAssistant,
+    realtime_feed_uris: Collection[str],
+    headers: dict[str, Any] | None = None,
+    rate_limit: RateLimit | None = None,
+) -> SharedFeedSubject:
+    """Get the Feed Subject for a set of endpoints, creating it if needed.
+
+    Requests to each host are limited to the given rate, or the default one,
+    across every Feed Subject fetching from it.
+    """
+    feed_subjects = hass.data.setdefault(DATA_FEED_SUBJECTS, {})
+    key = _feed_subject_key(realtime_feed_uris, headers)
+    if (feed_subject := feed_subjects.get(key)) is None:
+        feed_subject = feed_subjects[key] = SharedFeedSubject(
+            realtime_feed_uris, hass=hass, headers=headers
+        )
+    else:
+        _LOGGER.debug("Sharing GTFS Realtime feeds %s", sorted(realtime_feed_uris))
+    for uri in realtime_feed_uris:
+        host = URL(uri).host or ""
+        feed_subject.rate_limits[host] = _async_get_host_rate_limit(
+            hass, host, rate_limit
+        )
+    feed_subject.ref_count += 1
+    return feed_subject
+
+
+@callback
+def async_release_feed_subject(
+    hass: HomeAssistant, feed_subject: SharedFeedSubject
+) -> None:
+    """Release a Feed Subject, dropping it once no entry uses it."""
+    feed_subject.ref_count -= 1
+    if feed_subject.ref_count > 0:
+        return
+    feed_subjects = hass.data.get(DATA_FEED_SUBJECTS, {})
+    for key, registered in list(feed_subjects.items()):
+        if registered is feed_subject:
+            del feed_subjects[key]
+    if not feed_subjects:
+        hass.async_create_background_task(
+            async_close_realtime_session(hass), f"{DOMAIN} close realtime session"
+        )
@@ -18,17 +18,26 @@ from homeassistant.const import EntityCategory, UnitOfTime
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from yarl import URL
 
 from custom_components.gtfs_realtime.coordinator import GtfsRealtimeCoordinator
 
-from .const import CONF_STATIC_SOURCES_UPDATE_FREQUENCY_DEFAULT, DOMAIN
+from .const import (
+    CONF_STATE_HEARTBEAT_DEFAULT,
+    CONF_STATIC_SOURCES_UPDATE_FREQUENCY_DEFAULT,
+    CONF_URL_ENDPOINTS_UPDATE_FREQUENCY_DEFAULT,
+    DOMAIN,
+)
+from .helpers import uri_digest
 
 
 @dataclass(frozen=True, kw_only=True)
 class GtfsRealtimeNumberDescription(NumberEntityDescription):
     """Describes GTFS Realtime number entity."""
 
-    store_value_fn: Callable[[GtfsRealtimeCoordinator, os.PathLike, float | None], None]
+    store_value_fn: Callable[
+        [GtfsRealtimeCoordinator, os.PathLike | None, float | None], None
+    ]
 
 
 def store_refresh_hours(
@@ -36,8 +45,29 @@ def store_refresh_hours(
     gtfs_static_source: os.PathLike,
     value: float | None,
 ):
-    """Store the desired update frequency."""
+    """Store the desired update frequency and reschedule the source's update."""
     coordinator.static_timedelta[str(gtfs_static_source)] = timedelta(hours=value)
+    coordinator.async_schedule_static_update(gtfs_static_source)
+
+
+def store_realtime_refresh_seconds(
+    coordinator: GtfsRealtimeCoordinator,
+    realtime_endpoint: str,
+    value: float | None,
+):
+    """Store how often a realtime endpoint is fetched."""
+    coordinator.async_set_endpoint_timedelta(
+        realtime_endpoint, timedelta(seconds=value)
+    )
+
+
+def store_state_heartbeat_minutes(
+    coordinator: GtfsRealtimeCoordinator,
+    _gtfs_static_source: os.PathLike | None,
+    value: float | None,
+):
+    """Store how often unchanged entity states are written."""
+    coordinator.state_heartbeat = timedelta(minutes=value)
 
 
 NUMBER_TYPES: list[GtfsRealtimeNumberDescription] = [
@@ -51,7 +81,29 @@ NUMBER_TYPES: list[GtfsRealtimeNumberDescription] = [
         native_step=0.5,
         native_unit_of_measurement=UnitOfTime.HOURS,
         store_value_fn=store_refresh_hours,
-    )
+    ),
+    GtfsRealtimeNumberDescription(
+        key="state_heartbeat",
+        translation_key="state_heartbeat",
+        device_class=NumberDeviceClass.DURATION,
+        entity_category=EntityCategory.CONFIG,
+        native_max_value=1440.0,
+        native_min_value=0.0,
+        native_step=1.0,
+        native_unit_of_measurement=UnitOfTime.MINUTES,
+        store_value_fn=store_state_heartbeat_minutes,
+    ),
+    GtfsRealtimeNumberDescription(
+        key="realtime_refresh",
+        translation_key="realtime_refresh",
+        device_class=NumberDeviceClass.DURATION,
+        entity_category=EntityCategory.CONFIG,
+        native_max_value=3600.0,
+        native_min_value=0.0,
+        native_step=5.0,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        store_value_fn=store_realtime_refresh_seconds,
+    ),
 ]
 
 
@@ -70,6 +122,11 @@ async def async_setup_entry(
         )
         for gtfs_static_source in coordinator.gtfs_static_zip
     )
+    async_add_entities([GtfsStateHeartbeat(coordinator, NUMBER_TYPES[1])])
+    async_add_entities(
+        GtfsRealtimeUpdateInterval(coordinator, realtime_endpoint, NUMBER_TYPES[2])
+        for realtime_endpoint in sorted(coordinator.hub.realtime_feed_uris)
+    )
 
 
 class GtfsStaticUpdateInterval(RestoreNumber):
@@ -124,3 +181,109 @@ class GtfsStaticUpdateInterval(RestoreNumber):
             name="GTFS Schedule",
             manufacturer=self.coordinator.gtfs_provider,
         )
+
+
+class GtfsStateHeartbeat(RestoreNumber):
+    """Number entity for setting how often unchanged states are written."""
+
+    entity_description: GtfsRealtimeNumberDescription
+
+    def __init__(
+        self,
+        coordinator: GtfsRealtimeCoordinator,
+        description: GtfsRealtimeNumberDescription,
+    ):
+        self.coordinator = coordinator
+        self.entity_description = description
+        self._attr_unique_id = (
+            f"state_heartbeat-{self.coordinator.config_entry.entry_id}"
+        )
+        self._attr_name = "State Heartbeat"
+        self._attr_native_value = self.coordinator.state_heartbeat.total_seconds() / 60
+
+    async def async_set_native_value(self, value: float):
+        """Update the current heartbeat."""
+        self._attr_native_value = value
+        self.entity_description.store_value_fn(self.coordinator, None, value)
+        self.async_write_ha_state()
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        last_number_data = await self.async_get_last_number_data()
+        value = (
+            last_number_data.native_value
+            if last_number_data is not None
+            else CONF_STATE_HEARTBEAT_DEFAULT
+        )
+        self._attr_native_value = value
+        self.entity_description.store_value_fn(self.coordinator, None, value)
+
+    @cached_property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, ",".join(self.coordinator.gtfs_static_zip))},
+            name="GTFS Schedule",
+            manufacturer=self.coordinator.gtfs_provider,
+        )
+
+
+class GtfsRealtimeUpdateInterval(RestoreNumber):
+    """Number entity for setting how often a realtime endpoint is fetched."""
+
+    entity_description: GtfsRealtimeNumberDescription
+
+    def __init__(
+        self,
+        coordinator: GtfsRealtimeCoordinator,
+        realtime_endpoint: str,
+        description: GtfsRealtimeNumberDescription,
+    ):
+        self.coordinator = coordinator
+        self._realtime_endpoint = realtime_endpoint
+        self.entity_description = description
+        # Endpoints often carry API keys in their query string, so neither
+        # the registry nor the name holds the full URL
+        self._attr_unique_id = (
+            f"realtime_update_interval-{self.coordinator.config_entry.entry_id}"
+            f"-{uri_digest(realtime_endpoint)}"
+        )
+        url = URL(realtime_endpoint)
+        self._attr_name = f"Realtime Feed Interval: {url.host}{url.path}"
+        self._attr_native_value = self.coordinator.endpoint_timedelta.get(
+            self._realtime_endpoint,
+            timedelta(seconds=CONF_URL_ENDPOINTS_UPDATE_FREQUENCY_DEFAULT),
+        ).total_seconds()
+
+    async def async_set_native_value(self, value: float):
+        """Update the current interval."""
+        self._attr_native_value = value
+        self.entity_description.store_value_fn(
+            self.coordinator, self._realtime_endpoint, value
+        )
+        self.async_write_ha_state()
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        last_number_data = await self.async_get_last_number_data()
+        if last_number_data is not None:
+            self._attr_native_value = last_number_data.native_value
+        self.entity_description.store_value_fn(
+            self.coordinator, self._realtime_endpoint, self._attr_native_value
+        )
+
+    @cached_property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            identifiers={
+                (
+                    DOMAIN,
+                    uri_digest(
+                        ",".join(sorted(self.coordinator.hub.realtime_feed_uris))
+                    ),
+                )
+            },
+            name="GTFS Realtime",
+            manufacturer=self.coordinator.gtfs_provider,
+        )
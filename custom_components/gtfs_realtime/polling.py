@@ -0,0 +1,104 @@
+"""Adaptive polling interval for the realtime feeds."""
+
+from bisect import bisect_right
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Self
+
+from gtfs_station_stop.calendar import Calendar
+from gtfs_station_stop.schedule import GtfsSchedule
+from homeassistant.util import dt as dt_util
+
+from .hub import SHARED_FEED_MAX_AGE
+
+# Entries refreshing more often than this would share the last fetch anyway
+MIN_REALTIME_INTERVAL = SHARED_FEED_MAX_AGE
+MAX_REALTIME_INTERVAL = timedelta(minutes=15)
+# Poll as often as possible while an arrival is this close
+IMMINENT_ARRIVAL = timedelta(minutes=5)
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduledStopTimes:
+    """Scheduled times of day of the trips stopping at a set of stops."""
+
+    # Seconds after the start of the service day and the trip's service ID
+    times: tuple[tuple[int, str], ...] = ()
+
+    @classmethod
+    def from_schedule(cls, schedule: GtfsSchedule, stop_ids: Iterable[str]) -> Self:
+        """Collect the scheduled times at the stops, sorted by time of day."""
+        stop_ids = frozenset(stop_ids)
+        trip_infos = schedule.trip_info_ds.trip_infos
+        times: list[tuple[int, str]] = []
+        for trip_id, stop_times in schedule.stop_times_ds.stop_times.items():
+            if (trip_info := trip_infos.get(trip_id)) is None:
+                continue
+            for stop_time in stop_times.values():
+                arrival_time = stop_time.arrival_time or stop_time.departure_time
+                if stop_time.stop_id not in stop_ids or arrival_time is None:
+                    continue
+                times.append(
+                    (
+                        arrival_time.hour * 3600
+                        + arrival_time.minute * 60
+                        + arrival_time.second,
+                        trip_info.service_id,
+                    )
+                )
+        return cls(tuple(sorted(times)))
+
+    def next_arrival(self, calendar: Calendar, now: datetime) -> datetime | None:
+        """Get the next scheduled arrival of a running service, up to tomorrow.
+
+        Times are allowed past midnight, so yesterday's service is checked too.
+        """
+        next_arrivals = []
+        for days in (-1, 0, 1):
+            service_date = now.date() + timedelta(days=days)
+            service_ids = {
+                service.service_id
+                for service in calendar.get_active_services(service_date)
+            }
+            start = dt_util.start_of_local_day(service_date)
+            elapsed = (now - start).total_seconds()
+            first = bisect_right(self.times, elapsed, key=lambda time: time[0])
+            for seconds, service_id in self.times[first:]:
+                if service_id in service_ids:
+                    next_arrivals.append(start + timedelta(seconds=seconds))
+                    break
+        return min(next_arrivals, default=None)
+
+
+def adaptive_realtime_interval(
+    base: timedelta,
+    *,
+    soonest_arrival: float | None = None,
+    next_scheduled_arrival: float | None = None,
+    feed_update_interval: float | None = None,
+    rate_limit_backoff: timedelta | None = None,
+) -> timedelta:
+    """Get the interval until the next realtime update.
+
+    Polls as often as possible while an arrival is imminent and at the base
+    interval while there are arrivals. Without any, waits until scheduled
+    service is about to begin. Never polls faster than the feeds change, and
+    backs off while the endpoints are rate limiting.
+    """
+    if soonest_arrival is not None:
+        if soonest_arrival <= IMMINENT_ARRIVAL.total_seconds():
+            interval = MIN_REALTIME_INTERVAL
+        else:
+            interval = base
+    elif next_scheduled_arrival is not None:
+        interval = max(
+            timedelta(seconds=next_scheduled_arrival) - IMMINENT_ARRIVAL, base
+        )
+    else:
+        interval = base
+    if feed_update_interval is not None:
+        interval = max(interval, timedelta(seconds=feed_update_interval))
+    if rate_limit_backoff is not None:
+        interval = max(interval, rate_limit_backoff)
+    return min(max(interval, min(MIN_REALTIME_INTERVAL, base)), MAX_REALTIME_INTERVAL)
@@ -0,0 +1,77 @@
+"""Rate limits for requests to the hosts of realtime feeds."""
+
+import asyncio
+from collections.abc import Mapping
+from dataclasses import dataclass
+import time
+from typing import Any, Self
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimit:
+    """Requests allowed to a host over a period of seconds."""
+
+    requests: float
+    period: float = 1.0
+
+    @property
+    def rate(self) -> float:
+        """Requests allowed per second."""
+        return self.requests / self.period
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any] | None) -> Self | None:
+        """Create the rate limit of a provider in feeds.json, if it has one."""
+        if not data:
+            return None
+        return cls(requests=float(data["requests"]), period=float(data["period"]))
+
+
+# A request a second on average, every endpoint of an entry may be fetched at once
+DEFAULT_RATE_LIMIT = RateLimit(requests=10, period=10)
+
+
+class TokenBucket:
+    """Token bucket holding up to a rate limit's requests, refilled at its rate."""
+
+    def __init__(self, rate_limit: RateLimit) -> None:
+        """Initialize a full bucket."""
+        self.rate_limit = rate_limit
+        self._tokens = rate_limit.requests
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.rate_limit.requests,
+            self._tokens + (now - self._updated) * self.rate_limit.rate,
+        )
+        self._updated = now
+
+    async def async_acquire(self, max_wait: float) -> bool:
+        """Take a token, waiting for one up to max_wait seconds.
+
+        Returns False without taking a token if it would take longer.
+        """
+        # Waiters are served in order
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate_limit.rate
+                if wait > max_wait:
+                    return False
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= 1
+            return True
+
+    def restrict(self, rate_limit: RateLimit) -> None:
+        """Apply a rate limit if it allows fewer requests than the current one."""
+        if rate_limit.rate < self.rate_limit.rate or (
+            rate_limit.rate == self.rate_limit.rate
+            and rate_limit.requests < self.rate_limit.requests
+        ):
+            self._refill()
+            self.rate_limit = rate_limit
+            self._tokens = min(self._tokens, rate_limit.requests)
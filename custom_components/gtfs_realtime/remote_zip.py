@@ -0,0 +1,249 @@
+"""Read members of remote zip files with HTTP range requests."""
+
+import asyncio
+from collections.abc import Collection
+from dataclasses import dataclass
+from http import HTTPStatus
+import struct
+from typing import Any
+import zlib
+
+from aiohttp import ClientSession, hdrs
+
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<4s4H2IH")
+END_OF_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x05\x06"
+ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sQ2H2I4Q")
+ZIP64_END_OF_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x06\x06"
+ZIP64_LOCATOR = struct.Struct("<4sIQI")
+ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+CENTRAL_DIRECTORY_HEADER = struct.Struct("<4s6H3I5H2I")
+CENTRAL_DIRECTORY_HEADER_SIGNATURE = b"PK\x01\x02"
+LOCAL_FILE_HEADER = struct.Struct("<4s5H3I2H")
+LOCAL_FILE_HEADER_SIGNATURE = b"PK\x03\x04"
+ZIP64_EXTRA_FIELD = 0x0001
+ZIP64_LIMIT = 0xFFFFFFFF
+STORED = 0
+DEFLATED = 8
+ENCRYPTED_FLAG = 0x1
+# The end of central directory record is followed by a comment of up to 64 KiB,
+# and preceded by the zip64 locator in large archives
+MAX_TAIL_SIZE = ZIP64_LOCATOR.size + END_OF_CENTRAL_DIRECTORY.size + 0xFFFF
+
+
+class RemoteZipError(Exception):
+    """Raised when members of a remote zip cannot be read with range requests."""
+
+
+@dataclass(frozen=True, slots=True)
+class ZipMember:
+    """Location of a member in a zip file, from its central directory."""
+
+    name: str
+    compression: int
+    compressed_size: int
+    header_offset: int
+
+
+async def _async_fetch_range(
+    session: ClientSession,
+    url: str,
+    headers: dict[str, str] | None,
+    byte_range: str,
+) -> tuple[bytes, int]:
+    """Fetch a range of bytes, returning them and their offset in the file."""
+    request_headers = {
+        **(headers or {}),
+        hdrs.RANGE: f"bytes={byte_range}",
+        # Ranges are of the encoded content, so it must not be compressed
+        hdrs.ACCEPT_ENCODING: "identity",
+    }
+    async with session.get(url, headers=request_headers) as response:
+        response.raise_for_status()
+        if response.status != HTTPStatus.PARTIAL_CONTENT:
+            raise RemoteZipError(f"{url} does not support range requests")
+        content_range = response.headers.get(hdrs.CONTENT_RANGE, "")
+        unit, _, spec = content_range.partition(" ")
+        try:
+            start = int(spec.partition("-")[0])
+        except ValueError as err:
+            raise RemoteZipError(
+                f"{url} returned an invalid content range {content_range!r}"
+            ) from err
+        if unit != "bytes":
+            raise RemoteZipError(f"{url} returned a range in {unit}")
+        return await response.read(), start
+
+
+def _find_central_directory(tail: bytes, tail_offset: int) -> tuple[int, int, int]:
+    """Find the central directory from the end of a zip.
+
+    Returns its offset and size, and the offset of the zip64 end of central
+    directory record if its location has to be read from there instead.
+    """
+    if (pos := tail.rfind(END_OF_CENTRAL_DIRECTORY_SIGNATURE)) == -1:
+        raise RemoteZipError("End of central directory not found")
+    *_, size, offset, _ = END_OF_CENTRAL_DIRECTORY.unpack_from(tail, pos)
+    locator_pos = pos - ZIP64_LOCATOR.size
+    if (
+        ZIP64_LIMIT in (size, offset)
+        and locator_pos >= 0
+        and tail[locator_pos : locator_pos + 4] == ZIP64_LOCATOR_SIGNATURE
+    ):
+        _, _, zip64_offset, _ = ZIP64_LOCATOR.unpack_from(tail, locator_pos)
+        return offset, size, zip64_offset
+    if tail_offset + pos < offset + size:
+        raise RemoteZipError("Central directory overlaps its end record")
+    return offset, size, -1
+
+
+def _parse_zip64_end_of_central_directory(record: bytes) -> tuple[int, int]:
+    """Get the offset and size of the central directory from a zip64 record."""
+    (signature, *_, size, offset) = ZIP64_END_OF_CENTRAL_DIRECTORY.unpack_from(record)
+    if signature != ZIP64_END_OF_CENTRAL_DIRECTORY_SIGNATURE:
+        raise RemoteZipError("Zip64 end of central directory not found")
+    return offset, size
+
+
+def _zip64_values(extra: bytes, *values: int) -> list[int]:
+    """Replace the values overflowing 32 bits with those in the zip64 extra field."""
+    pos = 0
+    while pos + 4 <= len(extra):
+        field_id, field_size = struct.unpack_from("<2H", extra, pos)
+        if field_id == ZIP64_EXTRA_FIELD:
+            data = extra[pos + 4 : pos + 4 + field_size]
+            result = []
+            data_pos = 0
+            for value in values:
+                if value == ZIP64_LIMIT:
+                    (value,) = struct.unpack_from("<Q", data, data_pos)
+                    data_pos += 8
+                result.append(value)
+            return result
+        pos += 4 + field_size
+    return list(values)
+
+
+def parse_central_directory(central_directory: bytes) -> dict[str, ZipMember]:
+    """Parse the members listed in a central directory."""
+    members: dict[str, ZipMember] = {}
+    pos = 0
+    while pos + CENTRAL_DIRECTORY_HEADER.size <= len(central_directory):
+        (
+            signature,
+            _,
+            _,
+            flags,
+            compression,
+            _,
+            _,
+            _,
+            compressed_size,
+            uncompressed_size,
+            name_length,
+            extra_length,
+            comment_length,
+            _,
+            _,
+            _,
+            header_offset,
+        ) = CENTRAL_DIRECTORY_HEADER.unpack_from(central_directory, pos)
+        if signature != CENTRAL_DIRECTORY_HEADER_SIGNATURE:
+            raise RemoteZipError("Invalid central directory")
+        pos += CENTRAL_DIRECTORY_HEADER.size
+        name = central_directory[pos : pos + name_length].decode(
+            # Bit 11 marks UTF-8 names, others are in the legacy code page
+            "utf-8" if flags & 0x800 else "cp437"
+        )
+        extra = central_directory[pos + name_length : pos + name_length + extra_length]
+        pos += name_length + extra_length + comment_length
+        if flags & ENCRYPTED_FLAG:
+            continue
+        _, compressed_size, header_offset = _zip64_values(
+            extra, uncompressed_size, compressed_size, header_offset
+        )
+        members[name] = ZipMember(name, compression, compressed_size, header_offset)
+    return members
+
+
+def decompress_member(member: ZipMember, data: bytes) -> bytes:
+    """Decompress the data of a member, which may take a while for large ones."""
+    if member.compression == STORED:
+        return data
+    if member.compression != DEFLATED:
+        raise RemoteZipError(
+            f"{member.name} uses unsupported compression method {member.compression}"
+        )
+    try:
+        return zlib.decompress(data, -zlib.MAX_WBITS)
+    except zlib.error as err:
+        raise RemoteZipError(f"Unable to decompress {member.name}: {err}") from err
+
+
+async def _async_fetch_member(
+    session: ClientSession,
+    url: str,
+    headers: dict[str, str] | None,
+    member: ZipMember,
+) -> bytes:
+    """Fetch the compressed data of a member, after reading its local header."""
+    header, _ = await _async_fetch_range(
+        session,
+        url,
+        headers,
+        f"{member.header_offset}-{member.header_offset + LOCAL_FILE_HEADER.size - 1}",
+    )
+    (signature, *_, name_length, extra_length) = LOCAL_FILE_HEADER.unpack_from(header)
+    if signature != LOCAL_FILE_HEADER_SIGNATURE:
+        raise RemoteZipError(f"Invalid local header for {member.name}")
+    if not member.compressed_size:
+        return b""
+    start = member.header_offset + LOCAL_FILE_HEADER.size + name_length + extra_length
+    data, _ = await _async_fetch_range(
+        session, url, headers, f"{start}-{start + member.compressed_size - 1}"
+    )
+    return data
+
+
+async def async_fetch_zip_members(
+    session: ClientSession,
+    url: str,
+    names: Collection[str],
+    headers: dict[str, Any] | None = None,
+) -> dict[ZipMember, bytes]:
+    """Fetch the given members of a remote zip, without downloading the rest.
+
+    The central directory is read from the end of the file, then only the
+    members are requested. Their data is returned compressed, members missing
+    from the zip are left out. Raises RemoteZipError if the server does not
+    support range requests.
+    """
+    try:
+        tail, tail_offset = await _async_fetch_range(
+            session, url, headers, f"-{MAX_TAIL_SIZE}"
+        )
+        offset, size, zip64_offset = _find_central_directory(tail, tail_offset)
+        if zip64_offset != -1:
+            if zip64_offset >= tail_offset:
+                record = tail[zip64_offset - tail_offset :]
+            else:
+                record, _ = await _async_fetch_range(
+                    session,
+                    url,
+                    headers,
+                    f"{zip64_offset}-{zip64_offset + ZIP64_END_OF_CENTRAL_DIRECTORY.size - 1}",
+                )
+            offset, size = _parse_zip64_end_of_central_directory(record)
+        if offset >= tail_offset:
+            central_directory = tail[offset - tail_offset : offset - tail_offset + size]
+        else:
+            central_directory, _ = await _async_fetch_range(
+                session, url, headers, f"{offset}-{offset + size - 1}"
+            )
+        members = parse_central_directory(central_directory)
+        wanted = [members[name] for name in names if name in members]
+        contents = await asyncio.gather(
+            *(_async_fetch_member(session, url, headers, member) for member in wanted)
+        )
+        return dict(zip(wanted, contents, strict=True))
+    except (struct.error, UnicodeDecodeError) as err:
+        raise RemoteZipError(f"Invalid zip file {url}: {err}") from err
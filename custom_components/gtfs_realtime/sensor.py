@@ -2,8 +2,8 @@
 
 from __future__ import annotations
 import logging
+import time
 
-from gtfs_station_stop.arrival import Arrival
 from gtfs_station_stop.route_info import RouteType
 from gtfs_station_stop.station_stop import StationStop
 from gtfs_station_stop.station_stop_info import StationStopInfo
@@ -18,14 +18,16 @@ from homeassistant.core import HomeAssistant, callback
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 import voluptuous as vol
 
 from custom_components.gtfs_realtime import GtfsRealtimeConfigEntry
 
 from .const import (
+    ARRIVAL_TIME,
     CONF_ARRIVAL_LIMIT,
+    CONF_DEPARTURES_SENSOR,
     CONF_STOP_IDS,
+    DEPARTURES,
     DOMAIN,
     HEADSIGN,
     ROUTE_COLOR,
@@ -35,7 +37,8 @@ from .const import (
     STOP_ID,
     TRIP_ID,
 )
-from .coordinator import GtfsRealtimeCoordinator
+from .coordinator import GtfsRealtimeCoordinator, StopArrival
+from .entity import GtfsRealtimeEntity
 
 PLATFORM_SCHEMA = SENSOR_PLATFORM_SCHEMA.extend(
     {vol.Required(STOP_ID): cv.string, vol.Optional(CONF_ARRIVAL_LIMIT, default=4): int}
@@ -43,8 +46,6 @@ PLATFORM_SCHEMA = SENSOR_PLATFORM_SCHEMA.extend(
 
 _LOGGER = logging.getLogger(__name__)
 
-MIN_NEGATIVE_ARRIVAL_TIME_SECONDS = -120  # 2 minutes
-
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -55,6 +56,19 @@ async def async_setup_entry(
     coordinator: GtfsRealtimeCoordinator = entry.runtime_data
     if CONF_STOP_IDS in entry.data:
         arrival_limit: int = int(round(entry.data[CONF_ARRIVAL_LIMIT]))
+        if entry.data.get(CONF_DEPARTURES_SENSOR, False):
+            async_add_entities(
+                [
+                    DeparturesSensor(
+                        coordinator=coordinator,
+                        stop_id=stop_id,
+                        arrival_limit=arrival_limit,
+                    )
+                    for stop_id in entry.data[CONF_STOP_IDS]
+                ],
+                update_before_add=True,
+            )
+            return
         arrival_sensors = []
         for i in range(arrival_limit):
             for stop_id in entry.data[CONF_STOP_IDS]:
@@ -68,7 +82,18 @@ async def async_setup_entry(
         async_add_entities(arrival_sensors, update_before_add=True)
 
 
-class ArrivalSensor(SensorEntity, CoordinatorEntity):
+def _get_countdown(arrival: StopArrival, now: float | None = None) -> float | None:
+    """Get the time to an arrival in seconds, rounded down to whole minutes.
+
+    Counted down from the predicted time between realtime updates, so the
+    state only changes once a minute. Negative times are shown as zero.
+    """
+    if (time_to_arrival := arrival.time_to_arrival(now)) is None:
+        return None
+    return max(time_to_arrival // 60 * 60, 0)
+
+
+class ArrivalSensor(SensorEntity, GtfsRealtimeEntity):
     """Representation of a Station GTFS Realtime Arrival Sensor."""
 
     _attr_native_unit_of_measurement = UnitOfTime.SECONDS
@@ -155,58 +180,29 @@ class ArrivalSensor(SensorEntity, CoordinatorEntity):
 
     def update(self) -> None:
         """Update state from coordinator data."""
-        stop_times_ds = self.coordinator.gtfs_update_data.schedule.stop_times_ds
-        time_to_arrivals = list(
-            filter(
-                lambda tta: tta is None or tta.time > MIN_NEGATIVE_ARRIVAL_TIME_SECONDS,
-                sorted(
-                    self.station_stop.get_time_to_arrivals(
-                        stop_times_dataset=stop_times_ds
-                    )
-                ),
-            )
+        arrivals = self.coordinator.gtfs_update_data.arrivals.get(
+            self.station_stop.id, ()
         )
         self._arrival_detail = {}
-        if len(time_to_arrivals) > self._idx:
-            schedule = self.coordinator.data.schedule
+        if len(arrivals) > self._idx:
+            arrival: StopArrival = arrivals[self._idx]
 
-            time_to_arrival: Arrival = time_to_arrivals[self._idx]
-
-            # Do not allow negative numbers
-            self._attr_native_value = time_to_arrival.time and max(
-                time_to_arrival.time, 0
-            )
+            self._attr_native_value = _get_countdown(arrival)
 
-            # It's possible the route ID is empty, in that case, get it from the trips database
-            # The remaining attributes will be filled below
-            if not time_to_arrival.route:
-                trip_info = schedule.trip_info_ds.get_close_match(time_to_arrival.trip)
-                if trip_info is not None:
-                    time_to_arrival.route = trip_info.route_id
-
-            self._arrival_detail[ROUTE_ID] = time_to_arrival.route
-
-            self._arrival_detail[HEADSIGN] = schedule.get_trip_headsign(
-                time_to_arrival.trip
-            )
-            self._arrival_detail[TRIP_ID] = time_to_arrival.trip
-            self._arrival_detail[ROUTE_COLOR] = schedule.get_route_color(
-                time_to_arrival.route
-            )
-            self._arrival_detail[ROUTE_TEXT_COLOR] = schedule.get_route_text_color(
-                time_to_arrival.route
-            )
-            self._arrival_detail[ROUTE_TYPE] = schedule.get_route_type(
-                time_to_arrival.route
-            )
+            self._arrival_detail[ROUTE_ID] = arrival.route_id
+            self._arrival_detail[HEADSIGN] = arrival.headsign
+            self._arrival_detail[TRIP_ID] = arrival.trip_id
+            self._arrival_detail[ROUTE_COLOR] = arrival.route_color
+            self._arrival_detail[ROUTE_TEXT_COLOR] = arrival.route_text_color
+            self._arrival_detail[ROUTE_TYPE] = arrival.route_type
         else:
             self._attr_native_value = None
+        self._arrival_detail.update(self._get_stale_feed_attributes())
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordainator."""
         try:
-            self.update()
             super()._handle_coordinator_update()
         except:
             _LOGGER.error(
@@ -215,3 +211,38 @@ class ArrivalSensor(SensorEntity, CoordinatorEntity):
                 self.coordinator.gtfs_provider,
             )
             raise
+
+
+class DeparturesSensor(ArrivalSensor):
+    """Next arrival at a stop, listing the following departures in one attribute.
+
+    Replaces the arrival sensors of a stop with a single entity.
+    """
+
+    def __init__(
+        self, coordinator: GtfsRealtimeCoordinator, stop_id: str, arrival_limit: int
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator=coordinator, stop_id=stop_id, idx=0)
+        self._arrival_limit = arrival_limit
+        self._name = self._get_stop_ref()
+        self._attr_unique_id = f"departures_{self.station_stop.id}"
+
+    def update(self) -> None:
+        """Update state from coordinator data."""
+        # The state and details are those of the next arrival
+        super().update()
+        now = time.time()
+        departures: list[dict[str, str | float | None]] = []
+        for arrival in self.coordinator.gtfs_update_data.arrivals.get(
+            self.station_stop.id, ()
+        )[: self._arrival_limit]:
+            departures.append(
+                {
+                    ROUTE_ID: arrival.route_id,
+                    HEADSIGN: arrival.headsign,
+                    TRIP_ID: arrival.trip_id,
+                    ARRIVAL_TIME: _get_countdown(arrival, now),
+                }
+            )
+        self._arrival_detail[DEPARTURES] = departures
@@ -0,0 +1,186 @@
+"""Services of the GTFS Realtime integration."""
+
+import time
+from typing import Any
+
+from gtfs_station_stop.station_stop_info import StationStopInfo
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import ATTR_LATITUDE, ATTR_LONGITUDE
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.util.location import distance
+import voluptuous as vol
+
+from .const import (
+    ARRIVAL_TIME,
+    CONF_STOP_IDS,
+    DEPARTURES,
+    DOMAIN,
+    HEADSIGN,
+    ROUTE_COLOR,
+    ROUTE_ID,
+    ROUTE_TEXT_COLOR,
+    ROUTE_TYPE,
+    TRIP_ID,
+)
+from .coordinator import GtfsRealtimeCoordinator, StopArrival
+
+SERVICE_GET_DEPARTURES = "get_departures"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_DISTANCE = "distance"
+ATTR_LIMIT = "limit"
+ATTR_NAME = "name"
+ATTR_RADIUS = "radius"
+ATTR_STOPS = "stops"
+DEFAULT_DEPARTURES_LIMIT = 4
+DEFAULT_DEPARTURES_RADIUS = 500  # meters
+
+GET_DEPARTURES_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+            vol.Optional(CONF_STOP_IDS): vol.All(cv.ensure_list, [cv.string]),
+            vol.Inclusive(ATTR_LATITUDE, "location"): cv.latitude,
+            vol.Inclusive(ATTR_LONGITUDE, "location"): cv.longitude,
+            vol.Optional(ATTR_RADIUS, default=DEFAULT_DEPARTURES_RADIUS): vol.All(
+                vol.Coerce(float), vol.Range(min=0)
+            ),
+            vol.Optional(ATTR_LIMIT, default=DEFAULT_DEPARTURES_LIMIT): vol.All(
+                vol.Coerce(int), vol.Range(min=1)
+            ),
+        }
+    ),
+    cv.has_at_least_one_key(CONF_STOP_IDS, ATTR_LATITUDE),
+)
+
+
+def get_coordinators(
+    hass: HomeAssistant, entry_id: str | None = None
+) -> list[GtfsRealtimeCoordinator]:
+    """Get the coordinators of the loaded entries, or of the given one."""
+    if entry_id is None:
+        return [
+            entry.runtime_data
+            for entry in hass.config_entries.async_loaded_entries(DOMAIN)
+        ]
+    entry = hass.config_entries.async_get_entry(entry_id)
+    if entry is None or entry.domain != DOMAIN:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="entry_not_found",
+            translation_placeholders={"entry_id": entry_id},
+        )
+    if entry.state is not ConfigEntryState.LOADED:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="entry_not_loaded",
+            translation_placeholders={"entry_id": entry_id},
+        )
+    return [entry.runtime_data]
+
+
+def get_stop_departures(
+    coordinators: list[GtfsRealtimeCoordinator], stop_id: str, limit: int
+) -> list[StopArrival]:
+    """Get the next departures at a stop, from every entry serving it."""
+    return sorted(
+        (
+            arrival
+            for coordinator in coordinators
+            for arrival in coordinator.gtfs_update_data.arrivals.get(stop_id, ())
+        ),
+        key=lambda arrival: (arrival.timestamp is None, arrival.timestamp or 0),
+    )[:limit]
+
+
+def _describe_stop(
+    stop_info: StationStopInfo | None, location: tuple[float, float] | None
+) -> dict[str, Any]:
+    stop: dict[str, Any] = {
+        ATTR_NAME: stop_info.name if stop_info is not None else None,
+        DEPARTURES: [],
+    }
+    if location is not None and stop_info is not None:
+        try:
+            stop[ATTR_DISTANCE] = distance(
+                *location, float(stop_info.lat), float(stop_info.lon)
+            )
+        except (TypeError, ValueError):
+            stop[ATTR_DISTANCE] = None
+    return stop
+
+
+def _serialize_departure(
+    arrival: StopArrival, now: float
+) -> dict[str, str | float | None]:
+    time_to_arrival = arrival.time_to_arrival(now)
+    return {
+        ROUTE_ID: arrival.route_id,
+        HEADSIGN: arrival.headsign,
+        TRIP_ID: arrival.trip_id,
+        ROUTE_COLOR: arrival.route_color,
+        ROUTE_TEXT_COLOR: arrival.route_text_color,
+        ROUTE_TYPE: arrival.route_type,
+        ARRIVAL_TIME: time_to_arrival and max(time_to_arrival, 0),
+    }
+
+
+@callback
+def async_get_departures(call: ServiceCall) -> ServiceResponse:
+    """Get the next departures at stops, or at the stops around a location.
+
+    Departures are read from the arrival index of each entry, only the stops
+    configured in an entry are known. Stops served by several entries list
+    the departures of all of them.
+    """
+    stop_ids: list[str] = call.data.get(CONF_STOP_IDS, [])
+    location: tuple[float, float] | None = (
+        (call.data[ATTR_LATITUDE], call.data[ATTR_LONGITUDE])
+        if ATTR_LATITUDE in call.data
+        else None
+    )
+    limit: int = call.data[ATTR_LIMIT]
+    now = time.time()
+    coordinators = get_coordinators(call.hass, call.data.get(ATTR_CONFIG_ENTRY_ID))
+    stops: dict[str, dict[str, Any]] = {}
+    for coordinator in coordinators:
+        stop_index = coordinator.stop_index
+        matching = [
+            stop_id
+            for stop_id in stop_ids
+            if stop_id in coordinator.gtfs_update_data.arrivals
+        ]
+        if location is not None:
+            matching.extend(
+                stop_index.nearest(
+                    *location, len(stop_index), max_distance=call.data[ATTR_RADIUS]
+                )
+            )
+        for stop_id in matching:
+            if stop_id not in stops:
+                stops[stop_id] = _describe_stop(stop_index.stops.get(stop_id), location)
+    for stop_id, stop in stops.items():
+        stop[DEPARTURES] = [
+            _serialize_departure(arrival, now)
+            for arrival in get_stop_departures(coordinators, stop_id, limit)
+        ]
+    return {ATTR_STOPS: stops}
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_DEPARTURES,
+        async_get_departures,
+        schema=GET_DEPARTURES_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
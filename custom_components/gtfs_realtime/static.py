@@ -0,0 +1,331 @@
+"""Static GTFS sources shared between config entries."""
+
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from io import BytesIO
+import logging
+import multiprocessing
+import os
+from typing import Any
+from zipfile import ZipFile
+
+from aiohttp import ClientError
+
+from gtfs_station_stop.calendar import Calendar
+from gtfs_station_stop.helpers import is_url
+from gtfs_station_stop.route_info import RouteInfoDataset
+from gtfs_station_stop.schedule import GtfsSchedule
+from gtfs_station_stop.static_dataset import GtfsStaticDataset
+from gtfs_station_stop.station_stop_info import StationStopInfoDataset
+from gtfs_station_stop.stop_times import StopTimesDataset
+from gtfs_station_stop.trip_info import TripInfoDataset
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.util.hass_dict import HassKey
+
+from .cache import async_get_static_cache
+from .const import DOMAIN
+from .datasets import FilteredStopTimesDataset, FilteredTripInfoDataset, StaticFilter
+from .remote_zip import (
+    RemoteZipError,
+    ZipMember,
+    async_fetch_zip_members,
+    decompress_member,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+type StaticSourceKey = tuple[
+    os.PathLike, frozenset[tuple[str, Any]], StaticFilter | None
+]
+type StaticSourceListener = Callable[["SharedStaticSource", bool], None]
+
+DATA_STATIC_SOURCES: HassKey[dict[StaticSourceKey, "SharedStaticSource"]] = HassKey(
+    f"{DOMAIN}_static_sources"
+)
+DATA_PARSE_POOL: HassKey[ProcessPoolExecutor] = HassKey(f"{DOMAIN}_parse_pool")
+
+# Each dataset is parsed from its own member of the zip in a separate process
+SCHEDULE_DATASETS: dict[str, type[GtfsStaticDataset]] = {
+    "calendar": Calendar,
+    "station_stop_info_ds": StationStopInfoDataset,
+    "trip_info_ds": TripInfoDataset,
+    "route_info_ds": RouteInfoDataset,
+    "stop_times_ds": StopTimesDataset,
+}
+
+
+@callback
+def _async_get_parse_pool(hass: HomeAssistant) -> ProcessPoolExecutor:
+    """Get the process pool used to parse static feeds, creating it if needed."""
+    if (pool := hass.data.get(DATA_PARSE_POOL)) is None:
+        # Workers are spawned rather than forked from the threaded event loop.
+        # Unfiltered schedules are parsed by the gtfs_station_stop classes alone,
+        # the filtered datasets are unpickled from this integration, importing
+        # it and Home Assistant once in each worker.
+        pool = hass.data[DATA_PARSE_POOL] = ProcessPoolExecutor(
+            max_workers=min(len(SCHEDULE_DATASETS), os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+        async def _async_shutdown_pool(_event: Event) -> None:
+            await async_shutdown_parse_pool(hass)
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_shutdown_pool)
+    return pool
+
+
+async def async_shutdown_parse_pool(hass: HomeAssistant) -> None:
+    """Shut down the worker processes used to parse static feeds."""
+    if (pool := hass.data.pop(DATA_PARSE_POOL, None)) is not None:
+        await hass.async_add_executor_job(partial(pool.shutdown, cancel_futures=True))
+
+
+async def _async_shutdown_idle_parse_pool(hass: HomeAssistant) -> None:
+    """Shut down the parse pool, unless a static source was acquired since."""
+    if not hass.data.get(DATA_STATIC_SOURCES):
+        await async_shutdown_parse_pool(hass)
+
+
+async def async_parse_schedule(
+    hass: HomeAssistant,
+    *gtfs_files: os.PathLike,
+    static_filter: StaticFilter | None = None,
+) -> GtfsSchedule:
+    """Parse static GTFS zip files, each dataset in a worker process.
+
+    With a filter, only the stop times at its stops are loaded, along with the
+    trips making them or running on its routes.
+    """
+    pool = _async_get_parse_pool(hass)
+    dataset_classes = dict(SCHEDULE_DATASETS)
+    if static_filter is not None:
+        dataset_classes["stop_times_ds"] = partial(
+            FilteredStopTimesDataset, stop_ids=static_filter.stop_ids
+        )
+        # Trips are filtered by the stop times, so they are parsed after them
+        del dataset_classes["trip_info_ds"]
+    tasks = {
+        name: hass.loop.run_in_executor(pool, dataset_class, *gtfs_files)
+        for name, dataset_class in dataset_classes.items()
+    }
+    if static_filter is not None:
+        stop_times_ds = await tasks["stop_times_ds"]
+        tasks["trip_info_ds"] = hass.loop.run_in_executor(
+            pool,
+            partial(
+                FilteredTripInfoDataset,
+                trip_ids=frozenset(stop_times_ds.stop_times),
+                route_ids=static_filter.route_ids,
+            ),
+            *gtfs_files,
+        )
+    datasets = await asyncio.gather(*tasks.values())
+    return GtfsSchedule(**dict(zip(tasks, datasets, strict=True)))
+
+
+# Datasets needed to choose the stops and routes of an entry
+STOPS_AND_ROUTES_FILES = ("stops.txt", "routes.txt")
+
+
+def _parse_stops_and_routes(members: dict[ZipMember, bytes]) -> GtfsSchedule:
+    """Parse the stops and routes fetched from a zip, leaving the rest empty."""
+    gtfs_file = BytesIO()
+    with ZipFile(gtfs_file, "w") as zip_file:
+        for member, data in members.items():
+            zip_file.writestr(member.name, decompress_member(member, data))
+    return GtfsSchedule(
+        station_stop_info_ds=StationStopInfoDataset(gtfs_file),
+        route_info_ds=RouteInfoDataset(gtfs_file),
+    )
+
+
+async def async_load_stops_and_routes(
+    hass: HomeAssistant, uri: os.PathLike, headers: dict[str, Any] | None = None
+) -> GtfsSchedule | None:
+    """Load only the stops and routes of a remote feed, with range requests.
+
+    Returns None when the feed has to be loaded whole instead, because it is
+    not remote, the server does not support range requests or the stops are
+    not at the top of the zip.
+    """
+    if not is_url(uri):
+        return None
+    try:
+        members = await async_fetch_zip_members(
+            async_get_clientsession(hass), uri, STOPS_AND_ROUTES_FILES, headers
+        )
+        if "stops.txt" not in {member.name for member in members}:
+            return None
+        schedule = await hass.async_add_executor_job(_parse_stops_and_routes, members)
+    except (RemoteZipError, ClientError, TimeoutError) as err:
+        _LOGGER.debug("Unable to load the stops and routes of %s alone: %s", uri, err)
+        return None
+    _LOGGER.debug("Loaded the stops and routes of GTFS Static Feed %s", uri)
+    return schedule
+
+
+class SharedStaticSource:
+    """Static GTFS source, downloaded and parsed once for every entry using it."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        uri: os.PathLike,
+        headers: dict[str, Any] | None = None,
+        static_filter: StaticFilter | None = None,
+    ) -> None:
+        """Initialize the shared static source."""
+        self.hass = hass
+        self.uri = uri
+        self.headers = headers
+        self.static_filter = static_filter
+        # Downloads are shared by the sources of every filter on the same feed
+        self.cache = async_get_static_cache(hass)
+        self.schedule: GtfsSchedule | None = None
+        # SHA-256 of the cached feed content the schedule was parsed from
+        self._sha256: str | None = None
+        # Last time the source was checked against the network
+        self.last_update: datetime | None = None
+        self.ref_count = 0
+        self._listeners: list[StaticSourceListener] = []
+        self._snapshot_lock = asyncio.Lock()
+        self._pending_update: asyncio.Task | None = None
+
+    @callback
+    def async_add_listener(self, listener: StaticSourceListener) -> CALLBACK_TYPE:
+        """Listen for updates, the listener is told if the schedule changed."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    @callback
+    def _async_notify_listeners(self, changed: bool) -> None:
+        for listener in list(self._listeners):
+            listener(self, changed)
+
+    async def async_load_snapshot(self) -> GtfsSchedule | None:
+        """Load the schedule saved to disk, unless it is already loaded."""
+        async with self._snapshot_lock:
+            if self.schedule is None and is_url(self.uri):
+                self.schedule = await self.cache.async_load_snapshot(
+                    self.uri, self._snapshot_variant
+                )
+                if self.schedule is not None:
+                    # The snapshot is only loaded if it is of the cached content
+                    self._sha256 = self.cache.get_sha256(self.uri)
+                    _LOGGER.debug("GTFS Static Feed %s loaded from snapshot", self.uri)
+        return self.schedule
+
+    @property
+    def _snapshot_variant(self) -> str | None:
+        return self.static_filter.key if self.static_filter is not None else None
+
+    async def async_update(self) -> None:
+        """Refresh the source, joining an update already in progress."""
+        if self._pending_update is None:
+            self._pending_update = asyncio.create_task(self._async_update())
+        # Shielded so one entry being cancelled does not cancel the others' update
+        await asyncio.shield(self._pending_update)
+
+    async def _async_update(self) -> None:
+        try:
+            schedule = await self._async_load()
+            self.last_update = datetime.now()
+            if schedule is not None:
+                self.schedule = schedule
+            _LOGGER.debug("GTFS Static Feed %s updated", self.uri)
+            self._async_notify_listeners(schedule is not None)
+        finally:
+            self._pending_update = None
+
+    async def _async_load(self) -> GtfsSchedule | None:
+        """Load the source, or return None if it has not changed."""
+        if not is_url(self.uri):
+            return await async_parse_schedule(
+                self.hass, self.uri, static_filter=self.static_filter
+            )
+        # Another source of the feed may have fetched the content this one has
+        # not parsed yet, so the content is compared rather than the fetch
+        cached_feed, _ = await self.cache.async_fetch(self.uri, self.headers)
+        if cached_feed.sha256 == self._sha256 and self.schedule is not None:
+            _LOGGER.debug("GTFS Static Feed %s unchanged, skipping parse", self.uri)
+            return None
+        schedule = await async_parse_schedule(
+            self.hass, cached_feed.path, static_filter=self.static_filter
+        )
+        self._sha256 = cached_feed.sha256
+        await self.cache.async_save_snapshot(
+            self.uri, schedule, self._snapshot_variant, cached_feed.sha256
+        )
+        return schedule
+
+    @callback
+    def async_clear(self) -> None:
+        """Drop the parsed schedule until the next update."""
+        self.schedule = None
+        self._async_notify_listeners(True)
+
+
+@callback
+def async_acquire_static_source(
+    hass: HomeAssistant,
+    uri: os.PathLike,
+    headers: dict[str, Any] | None = None,
+    static_filter: StaticFilter | None = None,
+) -> SharedStaticSource:
+    """Get the shared static source for a URI and filter, creating it if needed."""
+    static_sources = hass.data.setdefault(DATA_STATIC_SOURCES, {})
+    key = (uri, frozenset((headers or {}).items()), static_filter)
+    if (static_source := static_sources.get(key)) is None:
+        static_source = static_sources[key] = SharedStaticSource(
+            hass, uri, headers, static_filter
+        )
+    static_source.ref_count += 1
+    return static_source
+
+
+async def async_get_loaded_schedule(
+    hass: HomeAssistant, uri: os.PathLike
+) -> GtfsSchedule | None:
+    """Get a schedule of a source already in memory or saved to disk.
+
+    Schedules of any entry are used, whatever their filter, as filters only
+    limit the trips and stop times.
+    """
+    for (source_uri, _, _), static_source in hass.data.get(
+        DATA_STATIC_SOURCES, {}
+    ).items():
+        if source_uri == uri and static_source.schedule is not None:
+            _LOGGER.debug("Using the loaded GTFS Static Feed %s", uri)
+            return static_source.schedule
+    if not is_url(uri):
+        return None
+    schedule = await async_get_static_cache(hass).async_load_any_snapshot(uri)
+    if schedule is not None:
+        _LOGGER.debug("Using the GTFS Static Feed %s snapshot", uri)
+    return schedule
+
+
+@callback
+def async_release_static_source(
+    hass: HomeAssistant, static_source: SharedStaticSource
+) -> None:
+    """Release a static source, freeing its schedule once no entry uses it."""
+    static_source.ref_count -= 1
+    if static_source.ref_count > 0:
+        return
+    static_sources = hass.data.get(DATA_STATIC_SOURCES, {})
+    for key, registered in list(static_sources.items()):
+        if registered is static_source:
+            del static_sources[key]
+    if not static_sources:
+        # Not started eagerly, so a source acquired right away keeps the pool
+        hass.async_create_background_task(
+            _async_shutdown_idle_parse_pool(hass),
+            f"{DOMAIN} shutdown parse pool",
+            eager_start=False,
+        )
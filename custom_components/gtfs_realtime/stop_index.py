@@ -0,0 +1,156 @@
+"""Index of stops by location and name, to offer a few of a large schedule."""
+
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Iterable
+import heapq
+import math
+import re
+
+from gtfs_station_stop.station_stop_info import StationStopInfo
+from homeassistant.util.location import distance
+
+# Stops are bucketed in cells of this many degrees, about a kilometer
+GRID_CELL_DEGREES = 0.01
+METERS_PER_DEGREE = 111_195
+
+_WORD = re.compile(r"\w+")
+
+
+def _words(text: str | None) -> list[str]:
+    return _WORD.findall(text.casefold()) if text else []
+
+
+def _coordinates(stop: StationStopInfo) -> tuple[float, float] | None:
+    try:
+        return float(stop.lat), float(stop.lon)
+    except (TypeError, ValueError):
+        return None
+
+
+def _cell(latitude: float, longitude: float) -> tuple[int, int]:
+    return (
+        math.floor(latitude / GRID_CELL_DEGREES),
+        math.floor(longitude / GRID_CELL_DEGREES),
+    )
+
+
+class StopIndex:
+    """Grid of stop locations and sorted words of their names, codes and IDs.
+
+    Built once per schedule, finding the stops near a location only looks at
+    the cells around it and searching by name only at the matching words.
+    """
+
+    def __init__(self, stops: Iterable[StationStopInfo]) -> None:
+        """Index the stops."""
+        self.stops: dict[str, StationStopInfo] = {}
+        self._cells: dict[tuple[int, int], list[tuple[float, float, str]]] = (
+            defaultdict(list)
+        )
+        words: set[tuple[str, str]] = set()
+        for stop in stops:
+            self.stops[stop.id] = stop
+            if (coordinates := _coordinates(stop)) is not None:
+                self._cells[_cell(*coordinates)].append((*coordinates, stop.id))
+            for text in (stop.name, stop.code, stop.id):
+                words.update((word, stop.id) for word in _words(text))
+        self._words = sorted(words)
+
+    def __len__(self) -> int:
+        """Return the number of stops."""
+        return len(self.stops)
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        count: int,
+        max_distance: float | None = None,
+    ) -> list[str]:
+        """Get the IDs of the stops nearest a location, up to a distance in meters.
+
+        Rings of cells are searched outwards, until no cell left can hold a
+        stop closer than the farthest one found. Once the rings would cover
+        more cells than hold stops, such as far from every stop, the remaining
+        cells holding stops are searched in one pass instead.
+        """
+        if not self._cells or count <= 0:
+            return []
+        row, column = _cell(latitude, longitude)
+        # Width of a cell in meters, narrowest towards the poles
+        cell_size = (
+            GRID_CELL_DEGREES
+            * METERS_PER_DEGREE
+            * max(math.cos(math.radians(min(abs(latitude), 89.0))), 0.01)
+        )
+        # Negated distances, so the farthest of the nearest stops is first
+        nearest: list[tuple[float, str]] = []
+
+        def _add_stops(cell: tuple[int, int]) -> None:
+            for stop_latitude, stop_longitude, stop_id in self._cells.get(cell, ()):
+                stop_distance = distance(
+                    latitude, longitude, stop_latitude, stop_longitude
+                )
+                if stop_distance is None or (
+                    max_distance is not None and stop_distance > max_distance
+                ):
+                    continue
+                if len(nearest) < count:
+                    heapq.heappush(nearest, (-stop_distance, stop_id))
+                elif -nearest[0][0] > stop_distance:
+                    heapq.heapreplace(nearest, (-stop_distance, stop_id))
+
+        ring = 0
+        searched_cells = 0
+        while True:
+            ring_cells = 8 * ring or 1
+            if searched_cells + ring_cells > len(self._cells):
+                for cell in self._cells:
+                    if max(abs(cell[0] - row), abs(cell[1] - column)) >= ring:
+                        _add_stops(cell)
+                break
+            for cell in self._ring_cells(row, column, ring):
+                _add_stops(cell)
+            searched_cells += ring_cells
+            # Stops in the next ring are at least this far away
+            bound = ring * cell_size
+            if (max_distance is not None and bound > max_distance) or (
+                len(nearest) == count and -nearest[0][0] <= bound
+            ):
+                break
+            ring += 1
+        return [stop_id for _, stop_id in sorted(nearest, reverse=True)]
+
+    @staticmethod
+    def _ring_cells(row: int, column: int, ring: int) -> Iterable[tuple[int, int]]:
+        if ring == 0:
+            yield row, column
+            return
+        for offset in range(-ring, ring + 1):
+            yield row - ring, column + offset
+            yield row + ring, column + offset
+        for offset in range(-ring + 1, ring):
+            yield row + offset, column - ring
+            yield row + offset, column + ring
+
+    def search(self, query: str, limit: int) -> list[str]:
+        """Get the IDs of the stops with words starting with every word of a query.
+
+        Matching stops are sorted by name.
+        """
+        matches: set[str] | None = None
+        for prefix in _words(query):
+            prefix_matches = set()
+            pos = bisect_left(self._words, (prefix, ""))
+            while pos < len(self._words) and self._words[pos][0].startswith(prefix):
+                prefix_matches.add(self._words[pos][1])
+                pos += 1
+            matches = prefix_matches if matches is None else matches & prefix_matches
+            if not matches:
+                return []
+        if matches is None:
+            return []
+        return sorted(
+            matches, key=lambda stop_id: (self.stops[stop_id].name or "", stop_id)
+        )[:limit]
@@ -0,0 +1,130 @@
+"""Websocket API of the GTFS Realtime integration."""
+
+from typing import Any
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+
+from .const import (
+    CONF_STOP_IDS,
+    HEADSIGN,
+    ROUTE_COLOR,
+    ROUTE_ID,
+    ROUTE_TEXT_COLOR,
+    ROUTE_TYPE,
+    TRIP_ID,
+)
+from .coordinator import StopArrival
+from .services import (
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_LIMIT,
+    ATTR_STOPS,
+    DEFAULT_DEPARTURES_LIMIT,
+    get_coordinators,
+    get_stop_departures,
+)
+
+ATTR_ARRIVAL = "arrival"
+ATTR_REMOVE = "remove"
+ATTR_UPSERT = "upsert"
+
+
+@callback
+def async_setup_websocket_api(hass: HomeAssistant) -> None:
+    """Register the websocket commands of the integration."""
+    websocket_api.async_register_command(hass, websocket_subscribe_departures)
+
+
+def _departure_message(arrival: StopArrival) -> dict[str, Any]:
+    # The arrival is absolute, so the countdown does not change the message
+    return {
+        ROUTE_ID: arrival.route_id,
+        HEADSIGN: arrival.headsign,
+        TRIP_ID: arrival.trip_id,
+        ROUTE_COLOR: arrival.route_color,
+        ROUTE_TEXT_COLOR: arrival.route_text_color,
+        ROUTE_TYPE: arrival.route_type,
+        ATTR_ARRIVAL: arrival.timestamp,
+    }
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "gtfs_realtime/subscribe_departures",
+        vol.Required(CONF_STOP_IDS): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_LIMIT, default=DEFAULT_DEPARTURES_LIMIT): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
+    }
+)
+@callback
+def websocket_subscribe_departures(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: dict[str, Any],
+) -> None:
+    """Subscribe to the next departures at stops.
+
+    The first event lists the departures of every stop, the following ones
+    only the departures added or changed and the trips removed at the stops
+    that changed, keyed by trip ID. Arrivals are POSIX timestamps, so nothing
+    is sent between realtime updates.
+    """
+    try:
+        coordinators = get_coordinators(hass, msg.get(ATTR_CONFIG_ENTRY_ID))
+    except ServiceValidationError:
+        connection.send_error(
+            msg["id"],
+            websocket_api.ERR_NOT_FOUND,
+            f"GTFS Realtime entry {msg[ATTR_CONFIG_ENTRY_ID]} not found or not loaded",
+        )
+        return
+    stop_ids: list[str] = msg[CONF_STOP_IDS]
+    limit: int = msg[ATTR_LIMIT]
+    # Departures last sent for each stop, by trip ID
+    sent: dict[str, dict[str, StopArrival]] = {}
+
+    @callback
+    def async_send_changes() -> None:
+        changes: dict[str, dict[str, list]] = {}
+        for stop_id in stop_ids:
+            departures = {
+                arrival.trip_id: arrival
+                for arrival in get_stop_departures(coordinators, stop_id, limit)
+            }
+            if (last := sent.get(stop_id)) == departures:
+                continue
+            last = last or {}
+            change: dict[str, list] = {
+                ATTR_UPSERT: [
+                    _departure_message(arrival)
+                    for trip_id, arrival in departures.items()
+                    if last.get(trip_id) != arrival
+                ]
+            }
+            if removed := [trip_id for trip_id in last if trip_id not in departures]:
+                change[ATTR_REMOVE] = removed
+            changes[stop_id] = change
+            sent[stop_id] = departures
+        if changes:
+            connection.send_message(
+                websocket_api.event_message(msg["id"], {ATTR_STOPS: changes})
+            )
+
+    unsubs = [
+        coordinator.async_add_listener(async_send_changes)
+        for coordinator in coordinators
+    ]
+
+    @callback
+    def async_unsubscribe() -> None:
+        for unsub in unsubs:
+            unsub()
+
+    connection.subscriptions[msg["id"]] = async_unsubscribe
+    connection.send_result(msg["id"])
+    async_send_changes()
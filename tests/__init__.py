@@ -1 +1,12 @@
 """Tests for GTFS Realtime Custom Component."""
+
+from collections.abc import Collection
+
+from aiohttp import ClientSession
+
+
+async def fetch_empty_feeds(
+    session: ClientSession | None, uris: Collection[str]
+) -> dict[str, bytes]:
+    """Fetch an empty feed from every endpoint, in place of the real requests."""
+    return dict.fromkeys(uris, b"")
@@ -1,20 +1,35 @@
 """Fixtures for testing."""
 
+from collections.abc import AsyncIterator
+from dataclasses import replace
 from datetime import date
 import json
 from pathlib import Path
+import time
+from unittest.mock import AsyncMock, patch
+from zipfile import ZipFile
 
 from gtfs_station_stop.calendar import Service, ServiceDays
 from gtfs_station_stop.route_info import RouteInfo
 from gtfs_station_stop.schedule import GtfsSchedule
 from gtfs_station_stop.station_stop_info import StationStopInfo
 from gtfs_station_stop.trip_info import TripInfo
+from homeassistant.core import HomeAssistant
 import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
+from pytest_homeassistant_custom_component.test_util.aiohttp import (
+    AiohttpClientMocker,
+)
 from syrupy.extensions.amber import AmberSnapshotExtension
 from syrupy.location import PyTestLocation
 
 from custom_components.gtfs_realtime.config_flow import DOMAIN
+from custom_components.gtfs_realtime.coordinator import (
+    GtfsRealtimeCoordinator,
+    StopArrival,
+)
+
+from . import fetch_empty_feeds
 
 DIFFERENT_DIRECTORY = "snapshots"
 
@@ -76,6 +91,59 @@ def create_config_entry_v2_nodialout():
     yield MockConfigEntry(**conf)
 
 
+@pytest.fixture(name="static_feeds")
+def static_feeds_fixture(
+    hass: HomeAssistant, aioclient_mock: AiohttpClientMocker, tmp_path: Path
+) -> AiohttpClientMocker:
+    """Serve the static feeds of the mock entries and cache them in a temp dir."""
+    hass.config.config_dir = str(tmp_path)
+    for uri in ["https://example.com/gtfs1.zip", "https://example.com/gtfs2.zip"]:
+        aioclient_mock.get(uri, content=uri.encode(), headers={"ETag": f'"{uri}"'})
+    return aioclient_mock
+
+
+@pytest.fixture(name="realtime_feeds")
+async def realtime_feeds_fixture(
+    hass: HomeAssistant, aioclient_mock: AiohttpClientMocker
+) -> AsyncIterator[AiohttpClientMocker]:
+    """Fetch realtime feeds from the mocked client."""
+    session = aioclient_mock.create_session(hass.loop)
+    with patch(
+        "custom_components.gtfs_realtime.hub.async_get_realtime_session",
+        return_value=session,
+    ):
+        yield aioclient_mock
+    await session.close()
+
+
+@pytest.fixture(name="gtfs_zip")
+def gtfs_zip_fixture(tmp_path: Path) -> str:
+    """Small static GTFS zip with a trip on each of two routes."""
+    gtfs_zip = tmp_path / "gtfs.zip"
+    with ZipFile(gtfs_zip, "w") as z:
+        z.writestr("stops.txt", "stop_id,stop_name\nStop,Stop Name\nOther,Other Stop\n")
+        z.writestr(
+            "routes.txt",
+            "route_id,route_long_name,route_type\n"
+            "Route,Long Name,1\n"
+            "Express,Express Name,1\n",
+        )
+        z.writestr(
+            "trips.txt",
+            "route_id,service_id,trip_id\n"
+            "Route,Normal,Trip\n"
+            "Express,Normal,ExpressTrip\n",
+        )
+        z.writestr(
+            "stop_times.txt",
+            "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+            "Trip,12:00:00,12:00:00,Stop,1\n"
+            "Trip,12:05:00,12:05:00,Other,2\n"
+            "ExpressTrip,13:00:00,13:00:00,Other,1\n",
+        )
+    return str(gtfs_zip)
+
+
 @pytest.fixture(name="mock_schedule")
 def mock_schedule_fixture():
     """GTFS Schedule Fixture."""
@@ -100,3 +168,55 @@ def mock_schedule_fixture():
         {"trip_id": "Trip", "route_id": "Route", "service_id": "Normal"}
     )
     return mock_schedule
+
+
+def make_arrival(minutes: float, trip_id: str, route_id: str = "1") -> StopArrival:
+    """Create an arrival in the given minutes."""
+    return StopArrival(
+        timestamp=time.time() + minutes * 60,
+        route_id=route_id,
+        trip_id=trip_id,
+        headsign="Uptown",
+        route_color="EE352E",
+        route_text_color="FFFFFF",
+        route_type="Subway",
+    )
+
+
+@pytest.fixture(name="departures_coordinator")
+async def departures_coordinator_fixture(
+    hass: HomeAssistant, entry_v2_nodialout: MockConfigEntry
+) -> GtfsRealtimeCoordinator:
+    """Coordinator of a loaded entry with arrivals at two stops."""
+    with (
+        patch(
+            "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+            new_callable=AsyncMock,
+            side_effect=fetch_empty_feeds,
+        ),
+        patch(
+            "custom_components.gtfs_realtime.coordinator.GtfsRealtimeCoordinator.async_update_static_data",
+            new_callable=AsyncMock,
+        ),
+    ):
+        entry_v2_nodialout.add_to_hass(hass)
+        assert await hass.config_entries.async_setup(entry_v2_nodialout.entry_id)
+        await hass.async_block_till_done()
+    coordinator: GtfsRealtimeCoordinator = entry_v2_nodialout.runtime_data
+    schedule = GtfsSchedule()
+    for stop_id, name, lat, lon in [
+        ("101N", "Van Cortlandt Park", "40.889248", "-73.898583"),
+        ("102S", "238 St", "40.884667", "-73.90087"),
+    ]:
+        schedule.station_stop_info_ds.station_stop_infos[stop_id] = StationStopInfo(
+            {"stop_id": stop_id, "stop_name": name, "stop_lat": lat, "stop_lon": lon}
+        )
+    coordinator.gtfs_update_data = replace(
+        coordinator.gtfs_update_data,
+        schedule=schedule,
+        arrivals={
+            "101N": tuple(make_arrival(i * 5 + 1, f"N{i}") for i in range(6)),
+            "102S": (make_arrival(2, "S0", "2"),),
+        },
+    )
+    return coordinator
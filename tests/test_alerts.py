@@ -0,0 +1,84 @@
+"""Test the index of service alerts."""
+
+import time
+
+from google.transit import gtfs_realtime_pb2
+
+from custom_components.gtfs_realtime.alerts import (
+    AlertIndex,
+    InformedEntityType,
+    decode_alerts,
+)
+
+
+def add_alert(
+    feed: gtfs_realtime_pb2.FeedMessage,
+    header: str,
+    *,
+    active: bool = True,
+    **informed_entity,
+) -> None:
+    """Add an alert in English and Spanish, informing about an entity."""
+    entity = feed.entity.add(id=f"{header}-{len(feed.entity)}")
+    period = entity.alert.active_period.add(start=int(time.time()) - 60)
+    if not active:
+        period.end = int(time.time()) - 30
+    for language, text in [("en", header), ("es", f"{header} (es)")]:
+        entity.alert.header_text.translation.add(language=language, text=text)
+        entity.alert.description_text.translation.add(
+            language=language, text=f"About {text}"
+        )
+    trip_id = informed_entity.pop("trip_id", None)
+    selector = entity.alert.informed_entity.add(**informed_entity)
+    if trip_id is not None:
+        selector.trip.trip_id = trip_id
+
+
+def test_decode_alerts():
+    """Test active alerts are decoded once, with the entities they inform about."""
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = "2.0"
+    add_alert(feed, "Delays", route_id="1", stop_id="101N")
+    add_alert(feed, "Delays", trip_id="T1")
+    add_alert(feed, "Strike", agency_id="MTA")
+    add_alert(feed, "Over", route_id="1", active=False)
+    alerts = decode_alerts(feed)
+    assert {
+        alert.header_text[0][1]: informed for alert, informed in alerts.items()
+    } == {
+        "Delays": {
+            (InformedEntityType.ROUTE, "1"),
+            (InformedEntityType.STOP, "101N"),
+            (InformedEntityType.TRIP, "T1"),
+        },
+        "Strike": {(InformedEntityType.AGENCY, "MTA")},
+    }
+
+
+def test_rebuild_alert_index():
+    """Test unchanged alerts are reused when the index is rebuilt."""
+    feed = gtfs_realtime_pb2.FeedMessage()
+    add_alert(feed, "Delays", route_id="1")
+    add_alert(feed, "Elevator", stop_id="101N")
+    alert_index = AlertIndex().rebuild(decode_alerts(feed), "es")
+    assert len(alert_index) == 2
+    (route_alert,) = alert_index.get(InformedEntityType.ROUTE, "1")
+    assert route_alert.header == "Delays (es)"
+    assert route_alert.description == "About Delays (es)"
+    assert alert_index.get(InformedEntityType.ROUTE, "2") == ()
+
+    add_alert(feed, "Crowding", stop_id="101N")
+    rebuilt = alert_index.rebuild(decode_alerts(feed), "es")
+    assert rebuilt.get(InformedEntityType.ROUTE, "1") is alert_index.get(
+        InformedEntityType.ROUTE, "1"
+    )
+    assert [alert.header for alert in rebuilt.get(InformedEntityType.STOP, "101N")] == [
+        "Elevator (es)",
+        "Crowding (es)",
+    ]
+
+    # Another language translates the alerts again
+    (route_alert,) = rebuilt.rebuild(decode_alerts(feed), "en").get(
+        InformedEntityType.ROUTE, "1"
+    )
+    assert route_alert.header == "Delays"
@@ -1,8 +1,10 @@
 """Test sensor."""
 
+import time
 from unittest.mock import AsyncMock, patch
 
-from homeassistant.const import STATE_OFF
+from google.transit import gtfs_realtime_pb2
+from homeassistant.const import STATE_OFF, STATE_ON
 from homeassistant.core import HomeAssistant
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
@@ -26,3 +28,51 @@ async def test_setup_binary_sensors(
         await hass.async_block_till_done()
         assert hass.states.get("binary_sensor.1_service_alerts").state == STATE_OFF
         assert hass.states.get("binary_sensor.2_service_alerts").state == STATE_OFF
+
+
+async def test_alert_sensors(hass: HomeAssistant, entry_v2_nodialout: MockConfigEntry):
+    """Test route and stop alert sensors, stops including their trips' alerts."""
+    now = int(time.time())
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = "2.0"
+    trip_update = feed.entity.add(id="trip").trip_update
+    trip_update.trip.trip_id = "T1"
+    trip_update.trip.route_id = "1"
+    trip_update.stop_time_update.add(stop_id="101N").arrival.time = now + 300
+    for header, informed_entity in [
+        ("Delays", {"route_id": "1", "stop_id": "102S"}),
+        ("Express", {"trip": {"trip_id": "T1"}}),
+    ]:
+        alert = feed.entity.add(id=header).alert
+        alert.active_period.add(start=now - 60)
+        alert.header_text.translation.add(language="en", text=header)
+        alert.description_text.translation.add(language="en", text=f"About {header}")
+        alert.informed_entity.add(**informed_entity)
+    with (
+        patch(
+            "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+            new_callable=AsyncMock,
+            return_value={
+                "https://api-endpoint.example.com/rt1": feed.SerializeToString()
+            },
+        ),
+        patch(
+            "custom_components.gtfs_realtime.coordinator.GtfsRealtimeCoordinator.async_update_static_data",
+            new_callable=AsyncMock,
+        ),
+    ):
+        entry_v2_nodialout.add_to_hass(hass)
+        assert await hass.config_entries.async_setup(entry_v2_nodialout.entry_id)
+        await hass.async_block_till_done()
+    # The first countdown tick after the entities were added
+    entry_v2_nodialout.runtime_data.async_update_listeners()
+
+    state = hass.states.get("binary_sensor.1_service_alerts")
+    assert state.state == STATE_ON
+    assert state.attributes["header_1"] == "Delays"
+    assert state.attributes["description_1"] == "About Delays"
+    assert hass.states.get("binary_sensor.2_service_alerts").state == STATE_OFF
+    state = hass.states.get("binary_sensor.101n_service_alerts")
+    assert state.state == STATE_ON
+    assert state.attributes["header_1"] == "Express"
+    assert hass.states.get("binary_sensor.102s_service_alerts").state == STATE_ON
@@ -0,0 +1,162 @@
+"""Test the static feed cache."""
+
+import asyncio
+import hashlib
+from http import HTTPStatus
+from pathlib import Path
+from unittest.mock import patch
+
+from freezegun.api import FrozenDateTimeFactory
+from gtfs_station_stop.schedule import GtfsSchedule
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.test_util.aiohttp import (
+    AiohttpClientMocker,
+)
+
+from custom_components.gtfs_realtime.cache import (
+    SHARED_FETCH_MAX_AGE,
+    GtfsStaticCache,
+    async_get_static_cache,
+)
+
+STATIC_URL = "https://example.com/gtfs.zip"
+
+
+async def test_fetch_stores_content(
+    hass: HomeAssistant, aioclient_mock: AiohttpClientMocker, tmp_path: Path
+):
+    """Test the first fetch downloads and stores the feed."""
+    hass.config.config_dir = str(tmp_path)
+    aioclient_mock.get(STATIC_URL, content=b"v1", headers={"ETag": '"v1"'})
+    cache = GtfsStaticCache(hass)
+
+    entry, changed = await cache.async_fetch(STATIC_URL, {"X-Api-Key": "secret"})
+
+    assert changed
+    assert entry.etag == '"v1"'
+    assert Path(entry.path).read_bytes() == b"v1"
+    assert aioclient_mock.mock_calls[0][3] == {"X-Api-Key": "secret"}
+
+
+async def test_fetch_not_modified(
+    hass: HomeAssistant, aioclient_mock: AiohttpClientMocker, tmp_path: Path
+):
+    """Test validators are sent and a 304 response reuses the cached copy."""
+    hass.config.config_dir = str(tmp_path)
+    aioclient_mock.get(
+        STATIC_URL,
+        content=b"v1",
+        headers={"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"},
+    )
+    await GtfsStaticCache(hass).async_fetch(STATIC_URL)
+
+    aioclient_mock.clear_requests()
+    aioclient_mock.get(STATIC_URL, status=HTTPStatus.NOT_MODIFIED)
+    # A new cache instance reads the validators back from disk
+    entry, changed = await GtfsStaticCache(hass).async_fetch(STATIC_URL)
+
+    assert not changed
+    assert Path(entry.path).read_bytes() == b"v1"
+    request_headers = aioclient_mock.mock_calls[0][3]
+    assert request_headers["If-None-Match"] == '"v1"'
+    assert request_headers["If-Modified-Since"] == "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+async def test_fetch_unchanged_content(
+    hass: HomeAssistant,
+    freezer: FrozenDateTimeFactory,
+    aioclient_mock: AiohttpClientMocker,
+    tmp_path: Path,
+):
+    """Test servers without validators are detected as unchanged by content hash."""
+    hass.config.config_dir = str(tmp_path)
+    aioclient_mock.get(STATIC_URL, content=b"v1")
+    cache = GtfsStaticCache(hass)
+    await cache.async_fetch(STATIC_URL)
+
+    freezer.tick(SHARED_FETCH_MAX_AGE)
+    _, changed = await cache.async_fetch(STATIC_URL)
+    assert not changed
+    assert aioclient_mock.call_count == 2
+
+    aioclient_mock.clear_requests()
+    aioclient_mock.get(STATIC_URL, content=b"v2")
+    freezer.tick(SHARED_FETCH_MAX_AGE)
+    entry, changed = await cache.async_fetch(STATIC_URL)
+    assert changed
+    assert Path(entry.path).read_bytes() == b"v2"
+
+
+async def test_fetch_streams_to_disk(
+    hass: HomeAssistant,
+    freezer: FrozenDateTimeFactory,
+    aioclient_mock: AiohttpClientMocker,
+    tmp_path: Path,
+):
+    """Test feeds are written and hashed in chunks, leaving no temporary files."""
+    hass.config.config_dir = str(tmp_path)
+    content = bytes(range(256)) * 40
+    aioclient_mock.get(STATIC_URL, content=content)
+    cache = GtfsStaticCache(hass)
+
+    with patch("custom_components.gtfs_realtime.cache.DOWNLOAD_CHUNK_SIZE", 1000):
+        entry, changed = await cache.async_fetch(STATIC_URL)
+        assert changed
+        assert Path(entry.path).read_bytes() == content
+        assert entry.sha256 == hashlib.sha256(content).hexdigest()
+
+        freezer.tick(SHARED_FETCH_MAX_AGE)
+        _, changed = await cache.async_fetch(STATIC_URL)
+        assert not changed
+    assert not list(cache.cache_dir.glob("*.tmp"))
+
+
+async def test_concurrent_fetches_share_one_request(
+    hass: HomeAssistant, aioclient_mock: AiohttpClientMocker, tmp_path: Path
+):
+    """Test sources of the same feed fetching together share one request."""
+    hass.config.config_dir = str(tmp_path)
+    aioclient_mock.get(STATIC_URL, content=b"v1")
+    cache = async_get_static_cache(hass)
+    assert async_get_static_cache(hass) is cache
+
+    (entry, changed), (other_entry, other_changed) = await asyncio.gather(
+        cache.async_fetch(STATIC_URL), cache.async_fetch(STATIC_URL)
+    )
+
+    assert aioclient_mock.call_count == 1
+    assert entry is other_entry
+    assert changed != other_changed
+
+
+async def test_snapshot_round_trip(
+    hass: HomeAssistant,
+    aioclient_mock: AiohttpClientMocker,
+    tmp_path: Path,
+    mock_schedule: GtfsSchedule,
+):
+    """Test a saved schedule is loaded back until the feed content changes."""
+    hass.config.config_dir = str(tmp_path)
+    aioclient_mock.get(STATIC_URL, content=b"v1")
+    cache = GtfsStaticCache(hass)
+    await cache.async_fetch(STATIC_URL)
+    await cache.async_save_snapshot(STATIC_URL, mock_schedule)
+
+    schedule = await GtfsStaticCache(hass).async_load_snapshot(STATIC_URL)
+    assert schedule is not None
+    assert schedule.route_info_ds.route_infos["Route"].long_name == "Long Route Name"
+    assert set(schedule.trip_info_ds.trip_infos) == {"Trip"}
+    # Filtered schedules of the same feed are saved separately
+    assert await cache.async_load_snapshot(STATIC_URL, "filtered") is None
+    await cache.async_save_snapshot(STATIC_URL, GtfsSchedule(), "filtered")
+    assert await cache.async_load_snapshot(STATIC_URL, "filtered") is not None
+    # Any variant is used when one is enough
+    schedule = await cache.async_load_any_snapshot(STATIC_URL)
+    assert set(schedule.trip_info_ds.trip_infos) == {"Trip"}
+    cache._snapshot_path(STATIC_URL).unlink()
+    assert await cache.async_load_any_snapshot(STATIC_URL) is not None
+
+    aioclient_mock.clear_requests()
+    aioclient_mock.get(STATIC_URL, content=b"v2")
+    await cache.async_fetch(STATIC_URL)
+    assert await cache.async_load_snapshot(STATIC_URL) is None
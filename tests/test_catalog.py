@@ -0,0 +1,75 @@
+"""Test the cached catalog of preconfigured providers."""
+
+from datetime import timedelta
+from http import HTTPStatus
+import json
+from unittest.mock import patch
+
+from aiohttp import hdrs
+from freezegun.api import FrozenDateTimeFactory
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.test_util.aiohttp import (
+    AiohttpClientMocker,
+)
+
+from custom_components.gtfs_realtime.catalog import (
+    CATALOG_MAX_AGE,
+    FeedsCatalog,
+    async_get_feeds_catalog,
+)
+from custom_components.gtfs_realtime.const import FEEDS_URL
+
+PUBLISHED_FEEDS = {"published": {"name": "Published Provider"}}
+
+
+async def test_catalog_served_from_cache(
+    hass: HomeAssistant,
+    aioclient_mock: AiohttpClientMocker,
+    freezer: FrozenDateTimeFactory,
+    hass_storage,
+):
+    """Test the catalog never waits on the network and is revalidated by ETag."""
+    aioclient_mock.get(
+        FEEDS_URL, text=json.dumps(PUBLISHED_FEEDS), headers={hdrs.ETAG: '"v1"'}
+    )
+    catalog = async_get_feeds_catalog(hass)
+    assert async_get_feeds_catalog(hass) is catalog
+
+    # The bundled catalog is used until the published one is fetched
+    feeds = await catalog.async_get_feeds()
+    assert "ac_transit" in feeds
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert await catalog.async_get_feeds() == PUBLISHED_FEEDS
+    assert "ac_transit" in await catalog.async_get_feeds(use_local=True)
+    assert aioclient_mock.call_count == 1
+
+    # A stale catalog is still served while it is revalidated
+    aioclient_mock.clear_requests()
+    aioclient_mock.get(FEEDS_URL, status=HTTPStatus.NOT_MODIFIED)
+    freezer.tick(CATALOG_MAX_AGE + timedelta(seconds=1))
+    assert await catalog.async_get_feeds() == PUBLISHED_FEEDS
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert aioclient_mock.mock_calls[0][3] == {hdrs.IF_NONE_MATCH: '"v1"'}
+    assert await catalog.async_get_feeds() == PUBLISHED_FEEDS
+    assert aioclient_mock.call_count == 1
+
+    # The catalog is saved to disk
+    catalog = FeedsCatalog(hass)
+    assert await catalog.async_get_feeds() == PUBLISHED_FEEDS
+    assert catalog.etag == '"v1"'
+
+
+async def test_catalog_fetch_fails(
+    hass: HomeAssistant, aioclient_mock: AiohttpClientMocker
+):
+    """Test the bundled and user catalogs are served when the fetch fails."""
+    aioclient_mock.get(FEEDS_URL, status=HTTPStatus.NOT_FOUND)
+    catalog = FeedsCatalog(hass)
+    with patch(
+        "custom_components.gtfs_realtime.catalog._read_feeds",
+        side_effect=[{"bundled": {}}, {"user": {}}, {"user": {}}],
+    ):
+        assert await catalog.async_get_feeds() == {"bundled": {}, "user": {}}
+        await hass.async_block_till_done(wait_background_tasks=True)
+        assert catalog.feeds is None
+        assert await catalog.async_get_feeds() == {"bundled": {}, "user": {}}
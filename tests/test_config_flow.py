@@ -1,8 +1,11 @@
 """Test Config Flow."""
 
+import asyncio
 from unittest.mock import AsyncMock, patch
 
 from aiohttp.web import HTTPNotFound
+from gtfs_station_stop.schedule import GtfsSchedule
+from gtfs_station_stop.station_stop_info import StationStopInfo
 from homeassistant import config_entries
 from homeassistant.config_entries import ConfigFlowResult
 from homeassistant.core import HomeAssistant
@@ -10,8 +13,15 @@ from homeassistant.data_entry_flow import FlowResultType
 from homeassistant.helpers.selector import SelectOptionDict
 import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
+from pytest_homeassistant_custom_component.test_util.aiohttp import (
+    AiohttpClientMocker,
+)
 
-from custom_components.gtfs_realtime.config_flow import GtfsRealtimeConfigFlow
+from custom_components.gtfs_realtime.config_flow import (
+    MAX_STOP_OPTIONS,
+    GtfsRealtimeConfigFlow,
+    _endpoint_labels,
+)
 from custom_components.gtfs_realtime.const import (
     CONF_ARRIVAL_LIMIT,
     CONF_GTFS_PROVIDER,
@@ -20,10 +30,17 @@ from custom_components.gtfs_realtime.const import (
     CONF_ROUTE_IDS,
     CONF_STATIC_SOURCES_UPDATE_FREQUENCY,
     CONF_STOP_IDS,
+    CONF_STOP_SEARCH,
     CONF_URL_ENDPOINTS,
+    CONF_URL_ENDPOINTS_UPDATE_FREQUENCY,
     CONF_USE_LOCAL_FEEDS,
     DOMAIN,
 )
+from custom_components.gtfs_realtime.datasets import StaticFilter
+from custom_components.gtfs_realtime.static import async_acquire_static_source
+from custom_components.gtfs_realtime.stop_index import StopIndex
+
+from . import fetch_empty_feeds
 
 
 @pytest.fixture(name="flow")
@@ -113,14 +130,16 @@ async def test_step_user(flow: GtfsRealtimeConfigFlow) -> None:
     GtfsRealtimeConfigFlow._get_feeds.assert_called()  # pylint: disable=protected-access
 
 
-async def test_step_user_get_local_feeds() -> None:
+async def test_step_user_get_local_feeds(hass: HomeAssistant) -> None:
     """Test Getting Local Feeds. Verify the feeds.json file can be read."""
     local_feed_flow = GtfsRealtimeConfigFlow()
+    local_feed_flow.hass = hass
     result: ConfigFlowResult = await local_feed_flow.async_step_user(
         {CONF_USE_LOCAL_FEEDS: True}
     )
     assert result["type"] == FlowResultType.FORM
     assert result["errors"] == {}
+    assert "ac_transit" in GtfsRealtimeConfigFlow.feeds
 
 
 async def test_step_user_input_manual_provider(flow: GtfsRealtimeConfigFlow) -> None:
@@ -185,6 +204,143 @@ async def test_step_choose_informed_entities(
     assert result["step_id"] == "choose_informed_entities"
 
 
+async def test_options_share_one_schedule_load(
+    hass: HomeAssistant,
+    flow: GtfsRealtimeConfigFlow,
+    example_gtfs_feed_data,
+    aioclient_mock: AiohttpClientMocker,
+) -> None:
+    """Test the stop and route options are built from a single schedule load."""
+    flow.hass = hass
+    flow.hub_config |= example_gtfs_feed_data
+    # Without range requests, the whole feed is loaded
+    aioclient_mock.get("https://gtfs.example.com/static1.zip", content=b"")
+    with patch(
+        "custom_components.gtfs_realtime.config_flow.GtfsSchedule.async_update_schedule",
+        new_callable=AsyncMock,
+        return_value=None,
+    ) as async_update_schedule_mock:
+        await asyncio.gather(flow._get_stop_options(), flow._get_route_options())
+        await flow._get_stop_options()
+        async_update_schedule_mock.assert_called_once_with(
+            "https://gtfs.example.com/static1.zip", headers=None
+        )
+
+        # Other headers load the schedule again
+        await flow._get_route_options({"X-Api-Key": "a"})
+        assert async_update_schedule_mock.call_count == 2
+
+
+async def test_options_borrow_loaded_schedule(
+    hass: HomeAssistant,
+    flow: GtfsRealtimeConfigFlow,
+    example_gtfs_feed_data,
+    mock_schedule: GtfsSchedule,
+) -> None:
+    """Test the options use a schedule another entry loaded without downloading."""
+    flow.hass = hass
+    flow.hub_config |= example_gtfs_feed_data
+    static_source = async_acquire_static_source(
+        hass,
+        "https://gtfs.example.com/static1.zip",
+        static_filter=StaticFilter(stop_ids=frozenset({"Stop"})),
+    )
+    static_source.schedule = mock_schedule
+    with patch(
+        "custom_components.gtfs_realtime.config_flow.GtfsSchedule.async_update_schedule",
+        new_callable=AsyncMock,
+        return_value=None,
+    ) as async_update_schedule_mock:
+        routes = await flow._get_route_options()
+    async_update_schedule_mock.assert_not_called()
+    assert routes == [SelectOptionDict(value="Route", label="Route: Long Route Name")]
+
+
+async def test_stop_options_nearest_home_or_searched(
+    hass: HomeAssistant,
+    flow: GtfsRealtimeConfigFlow,
+    example_gtfs_feed_data,
+) -> None:
+    """Test large schedules only offer the stops nearest home or matching a search."""
+    flow.hass = hass
+    flow.hub_config |= example_gtfs_feed_data
+    schedule = GtfsSchedule()
+    # A line of stops heading north from home, about 50 meters apart
+    for i in range(1000):
+        schedule.station_stop_info_ds.station_stop_infos[f"S{i}"] = StationStopInfo(
+            {
+                "stop_id": f"S{i}",
+                "stop_name": f"Stop {i}",
+                "stop_lat": str(hass.config.latitude + i * 0.00045),
+                "stop_lon": str(hass.config.longitude),
+            }
+        )
+    with patch.object(
+        GtfsRealtimeConfigFlow, "_async_load_schedule", new_callable=AsyncMock
+    ):
+        flow.schedule = schedule
+        stops = await flow._get_stop_options()
+        assert [stop["value"] for stop in stops] == [
+            f"S{i}" for i in range(MAX_STOP_OPTIONS)
+        ]
+        assert stops[0]["label"] == "Stop 0  (S0)"
+
+        stops = await flow._get_stop_options(None, "stop 99", ["S500"])
+        assert [stop["value"] for stop in stops] == [
+            "S500",
+            "S99",
+            *(f"S{i}" for i in range(990, 1000)),
+        ]
+
+        # Feeds far from home offer their first stops, without walking the grid
+        hass.config.latitude += 40
+        with patch.object(
+            StopIndex, "nearest", wraps=flow._stop_index.nearest
+        ) as nearest:
+            stops = await flow._get_stop_options()
+        nearest.assert_called_once()
+        assert [stop["value"] for stop in stops] == [
+            f"S{i}" for i in range(MAX_STOP_OPTIONS)
+        ]
+
+
+async def test_step_choose_informed_entities_search_stops(
+    flow: GtfsRealtimeConfigFlow,
+    example_gtfs_feed_data,
+) -> None:
+    """Test searching stops shows the form again, keeping the selected stops."""
+    flow.hub_config |= example_gtfs_feed_data
+    with (
+        patch.object(
+            GtfsRealtimeConfigFlow,
+            "_get_stop_options",
+            return_value=[SelectOptionDict(value="A", label="Stop A")],
+        ) as get_stop_options_mock,
+        patch.object(GtfsRealtimeConfigFlow, "_get_route_options", return_value=[]),
+    ):
+        result: ConfigFlowResult = await flow.async_step_choose_informed_entities(
+            user_input={CONF_STOP_SEARCH: "main st", CONF_STOP_IDS: ["B"]}
+        )
+    assert result["type"] == FlowResultType.FORM
+    assert result["step_id"] == "choose_informed_entities"
+    assert not result["errors"]
+    get_stop_options_mock.assert_called_once_with(None, "main st", ["B"])
+    # The search is not filled in again, so submitting the stops creates the entry
+    search_key = next(
+        key for key in result["data_schema"].schema if key == CONF_STOP_SEARCH
+    )
+    assert search_key.description is None
+
+    with (
+        patch.object(GtfsRealtimeConfigFlow, "_get_stop_options", return_value=[]),
+        patch.object(GtfsRealtimeConfigFlow, "_get_route_options", return_value=[]),
+    ):
+        result = await flow.async_step_choose_informed_entities(
+            user_input={CONF_STOP_IDS: ["A"]}
+        )
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+
+
 async def test_step_choose_informed_entities_shows_feed_selector_if_data_pull_fails(
     flow: GtfsRealtimeConfigFlow,
     example_gtfs_feed_data,
@@ -213,6 +369,11 @@ async def test_step_choose_informed_entities_good_data(
     )
     # creates an entry
     assert result["type"] == FlowResultType.CREATE_ENTRY
+    # realtime feeds default to being fetched on every update
+    assert result["data"][CONF_URL_ENDPOINTS_UPDATE_FREQUENCY] == {
+        "https://gtfs.example.com/rt1": {"seconds": 0},
+        "https://gtfs.example.com/rt2": {"seconds": 0},
+    }
 
 
 async def test_step_choose_informed_entities_no_entities(
@@ -239,6 +400,7 @@ async def test_step_reconfigure(
     good_stops_response_patch,
     good_routes_response_patch,
     mock_schedule,
+    static_feeds,
 ) -> None:
     """Test Reconfigure."""
     entry_v2_full.add_to_hass(hass)
@@ -247,12 +409,12 @@ async def test_step_reconfigure(
         good_stops_response_patch,
         good_routes_response_patch,
         patch(
-            "custom_components.gtfs_realtime.coordinator.FeedSubject.async_update",
+            "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
             new_callable=AsyncMock,
-            return_value=None,
+            side_effect=fetch_empty_feeds,
         ),
         patch(
-            "custom_components.gtfs_realtime.coordinator.async_build_schedule",
+            "custom_components.gtfs_realtime.static.async_parse_schedule",
             new_callable=AsyncMock,
             return_value=mock_schedule,
         ),
@@ -274,6 +436,10 @@ async def test_step_reconfigure(
                     "https://example.com/gtfs1.zip": {"hours": 15},
                     "https://example.com/gtfs2.zip": {"days": 42},
                 },
+                # Endpoints are labelled without their query string
+                CONF_URL_ENDPOINTS_UPDATE_FREQUENCY: {
+                    "1. https://api-endpoint.example.com/rt1": {"seconds": 30},
+                },
                 CONF_ROUTE_IDS: [],
                 CONF_STOP_IDS: [],
                 CONF_GTFS_PROVIDER: "Test GTFS Provider",
@@ -298,5 +464,20 @@ async def test_step_reconfigure(
             ]["days"]
             == 42
         )
+        assert entry.data[CONF_URL_ENDPOINTS_UPDATE_FREQUENCY][
+            "https://api-endpoint.example.com/rt1"
+        ] == {"seconds": 30}
 
     hass.stop()
+
+
+def test_endpoint_labels() -> None:
+    """Test realtime endpoints are labelled without the values of their query."""
+    assert _endpoint_labels(
+        ["https://example.com/rt?api_key=secret", "https://example.com/rt"]
+    ) == {
+        "1. https://example.com/rt?api_key=**REDACTED**": (
+            "https://example.com/rt?api_key=secret"
+        ),
+        "2. https://example.com/rt": "https://example.com/rt",
+    }
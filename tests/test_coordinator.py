@@ -1,18 +1,40 @@
 """Test Coordinator."""
 
+import asyncio
 from datetime import timedelta
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 from freezegun.api import FrozenDateTimeFactory
+from google.transit import gtfs_realtime_pb2
+from gtfs_station_stop.arrival import Arrival
 from gtfs_station_stop.feed_subject import FeedSubject
 from gtfs_station_stop.schedule import GtfsSchedule
+from gtfs_station_stop.station_stop import StationStop
 from homeassistant.core import HomeAssistant
 from pytest_homeassistant_custom_component.common import (
     MockConfigEntry,
     async_fire_time_changed,
 )
+from pytest_homeassistant_custom_component.test_util.aiohttp import (
+    AiohttpClientMocker,
+)
+
+from custom_components.gtfs_realtime.cache import SHARED_FETCH_MAX_AGE
+from custom_components.gtfs_realtime.coordinator import (
+    GtfsRealtimeCoordinator,
+    build_arrival_index,
+    drop_departed_arrivals,
+    snapshot_arrivals,
+)
 
-from custom_components.gtfs_realtime.coordinator import GtfsRealtimeCoordinator
+from . import fetch_empty_feeds
+
+
+def publish_new_static_feeds(static_feeds: AiohttpClientMocker) -> None:
+    """Change the content served for the mock static feeds."""
+    static_feeds.clear_requests()
+    for uri in ["https://example.com/gtfs1.zip", "https://example.com/gtfs2.zip"]:
+        static_feeds.get(uri, content=f"{uri} v2".encode())
 
 
 def test_coordinator_construction(hass: HomeAssistant):
@@ -25,20 +47,21 @@ async def test_update_static_data(
     freezer: FrozenDateTimeFactory,
     entry_v2_full: MockConfigEntry,
     mock_schedule: GtfsSchedule,
+    static_feeds: AiohttpClientMocker,
 ):
     """Test updates through the coordinator."""
 
     with (
         patch(
-            "custom_components.gtfs_realtime.coordinator.FeedSubject.async_update",
+            "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
             new_callable=AsyncMock,
-            return_value=None,
+            side_effect=fetch_empty_feeds,
         ),
         patch(
-            "custom_components.gtfs_realtime.coordinator.async_build_schedule",
+            "custom_components.gtfs_realtime.static.async_parse_schedule",
             new_callable=AsyncMock,
             return_value=mock_schedule,
-        ) as async_build_schedule_mock,
+        ) as async_parse_schedule_mock,
         patch(
             "custom_components.gtfs_realtime.coordinator.GtfsSchedule.async_update_schedule",
             new_callable=AsyncMock,
@@ -48,15 +71,200 @@ async def test_update_static_data(
         entry_v2_full.add_to_hass(hass)
         assert await hass.config_entries.async_setup(entry_v2_full.entry_id)
         await hass.async_block_till_done()
-        async_build_schedule_mock.assert_called()
-        async_build_schedule_mock.assert_awaited()
-        update_call_count = async_update_schedule_mock.call_count
+        async_parse_schedule_mock.assert_called()
+        async_parse_schedule_mock.assert_awaited()
+        build_call_count = async_parse_schedule_mock.call_count
 
         # Has provider name
         assert entry_v2_full.runtime_data.gtfs_provider == "Entry V2 Mock"
 
-        # Tick the clock and check if static data is updated
+        # Tick the clock and check if static data is updated in the background
+        publish_new_static_feeds(static_feeds)
         freezer.tick(timedelta(hours=2))
         async_fire_time_changed(hass)
+        await hass.async_block_till_done(wait_background_tasks=True)
+        assert build_call_count < async_parse_schedule_mock.call_count
+        async_update_schedule_mock.assert_not_called()
+
+
+async def test_static_update_does_not_block_realtime(
+    hass: HomeAssistant,
+    freezer: FrozenDateTimeFactory,
+    entry_v2_full: MockConfigEntry,
+    mock_schedule: GtfsSchedule,
+    static_feeds: AiohttpClientMocker,
+):
+    """Test realtime updates continue while a static update is in progress."""
+    static_update_release = asyncio.Event()
+
+    async def slow_parse_schedule(*args, **kwargs) -> GtfsSchedule:
+        await static_update_release.wait()
+        return GtfsSchedule()
+
+    with (
+        patch(
+            "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+            new_callable=AsyncMock,
+            side_effect=fetch_empty_feeds,
+        ) as async_update_mock,
+        patch(
+            "custom_components.gtfs_realtime.static.async_parse_schedule",
+            new_callable=AsyncMock,
+            return_value=mock_schedule,
+        ) as async_parse_schedule_mock,
+    ):
+        entry_v2_full.add_to_hass(hass)
+        assert await hass.config_entries.async_setup(entry_v2_full.entry_id)
+        await hass.async_block_till_done()
+        coordinator: GtfsRealtimeCoordinator = entry_v2_full.runtime_data
+
+        schedule = coordinator.data.schedule
+        async_parse_schedule_mock.side_effect = slow_parse_schedule
+        publish_new_static_feeds(static_feeds)
+        freezer.tick(timedelta(hours=2))
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done()
+        realtime_call_count = async_update_mock.call_count
+
+        # The static update is still pending, but realtime keeps polling
+        freezer.tick(coordinator.realtime_timedelta)
+        async_fire_time_changed(hass)
         await hass.async_block_till_done()
-        assert update_call_count < async_update_schedule_mock.call_count
+        assert async_update_mock.call_count > realtime_call_count
+        assert coordinator.data.schedule is schedule
+
+        # The new schedule is swapped in once the static update finishes
+        static_update_release.set()
+        await hass.async_block_till_done(wait_background_tasks=True)
+        assert coordinator.data.schedule is not schedule
+
+
+async def test_static_data_loaded_from_snapshot(
+    hass: HomeAssistant,
+    freezer: FrozenDateTimeFactory,
+    entry_v2_full: MockConfigEntry,
+    mock_schedule: GtfsSchedule,
+    static_feeds: AiohttpClientMocker,
+):
+    """Test a restart loads the saved schedule instead of parsing the feeds."""
+    with (
+        patch(
+            "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+            new_callable=AsyncMock,
+            side_effect=fetch_empty_feeds,
+        ),
+        patch(
+            "custom_components.gtfs_realtime.static.async_parse_schedule",
+            new_callable=AsyncMock,
+            return_value=mock_schedule,
+        ) as async_parse_schedule_mock,
+    ):
+        entry_v2_full.add_to_hass(hass)
+        assert await hass.config_entries.async_setup(entry_v2_full.entry_id)
+        await hass.async_block_till_done()
+        assert async_parse_schedule_mock.call_count == 2
+
+        freezer.tick(SHARED_FETCH_MAX_AGE)
+        assert await hass.config_entries.async_reload(entry_v2_full.entry_id)
+        await hass.async_block_till_done()
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done(wait_background_tasks=True)
+
+        # The feeds are revalidated, but unchanged feeds are not parsed again
+        assert async_parse_schedule_mock.call_count == 2
+        assert static_feeds.call_count == 4
+        schedule = entry_v2_full.runtime_data.data.schedule
+        assert set(schedule.station_stop_info_ds.station_stop_infos) == {"Stop"}
+
+
+def test_build_arrival_index(mock_schedule: GtfsSchedule):
+    """Test arrivals are sorted, filtered and enriched once per stop."""
+    hub = FeedSubject([])
+    station_stop = StationStop("Stop", hub)
+    station_stop.arrivals = [
+        Arrival(route="", trip="Trip", time=1300.0),
+        Arrival(route="Other", trip="", time=1100.0),
+        Arrival(route="Route", trip="Trip", time=500.0),  # long gone
+    ]
+    empty_stop = StationStop("Empty", hub)
+
+    stop_arrivals = snapshot_arrivals({"Stop": station_stop, "Empty": empty_stop})
+    # The hub resetting the Station Stops does not change the snapshot
+    station_stop.begin_update()
+
+    arrival_index = build_arrival_index(stop_arrivals, mock_schedule, the_time=1000.0)
+
+    assert arrival_index["Empty"] == ()
+    first, second = arrival_index["Stop"]
+    assert first.timestamp == 1100.0
+    assert first.time_to_arrival(1000.0) == 100.0
+    assert first.route_id == "Other"
+    assert second.timestamp == 1300.0
+    # route is filled in from the trip info when missing
+    assert second.route_id == "Route"
+    assert second.route_type == "Subway"
+
+
+def test_drop_departed_arrivals(mock_schedule: GtfsSchedule):
+    """Test departed arrivals are dropped, keeping the arrivals of other stops."""
+    hub = FeedSubject([])
+    station_stop = StationStop("Stop", hub)
+    station_stop.arrivals = [
+        Arrival(route="Route", trip="Trip", time=1100.0),
+        Arrival(route="Other", trip="Other", time=1500.0),
+    ]
+    other_stop = StationStop("Other", hub)
+    other_stop.arrivals = [Arrival(route="Other", trip="Other", time=1500.0)]
+    arrival_index = build_arrival_index(
+        snapshot_arrivals({"Stop": station_stop, "Other": other_stop}),
+        mock_schedule,
+        the_time=1000.0,
+    )
+
+    assert drop_departed_arrivals(arrival_index, the_time=1200.0) is arrival_index
+
+    pruned = drop_departed_arrivals(arrival_index, the_time=1300.0)
+    assert [arrival.trip_id for arrival in pruned["Stop"]] == ["Other"]
+    assert pruned["Other"] is arrival_index["Other"]
+
+
+async def test_unchanged_update_skips_entities(
+    hass: HomeAssistant,
+    freezer: FrozenDateTimeFactory,
+    entry_v2_nodialout: MockConfigEntry,
+):
+    """Test entities are not updated when the feeds and schedule did not change."""
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = "2.0"
+    feed.header.timestamp = 100
+    with (
+        patch(
+            "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+            new_callable=AsyncMock,
+            return_value={"https://gtfs.example.com/rt": feed.SerializeToString()},
+        ),
+        patch(
+            "custom_components.gtfs_realtime.coordinator.GtfsRealtimeCoordinator.async_update_static_data",
+            new_callable=AsyncMock,
+        ),
+    ):
+        entry_v2_nodialout.add_to_hass(hass)
+        assert await hass.config_entries.async_setup(entry_v2_nodialout.entry_id)
+        await hass.async_block_till_done()
+        coordinator: GtfsRealtimeCoordinator = entry_v2_nodialout.runtime_data
+        # The stops subscribed by the sensors are updated on the next refresh
+        freezer.tick(timedelta(minutes=1))
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done(wait_background_tasks=True)
+        data = coordinator.data
+        skipped_updates = coordinator.skipped_updates
+
+        listener = Mock()
+        coordinator.async_add_listener(listener)
+        freezer.tick(timedelta(minutes=1))
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done(wait_background_tasks=True)
+
+        assert coordinator.skipped_updates == skipped_updates + 1
+        assert coordinator.data is data
+        listener.assert_not_called()
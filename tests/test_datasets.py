@@ -0,0 +1,39 @@
+"""Test filtered static datasets."""
+
+from custom_components.gtfs_realtime.datasets import (
+    FilteredStopTimesDataset,
+    FilteredTripInfoDataset,
+    StaticFilter,
+)
+
+
+def test_filtered_stop_times(gtfs_zip: str):
+    """Test only stop times at the kept stops are loaded."""
+    stop_times_ds = FilteredStopTimesDataset(gtfs_zip, stop_ids={"Other"})
+
+    assert set(stop_times_ds.stop_times) == {"Trip", "ExpressTrip"}
+    assert stop_times_ds.get("Trip", 1) is None
+    assert stop_times_ds.get("Trip", 2).stop_id == "Other"
+
+
+def test_filtered_trips(gtfs_zip: str):
+    """Test trips are kept by trip ID or route ID."""
+    trip_info_ds = FilteredTripInfoDataset(
+        gtfs_zip, trip_ids={"Trip"}, route_ids={"Express"}
+    )
+    assert set(trip_info_ds.trip_infos) == {"Trip", "ExpressTrip"}
+
+    trip_info_ds = FilteredTripInfoDataset(gtfs_zip, trip_ids=(), route_ids=())
+    assert not trip_info_ds.trip_infos
+
+
+def test_filter_key():
+    """Test the filter key does not depend on ID order."""
+    assert (
+        StaticFilter(stop_ids=frozenset({"A", "B"})).key
+        == StaticFilter(stop_ids=frozenset({"B", "A"})).key
+    )
+    assert (
+        StaticFilter(stop_ids=frozenset({"A"})).key
+        != StaticFilter(route_ids=frozenset({"A"})).key
+    )
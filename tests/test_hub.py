@@ -0,0 +1,422 @@
+"""Test shared Feed Subjects."""
+
+import asyncio
+from datetime import timedelta
+from http import HTTPStatus
+import threading
+import time
+from unittest.mock import AsyncMock, patch
+
+from freezegun.api import FrozenDateTimeFactory
+from google.transit import gtfs_realtime_pb2
+from gtfs_station_stop.arrival import Arrival
+from gtfs_station_stop.station_stop import StationStop
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from pytest_homeassistant_custom_component.test_util.aiohttp import (
+    AiohttpClientMocker,
+)
+import pytest
+
+from custom_components.gtfs_realtime.hub import (
+    BREAKER_BACKOFF,
+    DATA_FEED_SUBJECTS,
+    DATA_REALTIME_SESSION,
+    MAX_RATE_LIMIT_BACKOFF,
+    MAX_STALE_FEED_AGE,
+    BreakerState,
+    DecodedFeeds,
+    FeedsUnavailableError,
+    SharedFeedSubject,
+    async_acquire_feed_subject,
+    async_get_realtime_session,
+    async_release_feed_subject,
+    decode_stop_arrivals,
+    feed_header_timestamp,
+)
+from custom_components.gtfs_realtime.ratelimit import DEFAULT_RATE_LIMIT, RateLimit
+
+from . import fetch_empty_feeds
+
+ENDPOINTS = ["https://gtfs.example.com/rt1", "https://gtfs.example.com/rt2"]
+
+
+def make_feed(
+    trip_id: str, timestamp: int | None = None
+) -> gtfs_realtime_pb2.FeedMessage:
+    """Create a feed with one arrival at Stop."""
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = "2.0"
+    if timestamp is not None:
+        feed.header.timestamp = timestamp
+    entity = feed.entity.add(id="1")
+    entity.trip_update.trip.trip_id = trip_id
+    entity.trip_update.trip.route_id = "Route"
+    stop_time_update = entity.trip_update.stop_time_update.add(stop_id="Stop")
+    stop_time_update.arrival.time = 1000
+    return feed
+
+
+async def test_acquire_and_release(hass: HomeAssistant):
+    """Test Feed Subjects are shared by endpoints and auth header."""
+    hub = async_acquire_feed_subject(hass, ENDPOINTS, {"X-Api-Key": "a"})
+    assert async_acquire_feed_subject(hass, ENDPOINTS[::-1], {"X-Api-Key": "a"}) is hub
+    assert hub.ref_count == 2
+    assert async_acquire_feed_subject(hass, ENDPOINTS, {"X-Api-Key": "b"}) is not hub
+
+    async_release_feed_subject(hass, hub)
+    assert hub in hass.data[DATA_FEED_SUBJECTS].values()
+    async_release_feed_subject(hass, hub)
+    assert hub not in hass.data[DATA_FEED_SUBJECTS].values()
+
+
+async def test_concurrent_updates_share_one_fetch(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+):
+    """Test updates in flight or within the max age are not fetched again."""
+    hub = SharedFeedSubject(ENDPOINTS, max_age=timedelta(seconds=30))
+    with patch(
+        "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+        new_callable=AsyncMock,
+        side_effect=fetch_empty_feeds,
+    ) as async_fetch_feeds_mock:
+        await asyncio.gather(hub.async_update(), hub.async_update())
+        assert async_fetch_feeds_mock.call_count == 1
+
+        freezer.tick(timedelta(seconds=10))
+        await hub.async_update()
+        assert async_fetch_feeds_mock.call_count == 1
+
+        freezer.tick(timedelta(seconds=30))
+        await hub.async_update()
+        assert async_fetch_feeds_mock.call_count == 2
+
+
+async def test_failed_updates_not_shared(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+):
+    """Test an update where every due endpoint failed is not reused by others."""
+    hub = SharedFeedSubject(ENDPOINTS, max_age=timedelta(seconds=30))
+    with patch(
+        "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+        new_callable=AsyncMock,
+        return_value={},
+    ) as async_fetch_feeds_mock:
+        await hub.async_update()
+        assert hub.last_update is None
+
+        freezer.tick(timedelta(seconds=10))
+        async_fetch_feeds_mock.side_effect = fetch_empty_feeds
+        await hub.async_update()
+        assert async_fetch_feeds_mock.call_count == 2
+        assert hub.last_update is not None
+
+
+async def test_entries_share_feed_subject(
+    hass: HomeAssistant, entry_v2_nodialout: MockConfigEntry
+):
+    """Test entries on the same endpoints share the Feed Subject until unloaded."""
+    other_entry = MockConfigEntry(
+        domain=entry_v2_nodialout.domain,
+        version=entry_v2_nodialout.version,
+        minor_version=entry_v2_nodialout.minor_version,
+        data={**entry_v2_nodialout.data},
+    )
+    with patch(
+        "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+        new_callable=AsyncMock,
+        side_effect=fetch_empty_feeds,
+    ) as async_fetch_feeds_mock:
+        for entry in (entry_v2_nodialout, other_entry):
+            entry.add_to_hass(hass)
+            assert await hass.config_entries.async_setup(entry.entry_id)
+            await hass.async_block_till_done()
+
+        assert entry_v2_nodialout.runtime_data.hub is other_entry.runtime_data.hub
+        assert async_fetch_feeds_mock.call_count == 1
+
+        for entry in (entry_v2_nodialout, other_entry):
+            assert await hass.config_entries.async_unload(entry.entry_id)
+    assert not hass.data[DATA_FEED_SUBJECTS]
+
+
+async def test_decode_in_executor(hass: HomeAssistant):
+    """Test feeds are decoded off the event loop and the timings recorded."""
+    feed = make_feed("Trip")
+    hub = async_acquire_feed_subject(hass, ENDPOINTS)
+    station_stop = StationStop("Stop", hub)
+    with (
+        patch(
+            "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+            new_callable=AsyncMock,
+            return_value={ENDPOINTS[0]: feed.SerializeToString()},
+        ),
+        patch.object(
+            hass, "async_add_executor_job", wraps=hass.async_add_executor_job
+        ) as async_add_executor_job_mock,
+    ):
+        await hub.async_update()
+
+    assert hub.offloaded
+    async_add_executor_job_mock.assert_called_once()
+    assert [arrival.trip for arrival in station_stop.arrivals] == ["Trip"]
+    assert hub.last_fetch_duration is not None
+    assert hub.last_decode_duration is not None
+
+
+async def test_subscribe_while_decoding(hass: HomeAssistant):
+    """Test subscribers are only updated on the event loop, after decoding."""
+    hub = async_acquire_feed_subject(hass, ENDPOINTS[:1])
+    hub.max_age = timedelta(0)
+    station_stop = StationStop("Stop", hub)
+    station_stop.arrivals.append(Arrival(route="Route", trip="Old", time=900))
+    new_station_stops: list[StationStop] = []
+    decode = hub._decode
+    feed = make_feed("Trip")
+    feed.entity[0].trip_update.stop_time_update.add(stop_id="Other").arrival.time = 1100
+
+    def decode_while_subscribing(
+        payloads: list[bytes], stop_ids: frozenset[str]
+    ) -> DecodedFeeds:
+        assert threading.current_thread() is not threading.main_thread()
+        decoded = decode(payloads, stop_ids)
+        # Subscribers keep their data until the decoded feeds are notified
+        assert [arrival.trip for arrival in station_stop.arrivals] == ["Old"]
+        # Entries set up on the event loop while the feeds are being decoded
+        hass.loop.call_soon_threadsafe(
+            lambda: new_station_stops.append(StationStop("Other", hub))
+        )
+        return decoded
+
+    with (
+        patch(
+            "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+            new_callable=AsyncMock,
+            return_value={ENDPOINTS[0]: feed.SerializeToString()},
+        ),
+        patch.object(hub, "_decode", decode_while_subscribing),
+    ):
+        await hub.async_update()
+        assert [arrival.trip for arrival in station_stop.arrivals] == ["Trip"]
+        # Stops subscribing while decoding are updated by the next update
+        assert not new_station_stops[0].arrivals
+
+    await hub.async_update()
+    assert [arrival.trip for arrival in new_station_stops[0].arrivals] == ["Trip"]
+
+
+def test_decode_stop_arrivals():
+    """Test arrivals are decoded only for the given stops."""
+    feed = make_feed("Trip")
+    feed.entity[0].trip_update.stop_time_update.add(stop_id="Other")
+
+    arrivals = decode_stop_arrivals(feed, {"Stop", "Unknown"})
+
+    assert list(arrivals) == ["Stop"]
+    assert [arrival.trip for arrival in arrivals["Stop"]] == ["Trip"]
+    assert arrivals["Stop"][0].time == 1000
+
+
+async def test_unchanged_feeds_skip_decode(hass: HomeAssistant):
+    """Test feeds with the same content or header timestamp are not decoded."""
+    hub = SharedFeedSubject(ENDPOINTS[:1], max_age=timedelta(0))
+    station_stop = StationStop("Stop", hub)
+    with patch(
+        "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+        new_callable=AsyncMock,
+    ) as async_fetch_feeds_mock:
+
+        async def async_update_with(feed: gtfs_realtime_pb2.FeedMessage) -> None:
+            async_fetch_feeds_mock.return_value = {
+                ENDPOINTS[0]: feed.SerializeToString()
+            }
+            await hub.async_update()
+
+        await async_update_with(make_feed("Trip", timestamp=100))
+        assert hub.generation == 1
+        assert (
+            feed_header_timestamp(async_fetch_feeds_mock.return_value[ENDPOINTS[0]])
+            == 100
+        )
+
+        # Same content
+        await async_update_with(make_feed("Trip", timestamp=100))
+        # Same header timestamp
+        await async_update_with(make_feed("Other", timestamp=100))
+        assert hub.generation == 1
+        assert hub.skipped_updates == 2
+        assert [arrival.trip for arrival in station_stop.arrivals] == ["Trip"]
+
+        # New subscribers are updated even if the feeds did not change
+        StationStop("Stop", hub)
+        await async_update_with(make_feed("Other", timestamp=100))
+        assert hub.generation == 2
+
+        # Feeds without a header timestamp are compared by content
+        await async_update_with(make_feed("Trip"))
+        await async_update_with(make_feed("Other"))
+        assert hub.generation == 4
+        assert [arrival.trip for arrival in station_stop.arrivals] == ["Other"]
+
+
+async def test_feed_update_interval_and_rate_limit(
+    hass: HomeAssistant,
+    freezer: FrozenDateTimeFactory,
+    realtime_feeds: AiohttpClientMocker,
+):
+    """Test the age of fetched feeds and rate limited fetches are tracked."""
+    hub = SharedFeedSubject(ENDPOINTS[:1], hass=hass, max_age=timedelta(0))
+    now = int(time.time())
+    for age in (5, 40, 20):
+        realtime_feeds.clear_requests()
+        realtime_feeds.get(
+            ENDPOINTS[0], content=make_feed("Trip", now - age).SerializeToString()
+        )
+        await hub.async_update()
+    assert hub.feed_update_interval == pytest.approx(40, abs=1)
+    assert hub.get_rate_limit_backoff(timedelta(minutes=1)) is None
+
+    realtime_feeds.clear_requests()
+    realtime_feeds.get(ENDPOINTS[0], status=HTTPStatus.TOO_MANY_REQUESTS)
+    for _ in range(2):
+        await hub.async_update()
+    assert hub.get_rate_limit_backoff(timedelta(minutes=1)) == timedelta(minutes=4)
+
+    # A long run of rejections or a huge Retry-After does not overflow
+    state = hub.endpoint_states[ENDPOINTS[0]]
+    state.rate_limited = 1000
+    state.retry_after = 1e20
+    assert hub.get_rate_limit_backoff(timedelta(minutes=1)) == MAX_RATE_LIMIT_BACKOFF
+
+    realtime_feeds.clear_requests()
+    realtime_feeds.get(ENDPOINTS[0], content=make_feed("Trip").SerializeToString())
+    await hub.async_update()
+    assert hub.get_rate_limit_backoff(timedelta(minutes=1)) is None
+
+
+async def test_failing_endpoint_serves_stale_feed(
+    hass: HomeAssistant,
+    freezer: FrozenDateTimeFactory,
+    realtime_feeds: AiohttpClientMocker,
+):
+    """Test a failing endpoint's last feed is served until its breaker opens."""
+    hub = SharedFeedSubject(ENDPOINTS, hass=hass, max_age=timedelta(0))
+    station_stop = StationStop("Stop", hub)
+    for uri in ENDPOINTS:
+        realtime_feeds.get(uri, content=make_feed(uri).SerializeToString())
+    await hub.async_update()
+    assert hub.stale_feed_age is None
+
+    realtime_feeds.clear_requests()
+    realtime_feeds.get(ENDPOINTS[0], content=make_feed("Other").SerializeToString())
+    realtime_feeds.get(ENDPOINTS[1], status=HTTPStatus.SERVICE_UNAVAILABLE)
+    freezer.tick(timedelta(minutes=1))
+    for _ in range(3):
+        await hub.async_update()
+    assert {arrival.trip for arrival in station_stop.arrivals} == {
+        "Other",
+        ENDPOINTS[1],
+    }
+    state = hub.endpoint_states[ENDPOINTS[1]]
+    assert state.failures == 3
+    assert state.error_rate == 0.75
+    assert hub.stale_feed_age == pytest.approx(60, abs=1)
+
+    # The open breaker stops requests until its backoff passed
+    assert state.get_breaker_state(time.monotonic()) is BreakerState.OPEN
+    await hub.async_update()
+    assert realtime_feeds.call_count == 7
+    freezer.tick(BREAKER_BACKOFF)
+    assert state.get_breaker_state(time.monotonic()) is BreakerState.HALF_OPEN
+    await hub.async_update()
+    assert realtime_feeds.call_count == 9
+    assert state.retry_at - time.monotonic() == 2 * BREAKER_BACKOFF.total_seconds()
+
+    # Too old feeds are dropped, and with nothing left to serve the update fails
+    realtime_feeds.clear_requests()
+    for uri in ENDPOINTS:
+        realtime_feeds.get(uri, exc=TimeoutError)
+    freezer.tick(MAX_STALE_FEED_AGE + timedelta(seconds=1))
+    with pytest.raises(FeedsUnavailableError):
+        await hub.async_update()
+    assert state.payload is None
+
+    realtime_feeds.clear_requests()
+    realtime_feeds.get(ENDPOINTS[0], content=make_feed("Trip").SerializeToString())
+    await hub.async_update()
+    assert (
+        hub.endpoint_states[ENDPOINTS[0]].get_breaker_state(time.monotonic())
+        is BreakerState.CLOSED
+    )
+    assert [arrival.trip for arrival in station_stop.arrivals] == ["Trip"]
+
+
+async def test_endpoint_intervals(hass: HomeAssistant, freezer: FrozenDateTimeFactory):
+    """Test endpoints are fetched on their own interval and their feeds merged."""
+    hub = SharedFeedSubject(ENDPOINTS, max_age=timedelta(0))
+    station_stop = StationStop("Stop", hub)
+    hub.set_endpoint_intervals("entry", {ENDPOINTS[1]: timedelta(minutes=5)})
+    hub.set_endpoint_intervals("other", {ENDPOINTS[1]: timedelta(minutes=2)})
+    assert hub.get_endpoint_interval(ENDPOINTS[0]) == timedelta(0)
+    assert hub.get_endpoint_interval(ENDPOINTS[1]) == timedelta(minutes=2)
+
+    feeds = {uri: make_feed(uri) for uri in ENDPOINTS}
+
+    async def async_fetch_feeds(_session, uris):
+        feeds[ENDPOINTS[0]].entity[0].trip_update.stop_time_update[0].arrival.time += 1
+        return {uri: feeds[uri].SerializeToString() for uri in uris}
+
+    with patch(
+        "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+        side_effect=async_fetch_feeds,
+    ) as async_fetch_feeds_mock:
+        await hub.async_update()
+        assert set(async_fetch_feeds_mock.call_args.args[1]) == set(ENDPOINTS)
+
+        freezer.tick(timedelta(minutes=1))
+        await hub.async_update()
+        assert async_fetch_feeds_mock.call_args.args[1] == [ENDPOINTS[0]]
+        # The latest feed of the endpoint not fetched is still decoded
+        assert {arrival.trip for arrival in station_stop.arrivals} == set(ENDPOINTS)
+
+        freezer.tick(timedelta(minutes=1))
+        await hub.async_update()
+        assert set(async_fetch_feeds_mock.call_args.args[1]) == set(ENDPOINTS)
+
+        hub.remove_endpoint_intervals("other")
+        assert hub.get_endpoint_interval(ENDPOINTS[1]) == timedelta(minutes=5)
+
+
+async def test_rate_limited_hosts(
+    hass: HomeAssistant, realtime_feeds: AiohttpClientMocker
+):
+    """Test endpoints are fetched at once within the rate limit of their host."""
+    hub = async_acquire_feed_subject(hass, ENDPOINTS, rate_limit=RateLimit(1, 3600))
+    other_hub = async_acquire_feed_subject(hass, ["https://other.example.com/rt"])
+    assert hub.rate_limits["gtfs.example.com"].rate_limit == RateLimit(1, 3600)
+    assert other_hub.rate_limits["other.example.com"].rate_limit == DEFAULT_RATE_LIMIT
+    # Entries on the same host share its rate limit
+    assert (
+        async_acquire_feed_subject(hass, ENDPOINTS[:1]).rate_limits["gtfs.example.com"]
+        is hub.rate_limits["gtfs.example.com"]
+    )
+
+    for uri in ENDPOINTS:
+        realtime_feeds.get(uri, content=make_feed(uri).SerializeToString())
+    with patch("custom_components.gtfs_realtime.hub.MAX_RATE_LIMIT_WAIT", timedelta(0)):
+        payloads = await hub.async_fetch_feeds()
+    # Only one request an hour is allowed
+    assert len(payloads) == 1
+    assert realtime_feeds.call_count == 1
+
+
+async def test_realtime_session_closed(hass: HomeAssistant):
+    """Test the realtime session is closed once no entry uses it."""
+    hub = async_acquire_feed_subject(hass, ENDPOINTS)
+    session = async_get_realtime_session(hass)
+    assert async_get_realtime_session(hass) is session
+
+    async_release_feed_subject(hass, hub)
+    await hass.async_block_till_done()
+    assert session.closed
+    assert DATA_REALTIME_SESSION not in hass.data
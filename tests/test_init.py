@@ -6,12 +6,16 @@ from unittest.mock import patch
 from homeassistant.core import HomeAssistant
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
+from custom_components.gtfs_realtime import create_gtfs_update_hub
 from custom_components.gtfs_realtime.const import (
+    CONF_FILTER_STATIC_DATA,
     CONF_GTFS_STATIC_DATA,
     CONF_STATIC_SOURCES_UPDATE_FREQUENCY,
     CONF_STATIC_SOURCES_UPDATE_FREQUENCY_DEFAULT,
 )
 
+from . import fetch_empty_feeds
+
 
 async def test_lifecycle(hass: HomeAssistant, entry_v2_nodialout) -> None:
     """Test the component gets setup."""
@@ -23,6 +27,21 @@ async def test_lifecycle(hass: HomeAssistant, entry_v2_nodialout) -> None:
     hass.stop()
 
 
+async def test_filter_static_data(
+    hass: HomeAssistant, entry_v2_nodialout: MockConfigEntry
+) -> None:
+    """Test the static schedule is only filtered when the option is set."""
+    coordinator = create_gtfs_update_hub(hass, entry_v2_nodialout.data)
+    assert coordinator.static_filter is None
+    assert set(coordinator.gtfs_update_data.station_stops) == {"101N", "102S"}
+
+    coordinator = create_gtfs_update_hub(
+        hass, {**entry_v2_nodialout.data, CONF_FILTER_STATIC_DATA: True}
+    )
+    assert coordinator.static_filter is not None
+    assert coordinator.static_filter.stop_ids == {"101N", "102S"}
+
+
 async def test_migrate_from_v1(
     hass: HomeAssistant,
     entry_v1_full: MockConfigEntry,
@@ -31,7 +50,8 @@ async def test_migrate_from_v1(
 
     with (
         patch(
-            "gtfs_station_stop.feed_subject.FeedSubject.async_update", return_value=None
+            "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+            side_effect=fetch_empty_feeds,
         ),
         patch(
             "custom_components.gtfs_realtime.coordinator.GtfsRealtimeCoordinator.async_update_static_data",
@@ -10,10 +10,15 @@ from homeassistant.components.number import (
 )
 from homeassistant.const import ATTR_ENTITY_ID
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers import device_registry as dr, entity_registry as er
 import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
+from custom_components.gtfs_realtime.const import (
+    CONF_URL_ENDPOINTS,
+    CONF_URL_ENDPOINTS_UPDATE_FREQUENCY,
+)
+
 
 @pytest.fixture
 def async_update_patcher():
@@ -40,7 +45,8 @@ async def test_setup_number(
 
         ent_reg = er.async_get(hass)
         number_ids = [k for k, v in ent_reg.entities.items() if k.startswith("number")]
-        assert len(number_ids) == 2  # one for each url plus clear all
+        # one for each static and realtime url plus the state heartbeat
+        assert len(number_ids) == 8
 
 
 async def test_number_value_change(
@@ -83,3 +89,87 @@ async def test_number_value_change(
     assert entry_v2_full.runtime_data.static_timedelta[
         "https://example.com/gtfs2.zip"
     ] == timedelta(hours=8.5)
+
+
+async def test_state_heartbeat_change(
+    hass: HomeAssistant, entry_v2_full: MockConfigEntry, async_update_patcher
+):
+    """Test changing the entity state heartbeat."""
+    with (
+        patch(
+            "custom_components.gtfs_realtime.coordinator.GtfsRealtimeCoordinator._async_update_data",  # noqa E501
+            new_callable=AsyncMock,
+        ),
+        async_update_patcher,
+    ):
+        entry_v2_full.add_to_hass(hass)
+        assert await hass.config_entries.async_setup(entry_v2_full.entry_id)
+
+    assert entry_v2_full.runtime_data.state_heartbeat == timedelta(minutes=15)
+    await hass.services.async_call(
+        NUMBER_DOMAIN,
+        NUMBER_SERVICE_SET_VALUE,
+        {ATTR_ENTITY_ID: "number.state_heartbeat", ATTR_VALUE: 5.0},
+        blocking=True,
+    )
+    assert entry_v2_full.runtime_data.state_heartbeat == timedelta(minutes=5)
+
+
+async def test_realtime_interval_change(
+    hass: HomeAssistant, entry_v2_full: MockConfigEntry, async_update_patcher
+):
+    """Test changing how often a realtime endpoint is fetched."""
+    with (
+        patch(
+            "custom_components.gtfs_realtime.coordinator.GtfsRealtimeCoordinator._async_update_data",  # noqa E501
+            new_callable=AsyncMock,
+        ),
+        async_update_patcher,
+    ):
+        entry_v2_full.add_to_hass(hass)
+        assert await hass.config_entries.async_setup(entry_v2_full.entry_id)
+
+    hub = entry_v2_full.runtime_data.hub
+    uri = "https://api-endpoint.example.com/rt1"
+    assert hub.get_endpoint_interval(uri) == timedelta(0)
+    await hass.services.async_call(
+        NUMBER_DOMAIN,
+        NUMBER_SERVICE_SET_VALUE,
+        {
+            ATTR_ENTITY_ID: "number.realtime_feed_interval_api_endpoint_example_com_rt1",
+            ATTR_VALUE: 300.0,
+        },
+        blocking=True,
+    )
+    assert entry_v2_full.runtime_data.endpoint_timedelta[uri] == timedelta(minutes=5)
+    assert hub.get_endpoint_interval(uri) == timedelta(minutes=5)
+
+
+async def test_realtime_interval_hides_api_keys(
+    hass: HomeAssistant, entry_v2_full: MockConfigEntry, async_update_patcher
+):
+    """Test API keys in the endpoint URLs are not in the registry or the names."""
+    uri = "https://api-endpoint.example.com/rt1?api_key=secret"
+    entry_v2_full.add_to_hass(hass)
+    hass.config_entries.async_update_entry(
+        entry_v2_full,
+        data=entry_v2_full.data
+        | {CONF_URL_ENDPOINTS: [uri], CONF_URL_ENDPOINTS_UPDATE_FREQUENCY: {}},
+    )
+    with (
+        patch(
+            "custom_components.gtfs_realtime.coordinator.GtfsRealtimeCoordinator._async_update_data",  # noqa E501
+            new_callable=AsyncMock,
+        ),
+        async_update_patcher,
+    ):
+        assert await hass.config_entries.async_setup(entry_v2_full.entry_id)
+        await hass.async_block_till_done()
+
+    entity_id = "number.realtime_feed_interval_api_endpoint_example_com_rt1"
+    entity_entry = er.async_get(hass).async_get(entity_id)
+    assert entity_entry is not None
+    assert "secret" not in entity_entry.unique_id
+    assert "secret" not in hass.states.get(entity_id).name
+    device = dr.async_get(hass).async_get(entity_entry.device_id)
+    assert all("secret" not in identifier for _, identifier in device.identifiers)
@@ -0,0 +1,78 @@
+"""Test the adaptive realtime polling interval."""
+
+from datetime import date, timedelta
+
+from gtfs_station_stop.calendar import Calendar, Service, ServiceDays
+from gtfs_station_stop.schedule import GtfsSchedule
+from gtfs_station_stop.stop_times import StopTimesDataset
+from gtfs_station_stop.trip_info import TripInfoDataset
+from homeassistant.util import dt as dt_util
+
+from custom_components.gtfs_realtime.polling import (
+    MAX_REALTIME_INTERVAL,
+    MIN_REALTIME_INTERVAL,
+    ScheduledStopTimes,
+    adaptive_realtime_interval,
+)
+
+BASE = timedelta(seconds=60)
+
+
+def test_adaptive_realtime_interval():
+    """Test polling speeds up for imminent arrivals and backs off without them."""
+    assert adaptive_realtime_interval(BASE) == BASE
+    assert adaptive_realtime_interval(BASE, soonest_arrival=120) == (
+        MIN_REALTIME_INTERVAL
+    )
+    assert adaptive_realtime_interval(BASE, soonest_arrival=1200) == BASE
+    # Wait for scheduled service to begin
+    assert adaptive_realtime_interval(BASE, next_scheduled_arrival=900) == (
+        timedelta(minutes=10)
+    )
+    assert adaptive_realtime_interval(BASE, next_scheduled_arrival=60) == BASE
+    assert (
+        adaptive_realtime_interval(BASE, next_scheduled_arrival=6 * 3600)
+        == MAX_REALTIME_INTERVAL
+    )
+    # Polling faster than the feeds change is pointless
+    assert adaptive_realtime_interval(
+        BASE, soonest_arrival=120, feed_update_interval=45
+    ) == timedelta(seconds=45)
+    assert adaptive_realtime_interval(
+        BASE, soonest_arrival=120, rate_limit_backoff=timedelta(minutes=4)
+    ) == timedelta(minutes=4)
+
+
+def test_scheduled_stop_times(gtfs_zip: str):
+    """Test the next scheduled arrival only counts services running that day."""
+    schedule = GtfsSchedule(
+        calendar=Calendar(),
+        trip_info_ds=TripInfoDataset(gtfs_zip),
+        stop_times_ds=StopTimesDataset(gtfs_zip),
+    )
+    scheduled_stop_times = ScheduledStopTimes.from_schedule(schedule, ["Other"])
+    assert scheduled_stop_times.times == (
+        (12 * 3600 + 5 * 60, "Normal"),
+        (13 * 3600, "Normal"),
+    )
+
+    # Mondays only
+    schedule.calendar.services["Normal"] = Service(
+        "Normal",
+        ServiceDays(True, *[False] * 6),
+        start=date(2024, 12, 1),
+        end=date(2024, 12, 31),
+    )
+    monday = dt_util.start_of_local_day(date(2024, 12, 2))
+    assert scheduled_stop_times.next_arrival(
+        schedule.calendar, monday + timedelta(hours=12, minutes=30)
+    ) == monday + timedelta(hours=13)
+    assert (
+        scheduled_stop_times.next_arrival(
+            schedule.calendar, monday + timedelta(hours=14)
+        )
+        is None
+    )
+    assert scheduled_stop_times.next_arrival(
+        schedule.calendar, monday - timedelta(hours=1)
+    ) == monday + timedelta(hours=12, minutes=5)
@@ -0,0 +1,32 @@
+"""Test rate limits."""
+
+import asyncio
+
+from custom_components.gtfs_realtime.ratelimit import RateLimit, TokenBucket
+
+
+def test_rate_limit_from_dict():
+    """Test rate limits are read from feeds.json entries."""
+    assert RateLimit.from_dict({"requests": 60, "period": 3600}) == RateLimit(60, 3600)
+    assert RateLimit(60, 3600).rate == 1 / 60
+    assert RateLimit.from_dict(None) is None
+
+
+async def test_token_bucket():
+    """Test requests burst up to the limit, then wait for the bucket to refill."""
+    bucket = TokenBucket(RateLimit(requests=2, period=0.1))
+    assert await asyncio.gather(*(bucket.async_acquire(0) for _ in range(3))) == [
+        True,
+        True,
+        False,
+    ]
+    assert await bucket.async_acquire(1)
+
+
+def test_token_bucket_restrict():
+    """Test only stricter rate limits replace the current one."""
+    bucket = TokenBucket(RateLimit(requests=10, period=10))
+    bucket.restrict(RateLimit(requests=100, period=10))
+    assert bucket.rate_limit == RateLimit(requests=10, period=10)
+    bucket.restrict(RateLimit(requests=60, period=3600))
+    assert bucket.rate_limit == RateLimit(requests=60, period=3600)
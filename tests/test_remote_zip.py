@@ -0,0 +1,102 @@
+"""Test reading members of remote zips with range requests."""
+
+from http import HTTPStatus
+from io import BytesIO
+from pathlib import Path
+import random
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from aiohttp import hdrs
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from pytest_homeassistant_custom_component.test_util.aiohttp import (
+    AiohttpClientMocker,
+    AiohttpClientMockResponse,
+)
+import pytest
+
+from custom_components.gtfs_realtime.remote_zip import (
+    RemoteZipError,
+    async_fetch_zip_members,
+    decompress_member,
+)
+from custom_components.gtfs_realtime.static import async_load_stops_and_routes
+
+STATIC_URL = "https://gtfs.example.com/static.zip"
+
+
+def mock_ranged_zip(aioclient_mock: AiohttpClientMocker, content: bytes) -> list[int]:
+    """Serve the requested ranges of a file, returning the sizes served."""
+    served: list[int] = []
+
+    async def _serve_range(method, url, data):
+        byte_range = aioclient_mock.mock_calls[-1][3][hdrs.RANGE].removeprefix("bytes=")
+        start, _, end = byte_range.partition("-")
+        if not start:
+            start, end = max(len(content) - int(end), 0), len(content) - 1
+        start, end = int(start), min(int(end), len(content) - 1)
+        served.append(end + 1 - start)
+        return AiohttpClientMockResponse(
+            method,
+            url,
+            status=HTTPStatus.PARTIAL_CONTENT,
+            response=content[start : end + 1],
+            headers={hdrs.CONTENT_RANGE: f"bytes {start}-{end}/{len(content)}"},
+        )
+
+    aioclient_mock.get(STATIC_URL, side_effect=_serve_range)
+    return served
+
+
+@pytest.fixture(name="large_gtfs_zip")
+def large_gtfs_zip_fixture(gtfs_zip: str) -> bytes:
+    """Compressed copy of the GTFS zip, with a large shapes file and a comment."""
+    content = BytesIO()
+    with ZipFile(gtfs_zip) as source, ZipFile(content, "w", ZIP_DEFLATED) as z:
+        for name in source.namelist():
+            z.writestr(name, source.read(name))
+        z.writestr("shapes.txt", random.Random(0).randbytes(500_000).hex())
+        z.comment = b"x" * 1000
+    return content.getvalue()
+
+
+async def test_fetch_zip_members(
+    hass: HomeAssistant, aioclient_mock: AiohttpClientMocker, large_gtfs_zip: bytes
+):
+    """Test only the central directory and the requested members are fetched."""
+    mock_ranged_zip(aioclient_mock, large_gtfs_zip)
+    members = await async_fetch_zip_members(
+        async_get_clientsession(hass), STATIC_URL, ["stops.txt", "missing.txt"]
+    )
+    assert {
+        member.name: decompress_member(member, data) for member, data in members.items()
+    } == {"stops.txt": b"stop_id,stop_name\nStop,Stop Name\nOther,Other Stop\n"}
+    # The tail with the central directory, then the local header and the data
+    assert aioclient_mock.call_count == 3
+
+
+async def test_load_stops_and_routes(
+    hass: HomeAssistant, aioclient_mock: AiohttpClientMocker, large_gtfs_zip: bytes
+):
+    """Test the stops and routes are loaded without the rest of the feed."""
+    served = mock_ranged_zip(aioclient_mock, large_gtfs_zip)
+    schedule = await async_load_stops_and_routes(hass, STATIC_URL)
+    assert set(schedule.station_stop_info_ds.station_stop_infos) == {"Stop", "Other"}
+    assert set(schedule.route_info_ds.route_infos) == {"Route", "Express"}
+    assert not schedule.stop_times_ds.stop_times
+    assert sum(served) < len(large_gtfs_zip) / 4
+
+
+async def test_ranges_not_supported(
+    hass: HomeAssistant,
+    aioclient_mock: AiohttpClientMocker,
+    gtfs_zip: str,
+):
+    """Test feeds from servers ignoring the range are left to be loaded whole."""
+    aioclient_mock.get(STATIC_URL, content=Path(gtfs_zip).read_bytes())
+    with pytest.raises(RemoteZipError):
+        await async_fetch_zip_members(
+            async_get_clientsession(hass), STATIC_URL, ["stops.txt"]
+        )
+    assert await async_load_stops_and_routes(hass, STATIC_URL) is None
+    assert await async_load_stops_and_routes(hass, gtfs_zip) is None
@@ -18,14 +18,23 @@ from pytest_homeassistant_custom_component.common import (
 )
 from syrupy.assertion import SnapshotAssertion
 
-from custom_components.gtfs_realtime.const import ROUTE_ID
+from custom_components.gtfs_realtime.const import (
+    ARRIVAL_TIME,
+    CONF_DEPARTURES_SENSOR,
+    DEPARTURES,
+    ROUTE_ID,
+    TRIP_ID,
+)
 from custom_components.gtfs_realtime.coordinator import (
+    COUNTDOWN_INTERVAL,
     GtfsRealtimeCoordinator,
     GtfsUpdateData,
 )
 
 from custom_components.gtfs_realtime.sensor import ArrivalSensor
 
+from . import fetch_empty_feeds
+
 
 def assert_all_equal(collection: Iterable[Any]) -> bool:
     assert len(set(collection)) <= 1
@@ -68,9 +77,9 @@ async def async_setup_coordinator(
     """Setup the Coordinator."""
     with (
         patch(
-            "custom_components.gtfs_realtime.coordinator.FeedSubject.async_update",  # noqa E501
+            "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",  # noqa E501
             new_callable=AsyncMock,
-            return_value=None,
+            side_effect=fetch_empty_feeds,
         ),
         patch(
             "custom_components.gtfs_realtime.coordinator.GtfsRealtimeCoordinator.async_update_static_data",  # noqa E501
@@ -112,7 +121,7 @@ async def test_update(
             start_time + timedelta(minutes=minutes - update_counter.update_count)
         ).timestamp()
 
-    def coordinator_update_side_effects(_):
+    def coordinator_update_side_effects(*_):
         arrivals = {
             "101N": [
                 Arrival(route="AX", trip="", time=make_ts(-10)),  # test old arrival
@@ -128,6 +137,7 @@ async def test_update(
         }
         for stop_id, stop in coordinator.gtfs_update_data.station_stops.items():
             stop.arrivals = arrivals[stop_id]
+        coordinator.hub.generation += 1
         update_counter.update_count += 1
         return
 
@@ -167,3 +177,132 @@ async def test_route_icon_missing_route_id(
     assert sensor.entity_picture is not None
     sensor._arrival_detail[ROUTE_ID] = None
     assert sensor.entity_picture is None
+
+
+async def test_unchanged_state_not_written(
+    hass: HomeAssistant,
+    freezer: FrozenDateTimeFactory,
+    entry_v2_nodialout: MockConfigEntry,
+):
+    """Test unchanged states are only written again after the heartbeat."""
+    coordinator: GtfsRealtimeCoordinator = await async_setup_coordinator(
+        hass, entry_v2_nodialout
+    )
+    with patch(
+        "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+        new_callable=AsyncMock,
+        side_effect=fetch_empty_feeds,
+    ):
+        coordinator.state_heartbeat = timedelta(minutes=5)
+        # Alert sensors write their first state from coordinator data
+        coordinator.async_update_listeners()
+        state_writes = coordinator.state_writes
+        written = state_writes.written
+        skipped = state_writes.skipped
+        entity_count = state_writes.last_tick_written + state_writes.last_tick_skipped
+        assert entity_count
+
+        coordinator.async_update_listeners()
+        assert state_writes.last_tick_written == 0
+        assert state_writes.last_tick_skipped == entity_count
+        assert state_writes.written == written
+        assert state_writes.skipped == skipped + entity_count
+
+        freezer.tick(timedelta(minutes=5))
+        coordinator.async_update_listeners()
+        assert state_writes.last_tick_written == entity_count
+        assert state_writes.last_tick_skipped == 0
+        assert state_writes.written == written + entity_count
+        assert state_writes.skipped == skipped + entity_count
+
+        # Let the refresh that is due by now finish
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done(wait_background_tasks=True)
+
+
+async def test_departures_sensor(
+    hass: HomeAssistant,
+    freezer: FrozenDateTimeFactory,
+    entry_v2_nodialout: MockConfigEntry,
+):
+    """Test one departures sensor is created per stop in place of arrival sensors."""
+    entry = MockConfigEntry(
+        domain=entry_v2_nodialout.domain,
+        version=entry_v2_nodialout.version,
+        minor_version=entry_v2_nodialout.minor_version,
+        data={**entry_v2_nodialout.data, CONF_DEPARTURES_SENSOR: True},
+    )
+    coordinator: GtfsRealtimeCoordinator = await async_setup_coordinator(hass, entry)
+    ent_reg = er.async_get(hass)
+    assert {
+        entity.unique_id
+        for entity in er.async_entries_for_config_entry(ent_reg, entry.entry_id)
+        if entity.domain == SENSOR_DOMAIN
+    } == {"departures_101N", "departures_102S"}
+
+    now = datetime.now().timestamp()
+
+    def coordinator_update_side_effects(*_):
+        coordinator.gtfs_update_data.station_stops["101N"].arrivals = [
+            Arrival(route="B", trip="2", time=now + 360),
+            Arrival(route="A", trip="1", time=now + 240),
+        ]
+        coordinator.gtfs_update_data.station_stops["102S"].arrivals = []
+        coordinator.hub.generation += 1
+
+    coordinator.hub.async_update = AsyncMock(
+        side_effect=coordinator_update_side_effects
+    )
+    await coordinator.async_refresh()
+
+    state = hass.states.get("sensor.101n")
+    assert float(state.state) == 4
+    assert state.attributes[ROUTE_ID] == "A"
+    assert [
+        (departure[ROUTE_ID], departure[TRIP_ID], departure[ARRIVAL_TIME])
+        for departure in state.attributes[DEPARTURES]
+    ] == [("A", "1", 240), ("B", "2", 360)]
+    state = hass.states.get("sensor.102s")
+    assert state.state == STATE_UNKNOWN
+    assert state.attributes[DEPARTURES] == []
+
+
+async def test_countdown_between_updates(
+    hass: HomeAssistant,
+    freezer: FrozenDateTimeFactory,
+    entry_v2_nodialout: MockConfigEntry,
+):
+    """Test arrival times count down locally without fetching the feeds."""
+    coordinator: GtfsRealtimeCoordinator = await async_setup_coordinator(
+        hass, entry_v2_nodialout
+    )
+    now = datetime.now().timestamp()
+
+    def coordinator_update_side_effects(*_):
+        coordinator.gtfs_update_data.station_stops["101N"].arrivals = [
+            Arrival(route="A", trip="1", time=now + 600),
+            Arrival(route="B", trip="2", time=now + 900),
+        ]
+        coordinator.hub.generation += 1
+
+    coordinator.hub.async_update = AsyncMock(
+        side_effect=coordinator_update_side_effects
+    )
+    await coordinator.async_refresh()
+    assert float(hass.states.get("sensor.1_101n").state) == 10
+
+    # Counted down in whole minutes
+    freezer.tick(COUNTDOWN_INTERVAL * 3)
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert coordinator.hub.async_update.call_count == 1
+    assert float(hass.states.get("sensor.1_101n").state) == 9
+
+    # Departed arrivals are dropped and the next ones move up on the next tick,
+    # before the feeds are fetched again
+    freezer.move_to(datetime.fromtimestamp(now + 730))
+    coordinator._async_handle_countdown_tick(datetime.now())
+    await hass.async_block_till_done()
+    assert coordinator.hub.async_update.call_count == 1
+    assert float(hass.states.get("sensor.1_101n").state) == 2
+    assert hass.states.get("sensor.2_101n").state == STATE_UNKNOWN
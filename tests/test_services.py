@@ -0,0 +1,89 @@
+"""Test the services of the integration."""
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ServiceValidationError
+import pytest
+import voluptuous as vol
+
+from custom_components.gtfs_realtime.const import DOMAIN
+from custom_components.gtfs_realtime.coordinator import GtfsRealtimeCoordinator
+from custom_components.gtfs_realtime.services import SERVICE_GET_DEPARTURES
+
+
+async def test_get_departures_by_stop(
+    hass: HomeAssistant, departures_coordinator: GtfsRealtimeCoordinator
+):
+    """Test the next departures are returned for the given stops."""
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_DEPARTURES,
+        {"stop_ids": ["101N", "UNKNOWN"], "limit": 2},
+        blocking=True,
+        return_response=True,
+    )
+    assert list(response["stops"]) == ["101N"]
+    stop = response["stops"]["101N"]
+    assert stop["name"] == "Van Cortlandt Park"
+    assert [departure["trip_id"] for departure in stop["departures"]] == ["N0", "N1"]
+    assert stop["departures"][0] | {"time": 60} == {
+        "route_id": "1",
+        "headsign": "Uptown",
+        "trip_id": "N0",
+        "route_color": "EE352E",
+        "route_text_color": "FFFFFF",
+        "route_type": "Subway",
+        "time": 60,
+    }
+    assert 55 < stop["departures"][0]["time"] <= 60
+
+
+async def test_get_departures_by_location(
+    hass: HomeAssistant, departures_coordinator: GtfsRealtimeCoordinator
+):
+    """Test the departures at the stops around a location, nearest first."""
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_DEPARTURES,
+        {
+            "latitude": 40.8845,
+            "longitude": -73.9009,
+            "radius": 1000,
+            "config_entry_id": departures_coordinator.config_entry.entry_id,
+        },
+        blocking=True,
+        return_response=True,
+    )
+    assert list(response["stops"]) == ["102S", "101N"]
+    assert response["stops"]["102S"]["distance"] < 50
+    assert len(response["stops"]["101N"]["departures"]) == 4
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_DEPARTURES,
+        {"latitude": 40.8845, "longitude": -73.9009, "radius": 100},
+        blocking=True,
+        return_response=True,
+    )
+    assert list(response["stops"]) == ["102S"]
+
+
+async def test_get_departures_invalid(
+    hass: HomeAssistant, departures_coordinator: GtfsRealtimeCoordinator
+):
+    """Test calls without stops or a location, or for unknown entries, fail."""
+    with pytest.raises(vol.Invalid):
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_GET_DEPARTURES,
+            {"latitude": 40.8845},
+            blocking=True,
+            return_response=True,
+        )
+    with pytest.raises(ServiceValidationError):
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_GET_DEPARTURES,
+            {"stop_ids": ["101N"], "config_entry_id": "missing"},
+            blocking=True,
+            return_response=True,
+        )
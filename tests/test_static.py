@@ -0,0 +1,195 @@
+"""Test static sources shared between config entries."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from freezegun.api import FrozenDateTimeFactory
+from gtfs_station_stop.schedule import GtfsSchedule
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from pytest_homeassistant_custom_component.test_util.aiohttp import (
+    AiohttpClientMocker,
+)
+
+from custom_components.gtfs_realtime.cache import SHARED_FETCH_MAX_AGE
+from custom_components.gtfs_realtime.datasets import StaticFilter
+from custom_components.gtfs_realtime.static import (
+    DATA_PARSE_POOL,
+    DATA_STATIC_SOURCES,
+    _async_get_parse_pool,
+    async_acquire_static_source,
+    async_parse_schedule,
+    async_release_static_source,
+    async_shutdown_parse_pool,
+)
+
+from . import fetch_empty_feeds
+
+STATIC_URL = "https://example.com/gtfs1.zip"
+
+
+async def test_acquire_and_release(hass: HomeAssistant):
+    """Test static sources are shared by URI and auth header."""
+    static_source = async_acquire_static_source(hass, STATIC_URL, {"X-Api-Key": "a"})
+    assert async_acquire_static_source(hass, STATIC_URL, {"X-Api-Key": "a"}) is (
+        static_source
+    )
+    assert static_source.ref_count == 2
+    assert (
+        async_acquire_static_source(hass, STATIC_URL, {"X-Api-Key": "b"})
+        is not static_source
+    )
+
+    async_release_static_source(hass, static_source)
+    assert static_source in hass.data[DATA_STATIC_SOURCES].values()
+    async_release_static_source(hass, static_source)
+    assert static_source not in hass.data[DATA_STATIC_SOURCES].values()
+
+
+async def test_parse_pool_kept_while_sources_acquired(hass: HomeAssistant):
+    """Test the parse pool survives a source acquired right after the last release."""
+    static_source = async_acquire_static_source(hass, STATIC_URL)
+    pool = _async_get_parse_pool(hass)
+
+    # As when an entry reloads
+    async_release_static_source(hass, static_source)
+    static_source = async_acquire_static_source(hass, STATIC_URL)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert hass.data[DATA_PARSE_POOL] is pool
+
+    async_release_static_source(hass, static_source)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert DATA_PARSE_POOL not in hass.data
+
+
+async def test_concurrent_updates_share_one_parse(
+    hass: HomeAssistant, mock_schedule: GtfsSchedule, static_feeds: AiohttpClientMocker
+):
+    """Test concurrent updates download and parse the source once."""
+    static_source = async_acquire_static_source(hass, STATIC_URL)
+    listener_calls = []
+    static_source.async_add_listener(
+        lambda source, changed: listener_calls.append(changed)
+    )
+    with patch(
+        "custom_components.gtfs_realtime.static.async_parse_schedule",
+        new_callable=AsyncMock,
+        return_value=mock_schedule,
+    ) as async_parse_schedule_mock:
+        await asyncio.gather(static_source.async_update(), static_source.async_update())
+        assert async_parse_schedule_mock.call_count == 1
+        assert static_feeds.call_count == 1
+        assert static_source.schedule is mock_schedule
+        assert listener_calls == [True]
+
+        # Unchanged content is not parsed again
+        await static_source.async_update()
+        assert async_parse_schedule_mock.call_count == 1
+        assert listener_calls == [True, False]
+
+
+async def test_filtered_sources_share_one_download(
+    hass: HomeAssistant,
+    freezer: FrozenDateTimeFactory,
+    mock_schedule: GtfsSchedule,
+    static_feeds: AiohttpClientMocker,
+):
+    """Test sources of a feed with different filters download it once."""
+    static_source = async_acquire_static_source(
+        hass, STATIC_URL, static_filter=StaticFilter(stop_ids=frozenset({"A"}))
+    )
+    other_source = async_acquire_static_source(
+        hass, STATIC_URL, static_filter=StaticFilter(stop_ids=frozenset({"B"}))
+    )
+    assert other_source is not static_source
+    with patch(
+        "custom_components.gtfs_realtime.static.async_parse_schedule",
+        new_callable=AsyncMock,
+        return_value=mock_schedule,
+    ) as async_parse_schedule_mock:
+        await asyncio.gather(static_source.async_update(), other_source.async_update())
+        assert static_feeds.call_count == 1
+        # Each filter is applied when parsing
+        assert {
+            call.kwargs["static_filter"]
+            for call in async_parse_schedule_mock.call_args_list
+        } == {static_source.static_filter, other_source.static_filter}
+
+        # A new version fetched by one source is parsed by the other one too
+        static_feeds.clear_requests()
+        static_feeds.get(STATIC_URL, content=b"v2")
+        freezer.tick(SHARED_FETCH_MAX_AGE)
+        await static_source.async_update()
+        await other_source.async_update()
+        assert static_feeds.call_count == 1
+        assert async_parse_schedule_mock.call_count == 4
+
+
+async def test_entries_share_static_schedule(
+    hass: HomeAssistant,
+    entry_v2_full: MockConfigEntry,
+    mock_schedule: GtfsSchedule,
+    static_feeds: AiohttpClientMocker,
+):
+    """Test entries with the same static sources share one schedule."""
+    other_entry = MockConfigEntry(
+        domain=entry_v2_full.domain,
+        version=entry_v2_full.version,
+        minor_version=entry_v2_full.minor_version,
+        data={**entry_v2_full.data},
+    )
+    with (
+        patch(
+            "custom_components.gtfs_realtime.hub.SharedFeedSubject.async_fetch_feeds",
+            new_callable=AsyncMock,
+            side_effect=fetch_empty_feeds,
+        ),
+        patch(
+            "custom_components.gtfs_realtime.static.async_parse_schedule",
+            new_callable=AsyncMock,
+            return_value=mock_schedule,
+        ) as async_parse_schedule_mock,
+    ):
+        for entry in (entry_v2_full, other_entry):
+            entry.add_to_hass(hass)
+            assert await hass.config_entries.async_setup(entry.entry_id)
+            await hass.async_block_till_done()
+
+        assert async_parse_schedule_mock.call_count == 2
+        assert static_feeds.call_count == 2
+        assert (
+            entry_v2_full.runtime_data.static_sources
+            == other_entry.runtime_data.static_sources
+        )
+
+        assert await hass.config_entries.async_unload(entry_v2_full.entry_id)
+        assert len(hass.data[DATA_STATIC_SOURCES]) == 2
+        assert await hass.config_entries.async_unload(other_entry.entry_id)
+    assert not hass.data[DATA_STATIC_SOURCES]
+
+
+async def test_parse_schedule_in_process_pool(hass: HomeAssistant, gtfs_zip: str):
+    """Test a static feed is parsed by the worker processes."""
+    schedule = await async_parse_schedule(hass, gtfs_zip)
+    filtered_schedule = await async_parse_schedule(
+        hass,
+        gtfs_zip,
+        static_filter=StaticFilter(stop_ids=frozenset({"Stop"})),
+    )
+    await async_shutdown_parse_pool(hass)
+    assert DATA_PARSE_POOL not in hass.data
+
+    assert schedule.get_stop_info("Stop").name == "Stop Name"
+    assert schedule.route_info_ds.route_infos["Route"].long_name == "Long Name"
+    assert set(schedule.trip_info_ds.trip_infos) == {"Trip", "ExpressTrip"}
+    assert schedule.stop_times_ds.get("Trip", 1).stop_id == "Stop"
+
+    # Stops and routes are kept in full, trips and stop times are filtered
+    assert set(filtered_schedule.station_stop_info_ds.station_stop_infos) == {
+        "Stop",
+        "Other",
+    }
+    assert set(filtered_schedule.route_info_ds.route_infos) == {"Route", "Express"}
+    assert set(filtered_schedule.trip_info_ds.trip_infos) == {"Trip"}
+    assert filtered_schedule.stop_times_ds.get("Trip", 1) is not None
+    assert filtered_schedule.stop_times_ds.get("Trip", 2) is None
@@ -0,0 +1,102 @@
+"""Test the index of stops by location and name."""
+
+from unittest.mock import patch
+
+from gtfs_station_stop.station_stop_info import StationStopInfo
+import pytest
+
+from custom_components.gtfs_realtime.stop_index import StopIndex
+
+
+def make_stop(stop_id: str, name: str, lat: float | None, lon: float | None):
+    """Create a stop at a location."""
+    return StationStopInfo(
+        {
+            "stop_id": stop_id,
+            "stop_name": name,
+            "stop_lat": None if lat is None else str(lat),
+            "stop_lon": None if lon is None else str(lon),
+        }
+    )
+
+
+@pytest.fixture(name="stop_index")
+def stop_index_fixture() -> StopIndex:
+    """Index of a grid of stops, about 500 meters apart, and one far away."""
+    return StopIndex(
+        [
+            make_stop(f"S{row}-{column}", f"Street {row} & Avenue {column}", lat, lon)
+            for row in range(20)
+            for column in range(20)
+            if (lat := 40.7 + row * 0.0045, lon := -74.0 + column * 0.006)
+        ]
+        + [
+            make_stop("FAR", "Faraway Terminal", 42.0, -71.0),
+            make_stop("NOWHERE", "Flag Stop", None, None),
+        ]
+    )
+
+
+def test_nearest(stop_index: StopIndex):
+    """Test the nearest stops are found in order of distance."""
+    assert len(stop_index) == 402
+    assert stop_index.nearest(40.7, -74.0, 3) == ["S0-0", "S1-0", "S0-1"]
+    assert stop_index.nearest(40.7451, -73.9401, 1) == ["S10-10"]
+    # Matches a search of every stop
+    nearest = stop_index.nearest(40.73, -74.03, 50)
+    assert len(nearest) == 50
+    assert (
+        set(nearest)
+        == set(
+            sorted(
+                (
+                    stop_id
+                    for stop_id, stop in stop_index.stops.items()
+                    if stop.lat is not None
+                ),
+                key=lambda stop_id: (
+                    (float(stop_index.stops[stop_id].lat) - 40.73) ** 2
+                    + (
+                        (float(stop_index.stops[stop_id].lon) + 74.03)
+                        * 0.758  # cos(40.73°)
+                    )
+                    ** 2
+                ),
+            )[:50]
+        )
+    )
+
+
+def test_nearest_within_distance(stop_index: StopIndex):
+    """Test only the stops within a distance are found."""
+    assert stop_index.nearest(40.7, -74.0, 10, max_distance=600) == [
+        "S0-0",
+        "S1-0",
+        "S0-1",
+    ]
+    assert stop_index.nearest(41.5, -72.5, 10, max_distance=5000) == []
+    assert stop_index.nearest(41.5, -72.5, 1) == ["FAR"]
+    assert StopIndex([]).nearest(40.7, -74.0, 10) == []
+
+
+def test_nearest_far_away(stop_index: StopIndex):
+    """Test locations far from every stop search the cells holding stops once."""
+    with patch.object(
+        StopIndex, "_ring_cells", wraps=StopIndex._ring_cells
+    ) as ring_cells_mock:
+        # San Diego, thousands of empty rings away
+        assert stop_index.nearest(32.7, -117.2, 2) == ["S19-0", "S18-0"]
+        assert stop_index.nearest(32.7, -117.2, 10, max_distance=3_000_000) == []
+    assert ring_cells_mock.call_count < 40
+
+
+def test_search(stop_index: StopIndex):
+    """Test stops are found by the start of the words of their names and IDs."""
+    assert stop_index.search("Street 7 & Avenue 3", 10) == ["S3-7", "S7-3"]
+    assert stop_index.search("s7-3", 10) == ["S7-3"]
+    assert stop_index.search("fara", 10) == ["FAR"]
+    assert stop_index.search("flag", 10) == ["NOWHERE"]
+    assert stop_index.search("nowhere", 10) == ["NOWHERE"]
+    assert len(stop_index.search("street", 25)) == 25
+    assert stop_index.search("subway", 10) == []
+    assert stop_index.search("  ", 10) == []
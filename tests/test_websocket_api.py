@@ -0,0 +1,85 @@
+"""Test the websocket API of the integration."""
+
+from dataclasses import replace
+
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.typing import WebSocketGenerator
+
+from custom_components.gtfs_realtime.coordinator import GtfsRealtimeCoordinator
+
+
+async def test_subscribe_departures(
+    hass: HomeAssistant,
+    hass_ws_client: WebSocketGenerator,
+    departures_coordinator: GtfsRealtimeCoordinator,
+):
+    """Test the departures are sent, then only the changes to them."""
+    assert await async_setup_component(hass, "websocket_api", {})
+    client = await hass_ws_client(hass)
+    await client.send_json_auto_id(
+        {
+            "type": "gtfs_realtime/subscribe_departures",
+            "stop_ids": ["101N", "102S", "UNKNOWN"],
+            "limit": 2,
+        }
+    )
+    assert (await client.receive_json())["success"]
+    event = (await client.receive_json())["event"]
+    assert set(event["stops"]) == {"101N", "102S", "UNKNOWN"}
+    assert [departure["trip_id"] for departure in event["stops"]["101N"]["upsert"]] == [
+        "N0",
+        "N1",
+    ]
+    assert event["stops"]["102S"]["upsert"][0] == {
+        "route_id": "2",
+        "headsign": "Uptown",
+        "trip_id": "S0",
+        "route_color": "EE352E",
+        "route_text_color": "FFFFFF",
+        "route_type": "Subway",
+        "arrival": departures_coordinator.gtfs_update_data.arrivals["102S"][
+            0
+        ].timestamp,
+    }
+    assert event["stops"]["UNKNOWN"] == {"upsert": []}
+
+    # Counting down sends nothing, the first departure leaving does
+    departures_coordinator.async_update_listeners()
+    arrivals = departures_coordinator.gtfs_update_data.arrivals
+    delayed = replace(arrivals["101N"][2], timestamp=arrivals["101N"][2].timestamp + 1)
+    departures_coordinator.gtfs_update_data = replace(
+        departures_coordinator.gtfs_update_data,
+        arrivals=arrivals | {"101N": (arrivals["101N"][1], delayed)},
+    )
+    departures_coordinator.async_update_listeners()
+    event = (await client.receive_json())["event"]
+    assert event == {
+        "stops": {
+            "101N": {
+                "upsert": [
+                    {
+                        "route_id": "1",
+                        "headsign": "Uptown",
+                        "trip_id": "N2",
+                        "route_color": "EE352E",
+                        "route_text_color": "FFFFFF",
+                        "route_type": "Subway",
+                        "arrival": delayed.timestamp,
+                    }
+                ],
+                "remove": ["N0"],
+            }
+        }
+    }
+
+    await client.send_json_auto_id(
+        {
+            "type": "gtfs_realtime/subscribe_departures",
+            "stop_ids": ["101N"],
+            "config_entry_id": "missing",
+        }
+    )
+    response = await client.receive_json()
+    assert not response["success"]
+    assert response["error"]["code"] == "not_found"